@@ -0,0 +1,2 @@
+# AudioScribe: resolve -> upload -> transcribe -> format pipeline.
+# Nothing is imported here so that `import audioscribe` stays cheap, see audioscribe.pipeline.
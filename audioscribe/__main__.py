@@ -0,0 +1,3 @@
+from audioscribe.cli import main
+
+main()
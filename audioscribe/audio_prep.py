@@ -0,0 +1,97 @@
+import io
+import os
+import time
+import shutil
+import tempfile
+import subprocess
+
+# Target format: mono 16 kHz Opus, plenty for speech recognition
+PREP_SAMPLE_RATE = 16000
+PREP_BITRATE = '32k'
+PREP_CHUNK_SIZE = 1024 * 1024
+# Leading and trailing audio quieter than this is dropped when trimming
+PREP_SILENCE_THRESHOLD = '-50dB'
+
+def ffmpeg_available():
+    return shutil.which('ffmpeg') is not None
+
+def _copy_to_temp(file, suffix):
+    # ffmpeg needs a seekable input for mp4 (moov atom at the end), copy in chunks
+    temp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    file.seek(0)
+    with temp:
+        for chunk in iter(lambda: file.read(PREP_CHUNK_SIZE), b""):
+            temp.write(chunk)
+    file.seek(0)
+    return temp.name
+
+def preprocess_audio(file, trim_silence=False):
+    """
+    Shrinks an audio or video file before upload: drops the video track,
+    downmixes to mono, resamples to 16 kHz and re-encodes to Opus.
+    Input and output are streamed through ffmpeg in chunks.
+
+    Parameters:
+    - file: A binary file object with a name (e.g. a Streamlit UploadedFile).
+    - trim_silence (bool): Remove the leading and trailing silence. Silences inside the audio are kept
+      so that the transcript timestamps stay in step with the original (shifted by the leading silence).
+      The trailing one is found by reversing the audio, which holds it decoded in memory.
+
+    Returns:
+    - tuple: (file, metrics). The file is a temporary file deleted on close, or the
+      original file if ffmpeg isn't installed or fails (metrics is then None).
+    """
+    if not ffmpeg_available():
+        print("ffmpeg not found, skipping audio pre-processing")
+        return file, None
+
+    started = time.monotonic()
+    file.seek(0, 2)
+    bytes_in = file.tell()
+    name = getattr(file, 'name', None)
+    temp_input = None
+    if isinstance(file, io.BufferedReader) and isinstance(name, str) and os.path.isfile(name):
+        # A file opened from disk (CLI) is read in place
+        input_path = name
+    else:
+        # The name of an upload comes from the client, it must never be taken for a local path
+        temp_input = _copy_to_temp(file, os.path.splitext(name)[1] if isinstance(name, str) else '')
+        input_path = temp_input
+
+    filters = []
+    if trim_silence:
+        # Downmixed first so that the reversed audio buffered by areverse is as small as possible
+        trim = f"silenceremove=start_periods=1:start_threshold={PREP_SILENCE_THRESHOLD}"
+        filters += [f"aformat=sample_rates={PREP_SAMPLE_RATE}:channel_layouts=mono", trim, 'areverse', trim, 'areverse']
+    command = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', input_path, '-vn', '-ac', '1', '-ar', str(PREP_SAMPLE_RATE)]
+    if filters:
+        command += ['-af', ','.join(filters)]
+    command += ['-c:a', 'libopus', '-b:a', PREP_BITRATE, '-application', 'voip', '-f', 'ogg', 'pipe:1']
+
+    output = tempfile.TemporaryFile()
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        for chunk in iter(lambda: process.stdout.read(PREP_CHUNK_SIZE), b""):
+            output.write(chunk)
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(stderr.decode(errors='replace').strip())
+    except (OSError, RuntimeError) as e:
+        print("Error during audio pre-processing:", e)
+        output.close()
+        file.seek(0)
+        return file, None
+    finally:
+        if temp_input:
+            os.remove(temp_input)
+
+    bytes_out = output.tell()
+    output.seek(0)
+    metrics = {
+        'bytes_in': bytes_in,
+        'bytes_out': bytes_out,
+        'bytes_saved': bytes_in - bytes_out,
+        'seconds': time.monotonic() - started,
+    }
+    print(f"audio pre-processing: {bytes_in} -> {bytes_out} bytes in {metrics['seconds']:.1f} s")
+    return output, metrics
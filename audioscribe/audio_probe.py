@@ -0,0 +1,327 @@
+import re
+import struct
+from audioscribe.http_client import provider_session
+
+# Direct links are probed with HTTP range requests: only the first and last few KB
+# of the file are fetched, enough to read the container headers (MP3 ID3/Xing/VBRI,
+# MP4 moov/mvhd, WAV RIFF) and get the duration, bitrate, size and embedded title.
+PROBE_HEAD_BYTES = 64 * 1024
+PROBE_TAIL_BYTES = 16 * 1024
+# Read after an ID3v2 tag larger than the head (cover art), to reach the first MPEG frame
+PROBE_FRAME_BYTES = 16 * 1024
+# MP4 files written for progressive download have their moov box first, others at the end
+PROBE_MAX_MOOV_BYTES = 4 * 1024 * 1024
+# Boxes walked at most to find the moov box of an MP4 file
+PROBE_MAX_BOXES = 32
+PROBE_TIMEOUT = (5, 10)
+
+class ProbeError(Exception):
+    pass
+
+def _fetch_range(url, start, end=None):
+    """
+    Fetches bytes start..end (inclusive) of a remote file, or the last -start bytes if start is negative.
+
+    Returns:
+    - tuple: (bytes, total size or None). Servers ignoring Range are read up to the requested length only.
+    """
+    if start < 0:
+        header, length = f"bytes={start}", -start
+    else:
+        header, length = f"bytes={start}-{end}", end - start + 1
+    response = provider_session('direct').get(url, headers={'Range': header}, stream=True, timeout=PROBE_TIMEOUT)
+    try:
+        if response.status_code == 416:
+            return b"", None
+        if response.status_code not in (200, 206):
+            raise ProbeError(f"HTTP {response.status_code}")
+        total = None
+        match = re.match(r"bytes \d+-\d+/(\d+)", response.headers.get('Content-Range', ''))
+        if match:
+            total = int(match.group(1))
+        elif response.status_code == 200:
+            if start != 0:
+                # No range support, the tail can't be read without downloading everything
+                raise ProbeError("range requests not supported")
+            total = int(response.headers['Content-Length']) if response.headers.get('Content-Length') else None
+        data = b""
+        for chunk in response.iter_content(chunk_size=16 * 1024):
+            data += chunk
+            if len(data) >= length:
+                break
+        return data[:length], total
+    finally:
+        response.close()
+
+# MPEG audio tables, indexed by (version, layer)
+_MPEG_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MPEG_BITRATES[(2, 3)] = _MPEG_BITRATES[(2, 2)]
+_MPEG_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+
+def _mpeg_frame(data, offset):
+    # Decodes the MPEG audio frame header at offset, None if there is none
+    if offset + 4 > len(data):
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    if data[offset] != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+    version = {0: 2.5, 2: 2, 3: 1}.get((b1 >> 3) & 3)
+    layer = {1: 3, 2: 2, 3: 1}.get((b1 >> 1) & 3)
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _MPEG_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _MPEG_SAMPLE_RATES[version][rate_index]
+    if layer == 1:
+        samples = 384
+    elif layer == 3 and version != 1:
+        samples = 576
+    else:
+        samples = 1152
+    padding = (b2 >> 1) & 1
+    if layer == 1:
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        length = samples // 8 * bitrate // sample_rate + padding
+    return {
+        'version': version, 'layer': layer, 'bitrate': bitrate, 'sample_rate': sample_rate,
+        'samples': samples, 'length': length, 'mono': (b3 >> 6) == 3,
+    }
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def _id3v2(data):
+    """
+    Reads an ID3v2 tag at the start of data.
+    Returns (tag size, title, length in ms), the tag size is 0 if there is no tag.
+    """
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0, None, None
+    version, flags = data[3], data[5]
+    size = 10 + _syncsafe(data[6:10]) + (10 if flags & 0x10 else 0)
+    title = length_ms = None
+    offset = 10
+    end = min(size, len(data))
+    while offset + 10 <= end:
+        frame_id = data[offset:offset + 4]
+        if frame_id[0] == 0:
+            break
+        frame_size = _syncsafe(data[offset + 4:offset + 8]) if version == 4 else struct.unpack('>I', data[offset + 4:offset + 8])[0]
+        body = data[offset + 10:offset + 10 + frame_size]
+        if frame_id == b"TIT2":
+            title = _id3_text(body)
+        elif frame_id == b"TLEN":
+            text = _id3_text(body)
+            length_ms = int(text) if text and text.isdigit() else None
+        offset += 10 + frame_size
+    return size, title, length_ms
+
+def _id3_text(body):
+    # Text frame: an encoding byte then the text
+    if not body:
+        return None
+    encoding, text = body[0], body[1:]
+    codec = {0: 'latin-1', 1: 'utf-16', 2: 'utf-16-be', 3: 'utf-8'}.get(encoding, 'latin-1')
+    return text.decode(codec, 'replace').strip('\x00').strip() or None
+
+def probe_mp3(head, tail, size, frames_data=None):
+    """
+    Duration of an MP3 file from its first frame: the Xing/Info or VBRI header
+    of VBR files, otherwise the bitrate of the first frame (CBR).
+    frames_data are the bytes following the ID3v2 tag, when the tag is larger than head.
+    """
+    tag_size, title, length_ms = _id3v2(head)
+    data, base = (head, 0) if frames_data is None else (frames_data, tag_size)
+    offset = tag_size - base
+    frame = None
+    # The first frame may follow some padding
+    while offset < len(data) - 4:
+        frame = _mpeg_frame(data, offset)
+        if frame:
+            break
+        offset += 1
+    if tail[-128:-125] == b"TAG":
+        title = title or tail[-125:-95].decode('latin-1').strip('\x00 ') or None
+    info = {'container': 'mp3', 'title': title}
+    if frame is None:
+        if length_ms:
+            info['duration'] = length_ms / 1000
+        return info
+
+    frames = None
+    if frame['version'] == 1:
+        side_info = 17 if frame['mono'] else 32
+    else:
+        side_info = 9 if frame['mono'] else 17
+    xing = offset + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack('>I', data[xing + 4:xing + 8])[0]
+        if flags & 1:
+            frames = struct.unpack('>I', data[xing + 8:xing + 12])[0]
+    elif data[offset + 36:offset + 40] == b"VBRI":
+        frames = struct.unpack('>I', data[offset + 50:offset + 54])[0]
+
+    audio_size = (size - base - offset - (128 if tail[-128:-125] == b"TAG" else 0)) if size else None
+    if frames:
+        info['duration'] = frames * frame['samples'] / frame['sample_rate']
+        if audio_size:
+            info['bitrate'] = int(audio_size * 8 / info['duration'])
+    else:
+        info['bitrate'] = frame['bitrate']
+        if audio_size:
+            info['duration'] = audio_size * 8 / frame['bitrate']
+        elif length_ms:
+            info['duration'] = length_ms / 1000
+    return info
+
+def _boxes(data, start=0, end=None):
+    # Yields (type, payload start, payload end) of the MP4 boxes in data[start:end]
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack('>I4s', data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            size, header = struct.unpack('>Q', data[offset + 8:offset + 16])[0], 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield kind, offset + header, min(offset + size, end)
+        offset += size
+
+def _child(data, path, start=0, end=None):
+    # Payload bounds of the box at path (e.g. [b'udta', b'meta']), None if missing
+    for kind, payload, payload_end in _boxes(data, start, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return payload, payload_end
+            if kind == b'meta' and data[payload + 4:payload + 8] != b'hdlr':
+                # ISO meta is a full box: version and flags before its children
+                payload += 4
+            return _child(data, path[1:], payload, payload_end)
+    return None
+
+def parse_moov(moov):
+    # Duration and title from the payload of an MP4 moov box
+    info = {'container': 'mp4'}
+    mvhd = _child(moov, [b'mvhd'])
+    if mvhd:
+        start = mvhd[0]
+        if moov[start] == 1:
+            timescale, duration = struct.unpack('>IQ', moov[start + 20:start + 32])
+        else:
+            timescale, duration = struct.unpack('>II', moov[start + 12:start + 20])
+        if timescale:
+            info['duration'] = duration / timescale
+    name = _child(moov, [b'udta', b'meta', b'ilst', b'\xa9nam', b'data'])
+    if name:
+        # Type and locale, then the UTF-8 text
+        info['title'] = moov[name[0] + 8:name[1]].decode('utf-8', 'replace').strip() or None
+    return info
+
+def probe_mp4(url, head, size):
+    """
+    Finds the moov box of an MP4/M4A file, in the first bytes or by walking the
+    top-level box headers with small range requests, and reads its mvhd.
+    """
+    offset = 0
+    for _ in range(PROBE_MAX_BOXES):
+        if size and offset + 8 > size:
+            break
+        if offset + 16 <= len(head):
+            header = head[offset:offset + 16]
+        else:
+            header, _ = _fetch_range(url, offset, offset + 15)
+        if len(header) < 8:
+            break
+        box_size, kind = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if box_size == 1:
+            box_size, header_size = struct.unpack('>Q', header[8:16])[0], 16
+        elif box_size == 0 and size:
+            box_size = size - offset
+        if box_size < header_size:
+            break
+        if kind == b'moov':
+            if box_size > PROBE_MAX_MOOV_BYTES:
+                raise ProbeError("moov box too large")
+            if offset + box_size <= len(head):
+                moov = head[offset + header_size:offset + box_size]
+            else:
+                moov, _ = _fetch_range(url, offset + header_size, offset + box_size - 1)
+            return parse_moov(moov)
+        offset += box_size
+    return {'container': 'mp4'}
+
+def probe_wav(head, size):
+    # Duration of a WAV file from its fmt and data chunks, title from its LIST/INFO chunk
+    info = {'container': 'wav'}
+    byte_rate = None
+    offset = 12
+    while offset + 8 <= len(head):
+        kind, chunk_size = struct.unpack('<4sI', head[offset:offset + 8])
+        body = offset + 8
+        if kind == b'fmt ':
+            byte_rate = struct.unpack('<I', head[body + 8:body + 12])[0]
+        elif kind == b'LIST' and head[body:body + 4] == b'INFO':
+            sub = body + 4
+            while sub + 8 <= min(body + chunk_size, len(head)):
+                sub_kind, sub_size = struct.unpack('<4sI', head[sub:sub + 8])
+                if sub_kind == b'INAM':
+                    info['title'] = head[sub + 8:sub + 8 + sub_size].decode('latin-1').strip('\x00 ') or None
+                sub += 8 + sub_size + (sub_size & 1)
+        elif kind == b'data':
+            if chunk_size in (0, 0xFFFFFFFF) and size:
+                # Written while streaming, the size was never filled in
+                chunk_size = size - body
+            if byte_rate:
+                info['duration'] = chunk_size / byte_rate
+                info['bitrate'] = byte_rate * 8
+            break
+        offset = body + chunk_size + (chunk_size & 1)
+    return info
+
+def probe_remote_audio(url):
+    """
+    Reads the metadata of a remote audio file without downloading it.
+
+    Parameters:
+    - url (str): A direct link to an MP3, MP4/M4A or WAV file.
+
+    Returns:
+    - dict: 'container', 'size' (bytes), and when found 'duration' (s), 'bitrate' (bit/s) and 'title'.
+    """
+    head, size = _fetch_range(url, 0, PROBE_HEAD_BYTES - 1)
+    if len(head) < 12:
+        raise ProbeError("empty file")
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        info = probe_wav(head, size)
+    elif head[4:8] == b'ftyp':
+        info = probe_mp4(url, head, size)
+    else:
+        # The whole file may already be in head
+        tail = b"" if size is None or size > len(head) else head
+        if size and size > len(head):
+            # ID3v1 tag at the end of the file, optional
+            try:
+                tail, _ = _fetch_range(url, -PROBE_TAIL_BYTES)
+            except ProbeError:
+                pass
+        # A tag with cover art can be larger than head: the frames are read right after it
+        tag_size = _id3v2(head[:10])[0]
+        frames_data = None
+        if tag_size and tag_size + 4 > len(head) and (size is None or size > tag_size):
+            frames_data, _ = _fetch_range(url, tag_size, tag_size + PROBE_FRAME_BYTES - 1)
+        info = probe_mp3(head, tail, size, frames_data)
+    info['size'] = size
+    if info.get('duration') and size and not info.get('bitrate'):
+        info['bitrate'] = int(size * 8 / info['duration'])
+    return info
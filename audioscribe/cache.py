@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from audioscribe.transcript_store import store_put, store_get
+
+# Location and limits of the on-disk transcript cache
+CACHE_PATH = os.path.join('.cache', 'transcripts.sqlite3')
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_TTL_SEC = 30 * 24 * 3600
+
+# Store IDs of the raw transcripts read by cache_raw(), by cache key
+_raw_ids = {}
+_raw_lock = threading.Lock()
+
+def _connect():
+    # Open a connection to the cache database, creating it if needed
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(CACHE_PATH, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS transcripts (
+            key TEXT PRIMARY KEY,
+            output TEXT NOT NULL,
+            raw TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created REAL NOT NULL,
+            accessed REAL NOT NULL
+        )
+    """)
+    return conn
+
+def source_key(service_code, source_id):
+    """
+    Builds the cache key of a resolved source.
+
+    Parameters:
+    - service_code (str): The service code ('ln', 'yt', 'sp', 'dt').
+    - source_id (str): The canonical ID of the source for this service.
+
+    Returns:
+    - str: The normalized key, e.g. "yt:dQw4w9WgXcQ".
+    """
+    source_id = str(source_id).strip()
+    if service_code == 'dt':
+        # Direct links: ignore the fragment and trailing slashes
+        source_id = source_id.split('#')[0].rstrip('/')
+    return f"{service_code}:{source_id}"
+
+def file_key(file, chunk_size=1024 * 1024):
+    """
+    Builds the cache key of an uploaded file from a hash of its content.
+    The file is read in chunks and rewound afterwards.
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return f"up:{digest.hexdigest()}"
+
+def cache_get(key):
+    """
+    Looks up a transcript in the cache.
+
+    Returns:
+    - tuple: (output, raw) if a fresh entry exists, None otherwise.
+    """
+    if not key:
+        return None
+    now = time.time()
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT output, raw, created FROM transcripts WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if now - row[2] > CACHE_TTL_SEC:
+            conn.execute("DELETE FROM transcripts WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE transcripts SET accessed = ? WHERE key = ?", (now, key))
+    return row[0], json.loads(row[1])
+
+def cache_raw(key):
+    """
+    Raw transcript of an entry. While its pages are browsed, its JSON is kept in the
+    shared transcript store (bounded, counted in the session budget) rather than read again.
+    """
+    if not key:
+        return None
+    with _raw_lock:
+        raw_id = _raw_ids.get(key)
+    raw_json = store_get(raw_id) if raw_id else None
+    if raw_json is None:
+        with _connect() as conn:
+            row = conn.execute("SELECT raw, created FROM transcripts WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > CACHE_TTL_SEC:
+            return None
+        raw_json = row[0]
+        with _raw_lock:
+            _raw_ids[key] = store_put(raw_json)
+    return json.loads(raw_json)
+
+def cache_put(key, output, raw):
+    """
+    Stores a transcript in the cache and evicts old entries.
+
+    Parameters:
+    - key (str): The source key from source_key() or file_key().
+    - output (str): The formatted transcription result.
+    - raw (dict): The raw utterances, entities, topics and summary.
+    """
+    if not key:
+        return
+    with _raw_lock:
+        _raw_ids.pop(key, None)
+    raw_json = json.dumps(raw, ensure_ascii=False)
+    size = len(output.encode()) + len(raw_json.encode())
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO transcripts (key, output, raw, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, output, raw_json, size, now, now)
+        )
+        _evict(conn, now)
+
+def _evict(conn, now):
+    # Drop expired entries, then the least recently used until under the size limit
+    conn.execute("DELETE FROM transcripts WHERE created < ?", (now - CACHE_TTL_SEC,))
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+    if total <= CACHE_MAX_BYTES:
+        return
+    for key, size in conn.execute("SELECT key, size FROM transcripts ORDER BY accessed ASC").fetchall():
+        conn.execute("DELETE FROM transcripts WHERE key = ?", (key,))
+        total -= size
+        if total <= CACHE_MAX_BYTES:
+            break
@@ -0,0 +1,171 @@
+import string
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Long audio is split in overlapping segments transcribed in parallel
+CHUNK_MIN_DURATION_SEC = 30 * 60
+CHUNK_SEGMENT_SEC = 15 * 60
+CHUNK_OVERLAP_SEC = 30
+CHUNK_MAX_WORKERS = 4
+
+def segment_bounds(duration_sec, segment_sec=CHUNK_SEGMENT_SEC, overlap_sec=CHUNK_OVERLAP_SEC):
+    """
+    Splits a duration in overlapping segments.
+
+    Returns:
+    - list: (start_sec, end_sec) tuples, each segment overlapping the previous one by overlap_sec.
+    """
+    duration_sec = float(duration_sec)
+    bounds = []
+    start = 0.0
+    while True:
+        end = min(start + segment_sec, duration_sec)
+        bounds.append((start, end))
+        if end >= duration_sec:
+            return bounds
+        start = end - overlap_sec
+
+def extract_segment(source, start_sec, end_sec):
+    """
+    Cuts a segment of a local file or remote URL with ffmpeg (remote sources are read with range requests).
+
+    Returns:
+    - file: A temporary mono 16 kHz Opus file, deleted on close.
+    """
+    command = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-ss', str(start_sec), '-t', str(end_sec - start_sec), '-i', source,
+        '-vn', '-ac', '1', '-ar', '16000', '-c:a', 'libopus', '-b:a', '32k', '-f', 'ogg', 'pipe:1'
+    ]
+    output = tempfile.TemporaryFile()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    for chunk in iter(lambda: process.stdout.read(1024 * 1024), b""):
+        output.write(chunk)
+    stderr = process.stderr.read()
+    if process.wait() != 0:
+        output.close()
+        raise RuntimeError(f"ffmpeg failed on segment {start_sec}-{end_sec} s: {stderr.decode(errors='replace').strip()}")
+    output.seek(0)
+    return output
+
+def utterances_with_offset(transcript, offset_sec):
+    # Convert the utterances of a segment transcript to dicts on the absolute timeline (ms)
+    # Each one carries its words as (text, start, end, confidence) until the segments are stitched
+    offset_ms = int(offset_sec * 1000)
+    if not transcript.utterances:
+        words = [(w.text, w.start + offset_ms, w.end + offset_ms, w.confidence) for w in (transcript.words or [])]
+        if words:
+            return [{'speaker': 'A', 'start': words[0][1], 'end': words[-1][2], 'text': transcript.text or '', 'words': words}]
+        return [{'speaker': 'A', 'start': offset_ms, 'end': offset_ms + int(transcript.audio_duration or 0) * 1000, 'text': transcript.text or '', 'words': words}]
+    return [
+        {
+            'speaker': u.speaker, 'start': u.start + offset_ms, 'end': u.end + offset_ms, 'text': u.text,
+            'words': [(w.text, w.start + offset_ms, w.end + offset_ms, w.confidence) for w in (u.words or [])],
+        }
+        for u in transcript.utterances
+    ]
+
+def transcribe_segments(source, bounds, transcribe, max_workers=CHUNK_MAX_WORKERS, extract=extract_segment):
+    """
+    Transcribes every segment concurrently.
+    transcribe(segment_file, duration_sec) must return a transcript with utterances, it is
+    where the provider is plugged in (a local fake provider for tests).
+
+    Yields (index, transcript) as each segment completes, in completion order.
+    """
+    def work(index):
+        start, end = bounds[index]
+        segment = extract(source, start, end)
+        try:
+            return transcribe(segment, end - start)
+        finally:
+            segment.close()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(work, index): index for index in range(len(bounds))}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+def _overlap_ms(a, b):
+    return max(0, min(a['end'], b['end']) - max(a['start'], b['start']))
+
+def _speaker_labels():
+    # A, B, ..., Z, AA, AB, ...
+    letters = string.ascii_uppercase
+    for label in letters:
+        yield label
+    for first in letters:
+        for second in letters:
+            yield first + second
+
+def _trim(utterance, start_ms=None, end_ms=None):
+    """
+    Keeps the part of an utterance on one side of a cut: its words centered after start_ms
+    or before end_ms when it has word timings and spans the cut, the whole utterance if it is
+    centered there otherwise. Returns None when nothing is kept.
+    """
+    cut = start_ms if start_ms is not None else end_ms
+    words = utterance.get('words')
+    if not words or not utterance['start'] < cut < utterance['end']:
+        center = (utterance['start'] + utterance['end']) / 2
+        keep = center >= start_ms if start_ms is not None else center < end_ms
+        return utterance if keep else None
+    if start_ms is not None:
+        kept = [w for w in words if (w[1] + w[2]) / 2 >= start_ms]
+    else:
+        kept = [w for w in words if (w[1] + w[2]) / 2 < end_ms]
+    if not kept:
+        return None
+    if len(kept) == len(words):
+        return utterance
+    return dict(utterance, start=kept[0][1], end=kept[-1][2], text=" ".join(w[0] for w in kept), words=kept)
+
+def stitch_chunks(chunks, bounds):
+    """
+    Stitches the utterances of overlapping segments into one timeline.
+
+    Parameters:
+    - chunks (list): Per segment, its utterance dicts on the absolute timeline (from utterances_with_offset).
+    - bounds (list): The (start_sec, end_sec) of each segment.
+
+    Returns:
+    - list: The utterances with duplicates from overlaps removed and speakers renamed consistently.
+    """
+    labels = _speaker_labels()
+    stitched = []
+    previous = []
+    for index, utterances in enumerate(chunks):
+        # Map the local speakers of this segment to the global ones by time overlap with the previous segment
+        votes = {}
+        for utterance in utterances:
+            for known in previous:
+                overlap = _overlap_ms(utterance, known)
+                if overlap:
+                    key = (utterance['speaker'], known['speaker'])
+                    votes[key] = votes.get(key, 0) + overlap
+        mapping = {}
+        for (local, known), _ in sorted(votes.items(), key=lambda item: -item[1]):
+            if local not in mapping and known not in mapping.values():
+                mapping[local] = known
+        used = {u['speaker'] for u in stitched}
+        for utterance in utterances:
+            if utterance['speaker'] not in mapping:
+                label = next(labels)
+                while label in used:
+                    label = next(labels)
+                mapping[utterance['speaker']] = label
+                used.add(label)
+        renamed = [dict(u, speaker=mapping[u['speaker']]) for u in utterances]
+
+        # Cut in the middle of each overlap: the previous segment keeps the utterances centered
+        # before the cut, this one those centered after the last kept utterance. Utterances spanning
+        # the cut (a whole segment without speaker labels) are cut between their words.
+        if index > 0:
+            cut_ms = (bounds[index][0] + bounds[index - 1][1]) / 2 * 1000
+            stitched = [kept for kept in (_trim(u, end_ms=cut_ms) for u in stitched) if kept]
+            boundary_ms = max([cut_ms] + [u['end'] for u in stitched])
+            renamed = [kept for kept in (_trim(u, start_ms=boundary_ms) for u in renamed) if kept]
+        stitched.extend(renamed)
+        previous = [dict(u, speaker=mapping[u['speaker']]) for u in utterances]
+    return stitched
@@ -0,0 +1,169 @@
+import os
+import sys
+import argparse
+from audioscribe.utils import youtube_url_is_playlist
+from audioscribe.cache import file_key, source_key
+from audioscribe.clients import PROFILES, DEFAULT_PROFILE
+from audioscribe.polling import TranscriptionError
+from audioscribe.exports import EXPORT_FORMATS, write_export
+from audioscribe.metrics import configure_metrics, configure_trace_log, write_prometheus
+
+def transcribe_file(path, optimize=True, trim_silence=False, profile=DEFAULT_PROFILE):
+    # Upload a local file (optionally shrunk first) and transcribe it, returns (output, cache_key)
+    from audioscribe.audio_prep import preprocess_audio
+    from audioscribe.pipeline import upload_audio, transcribe_audio, cached_transcript
+
+    with open(path, 'rb') as file:
+        cache_key = file_key(file)
+        cached = cached_transcript(cache_key, profile)
+        if cached is not None:
+            return cached[1], cache_key
+        upload_source, prep_metrics = file, None
+        if optimize:
+            upload_source, prep_metrics = preprocess_audio(file, trim_silence=trim_silence)
+        audio_bytes = prep_metrics['bytes_out'] if prep_metrics else os.path.getsize(path)
+        try:
+            audio_url = upload_audio(upload_source)
+        finally:
+            if upload_source is not file:
+                upload_source.close()
+    return transcribe_audio(audio_url, os.path.basename(path), 'Not available', 0, cache_key, audio_bytes, profile), cache_key
+
+def transcribe_playlist(url, profile=DEFAULT_PROFILE):
+    # Transcribe every video of a YouTube playlist
+    from audioscribe.playlist import youtube_playlist_entries
+    from audioscribe.pipeline import transcribe_playlist as transcribe_entries
+
+    return transcribe_entries(youtube_playlist_entries(url), profile), None
+
+def transcribe_input(text, profile=DEFAULT_PROFILE):
+    # Resolve a URL, ID or search query and transcribe it, returns (output, cache_key)
+    from audioscribe.pipeline import resolve_source, transcribe_audio
+
+    service_code, data = resolve_source(text)
+    if not isinstance(data, dict) or not data['audio']:
+        raise TranscriptionError(f"No audio found for {text}")
+    cache_key = source_key(service_code, data['id'])
+    return transcribe_audio(data['audio'], data['title'], data['link'], data['audio_length_sec'], cache_key, profile=profile), cache_key
+
+def transcribe_command(args):
+    from audioscribe.pipeline import cached_transcript
+
+    if os.path.isfile(args.source):
+        output, cache_key = transcribe_file(args.source, optimize=not args.no_optimize, trim_silence=args.trim_silence, profile=args.profile)
+    elif youtube_url_is_playlist(args.source):
+        output, cache_key = transcribe_playlist(args.source, args.profile)
+    else:
+        output, cache_key = transcribe_input(args.source, args.profile)
+
+    raw = None
+    if args.format != 'md':
+        # Other formats are written from the utterances of the cached raw transcript
+        cached = cached_transcript(cache_key, args.profile)
+        if cached is None:
+            raise TranscriptionError(f"The {args.format} format is not available for this source")
+        raw = cached[2]
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            if raw is not None:
+                write_export(raw, args.format, f)
+            else:
+                f.write(output)
+    elif raw is not None:
+        write_export(raw, args.format, sys.stdout)
+    else:
+        print(output)
+
+def recover_command(args):
+    # Resume the transcriptions left unfinished by a previous run and wait for them, results go to the cache
+    import time
+    from audioscribe.jobs import get_job
+    from audioscribe.pipeline import recover_transcriptions
+
+    job_ids = recover_transcriptions()
+    print(f"{len(job_ids)} unfinished transcriptions to recover", file=sys.stderr)
+    failed = 0
+    while job_ids:
+        time.sleep(1)
+        for job_id in list(job_ids):
+            job = get_job(job_id)
+            if job is None or job['status'] in ('completed', 'error'):
+                job_ids.remove(job_id)
+                if job is None or job['status'] == 'error':
+                    failed += 1
+                    print(f"Recovery failed: {job['error'] if job else 'job lost'}", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+def feeds_command(args):
+    # Manage the podcast feed subscriptions, or check them (once, or as they become due)
+    from audioscribe import feeds
+
+    if args.action == 'add':
+        episodes = feeds.subscribe(args.url, profile=args.profile, backfill=args.backfill)
+        print(f"Subscribed to {args.url}: {len(episodes)} episodes, the latest {min(args.backfill, len(episodes))} queued", file=sys.stderr)
+    elif args.action == 'remove':
+        feeds.unsubscribe(args.url)
+    elif args.action == 'list':
+        for feed in feeds.list_feeds():
+            states = ", ".join(f"{n} {state}" for state, n in sorted(feed['episodes'].items())) or "no episodes"
+            print(f"{feed['url']}\t{feed['title'] or ''}\tevery {feed['interval'] / 60:.0f} min\t{states}")
+    elif args.action == 'check':
+        print(f"{feeds.check_due_feeds()} feeds checked", file=sys.stderr)
+        wait_for_jobs()
+        # Record the outcomes while the jobs are known, the next run would see them as lost
+        feeds.update_episode_states()
+    else:
+        feeds.watch_feeds()
+
+def wait_for_jobs():
+    # Wait until the job pool is idle
+    import time
+    from audioscribe.jobs import job_stats
+
+    while any(job_stats().get(status) for status in ('queued', 'running')):
+        time.sleep(1)
+
+def main(argv=None):
+    """
+    Command line entry point, e.g.:
+        python -m audioscribe transcribe https://www.youtube.com/watch?v=... -o transcription.md
+    """
+    parser = argparse.ArgumentParser(prog='audioscribe', description='Transcribe podcasts, YouTube videos and audio files.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    transcribe = subparsers.add_parser('transcribe', help='Transcribe a URL, ID, search query or local file')
+    transcribe.add_argument('source', help='ListenNotes/Spotify/YouTube URL or ID, direct audio URL, search terms or path of an audio file')
+    transcribe.add_argument('-o', '--output', help='Write the transcription to this file instead of the standard output')
+    transcribe.add_argument('-f', '--format', choices=['md'] + list(EXPORT_FORMATS), default='md', help='Output format: the markdown report, subtitles with timestamps (srt, vtt), json or plain text')
+    transcribe.add_argument('-p', '--profile', choices=list(PROFILES), default=DEFAULT_PROFILE, help='Transcription features: fast (text only), speakers, or full (speakers, summary, topics, entities)')
+    transcribe.add_argument('--no-optimize', action='store_true', help="Upload local files as-is, without ffmpeg pre-processing")
+    transcribe.add_argument('--trim-silence', action='store_true', help='Trim the silence at the start and end of local files before upload')
+    transcribe.add_argument('--metrics-file', help='Write Prometheus-style metrics of the run to this file')
+    transcribe.add_argument('--trace', action='store_true', help='Log a JSON line per pipeline stage on the standard error')
+    transcribe.set_defaults(func=transcribe_command)
+
+    recover = subparsers.add_parser('recover', help='Resume the transcriptions left unfinished by a previous run')
+    recover.set_defaults(func=recover_command, metrics_file=None, trace=False)
+
+    feeds = subparsers.add_parser('feeds', help='Subscribe to podcast RSS feeds and transcribe their new episodes')
+    feeds.add_argument('action', choices=['add', 'remove', 'list', 'check', 'watch'], help='add/remove a feed, list them, check the due ones once, or keep watching them')
+    feeds.add_argument('url', nargs='?', help='Feed URL, for add and remove')
+    feeds.add_argument('-p', '--profile', choices=list(PROFILES), default=DEFAULT_PROFILE, help='Transcription features of the episodes of a new feed')
+    feeds.add_argument('--backfill', type=int, default=1, help='Latest episodes of a new feed to transcribe, the older ones are skipped')
+    feeds.set_defaults(func=feeds_command, metrics_file=None, trace=False)
+
+    args = parser.parse_args(argv)
+    if args.command == 'feeds' and args.action in ('add', 'remove') and not args.url:
+        parser.error(f"feeds {args.action} needs a feed URL")
+    configure_metrics()
+    if args.trace:
+        configure_trace_log()
+    try:
+        args.func(args)
+    except (TranscriptionError, TimeoutError) as e:
+        print(f"Transcription failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if args.metrics_file:
+            write_prometheus(args.metrics_file)
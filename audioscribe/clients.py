@@ -0,0 +1,138 @@
+import queue
+import functools
+import contextlib
+from audioscribe.config import get_secret
+from audioscribe.polling import start_webhook_receiver, WEBHOOK_AUTH_HEADER
+from audioscribe.http_client import provider_session, guard_httpx_client
+
+# Every SDK is imported and its client built on first use only,
+# so a run that only needs one service doesn't pay for the others.
+# Their HTTP calls go through the shared sessions of http_client (pooling, rate limits, retries).
+
+# Service endpoints, can be overridden in an [endpoints] secrets section (staging, local fakes for benchmarks...)
+ENDPOINTS = {
+    'listennotes': 'https://listen-api.listennotes.com/api/v2',
+    'spotify_api': 'https://api.spotify.com/v1/',
+    'spotify_token': 'https://accounts.spotify.com/api/token',
+    'assemblyai': 'https://api.assemblyai.com',
+}
+
+def endpoint(name):
+    return get_secret(f'endpoints.{name}', ENDPOINTS[name])
+
+@functools.lru_cache(maxsize=None)
+def listennotes_client():
+    # ListenNotes client configuration
+    from listennotes import podcast_api
+    client = podcast_api.Client(api_key=get_secret('listennotes'))
+    client.api_base = endpoint('listennotes')
+    client.http_client.session = provider_session('listennotes')
+    return client
+
+@functools.lru_cache(maxsize=None)
+def spotify_client():
+    # Spotify client configuration
+    import spotipy
+    from spotipy.cache_handler import MemoryCacheHandler
+    from spotipy.oauth2 import SpotifyClientCredentials
+    session = provider_session('spotify')
+    # The token is kept in memory: spotipy's default file handler writes a `.cache` file
+    # in the working directory, which clashes with the `.cache/` directory of the stores
+    auth_manager = SpotifyClientCredentials(
+        client_id=get_secret('spotify.id'), client_secret=get_secret('spotify.secret'), requests_session=session,
+        cache_handler=MemoryCacheHandler()
+    )
+    auth_manager.OAUTH_TOKEN_URL = endpoint('spotify_token')
+    sp = spotipy.Spotify(auth_manager=auth_manager, requests_session=session)
+    sp.prefix = endpoint('spotify_api')
+    return sp
+
+# yt-dlp options of a single video resolution: only the best audio-only format is selected,
+# playlists aren't expanded and nothing else than the formats is fetched
+YOUTUBE_OPTIONS = {
+    'format': 'bestaudio[ext=m4a]/bestaudio',
+    'noplaylist': True,
+    'skip_download': True,
+    'getcomments': False,
+    'writesubtitles': False,
+    'writeautomaticsub': False,
+    'writethumbnail': False,
+    'extractor_args': {'youtube': {'skip': ['hls', 'dash', 'translated_subs']}},
+    'socket_timeout': 15,
+    'quiet': True,
+    'no_warnings': True,
+}
+
+# Idle extractors kept for reuse, shared by every thread (building one is slow)
+YOUTUBE_POOL_SIZE = 4
+_youtube = queue.Queue(maxsize=YOUTUBE_POOL_SIZE)
+
+@contextlib.contextmanager
+def youtube_extractor():
+    """
+    Borrows a preconfigured yt-dlp extractor from the pool, built if none is idle.
+    YoutubeDL instances aren't thread-safe, each one is used by a single thread at a time.
+    It's given back afterwards, or closed and dropped if an error left it in an unknown state.
+    """
+    try:
+        extractor = _youtube.get_nowait()
+    except queue.Empty:
+        import yt_dlp
+        extractor = yt_dlp.YoutubeDL(YOUTUBE_OPTIONS)
+    try:
+        yield extractor
+    except BaseException:
+        # Its cookie jar, files and HTTP session are released rather than leaked
+        extractor.close()
+        raise
+    try:
+        _youtube.put_nowait(extractor)
+    except queue.Full:
+        extractor.close()
+
+@functools.lru_cache(maxsize=None)
+def assemblyai():
+    # AssemblyAI SDK with the API key set
+    import assemblyai as aai
+    aai.settings.api_key = get_secret('assemblyai')
+    aai.settings.base_url = endpoint('assemblyai')
+    guard_httpx_client(aai.Client.get_default().http_client, 'assemblyai')
+    return aai
+
+# Transcription feature profiles, selectable per request. Every enabled feature adds
+# provider processing time, summary, topics and entities can be computed later on demand.
+PROFILES = {
+    'fast': {'language_detection': True},
+    'speakers': {'language_detection': True, 'speaker_labels': True},
+    'full': {
+        'language_detection': True,
+        'speaker_labels': True,
+        'summarization': True,
+        'entity_detection': True,
+        'iab_categories': True,
+    },
+}
+DEFAULT_PROFILE = 'full'
+
+def profile_fallbacks(profile):
+    # Profiles whose transcripts have every feature of `profile`, the profile itself first
+    features = set(PROFILES[profile])
+    return [profile] + [name for name, other in PROFILES.items() if name != profile and features <= set(other)]
+
+@functools.lru_cache(maxsize=None)
+def transcriber(profile=DEFAULT_PROFILE):
+    # AssemblyAI client configuration for a feature profile
+    aai = assemblyai()
+    features = dict(PROFILES[profile])
+    if features.get('summarization'):
+        features.update(summary_model=aai.SummarizationModel.conversational, summary_type=aai.SummarizationType.bullets)
+    config = aai.TranscriptionConfig(**features)
+    # Optional completion webhook, e.g. [webhook] url = "https://host/assemblyai" port = 8765 token = "..."
+    webhook = get_secret('webhook')
+    if webhook:
+        if webhook.get('token'):
+            config.set_webhook(webhook['url'], WEBHOOK_AUTH_HEADER, webhook['token'])
+        else:
+            config.set_webhook(webhook['url'])
+        start_webhook_receiver(port=int(webhook.get('port', 8765)), token=webhook.get('token'))
+    return aai.Transcriber(config=config)
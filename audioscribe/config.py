@@ -0,0 +1,39 @@
+import os
+import sys
+import functools
+
+# Same file as Streamlit's st.secrets, so the app and the CLI share their configuration
+SECRETS_PATHS = [
+    os.path.join('.streamlit', 'secrets.toml'),
+    os.path.join(os.path.expanduser('~'), '.streamlit', 'secrets.toml'),
+]
+
+@functools.lru_cache(maxsize=None)
+def _secrets():
+    # Merge the secrets files, the project one taking precedence
+    import tomllib
+    secrets = {}
+    for path in reversed(SECRETS_PATHS):
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                secrets.update(tomllib.load(f))
+    if not secrets and 'streamlit' in sys.modules:
+        # Secrets provided by the Streamlit host rather than a file
+        import streamlit as st
+        secrets = st.secrets.to_dict()
+    return secrets
+
+def get_secret(name, default=None):
+    """
+    Reads a secret such as "assemblyai" or "spotify.id".
+    Environment variables (AUDIOSCRIBE_ASSEMBLYAI, AUDIOSCRIBE_SPOTIFY_ID...) override the secrets file.
+    """
+    env_name = 'AUDIOSCRIBE_' + name.replace('.', '_').upper()
+    if env_name in os.environ:
+        return os.environ[env_name]
+    value = _secrets()
+    for part in name.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return default
+        value = value[part]
+    return value
@@ -0,0 +1,166 @@
+import os
+import json
+import hashlib
+import itertools
+import threading
+from audioscribe.word_timings import iter_words
+
+# Exports of a raw transcript (see pipeline.raw_transcript), written piece by piece
+# from the utterance list so a long transcript is never copied as a whole.
+
+# Subtitle cues built from word timings are cut at these limits (two lines of 42 characters)
+SUBTITLE_MAX_MS = 7000
+SUBTITLE_MAX_CHARS = 84
+# Exports built for a download are kept on disk, the most recent ones only
+EXPORTS_PATH = os.path.join('.cache', 'exports')
+EXPORTS_MAX_FILES = 64
+
+def format_timestamp(ms, separator='.'):
+    """
+    Formats milliseconds as HH:MM:SS.mmm (VTT) or HH:MM:SS,mmm with separator=',' (SRT).
+    """
+    hours, rest = divmod(int(ms or 0), 3600000)
+    minutes, rest = divmod(rest, 60000)
+    seconds, millis = divmod(rest, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{millis:03d}"
+
+def _utterances(raw):
+    # Transcripts without speaker labels are exported as a single cue
+    if raw.get('utterances'):
+        return raw['utterances']
+    return [{'speaker': 'A', 'start': 0, 'end': 0, 'text': raw.get('text') or ''}]
+
+def _word_cues(words):
+    # Group words into short cues, cut on a speaker change, at the limits or after a sentence
+    cue = None
+    for word in words:
+        if cue is not None and (
+            (word['speaker'] or 'A') != cue['speaker']
+            or word['end'] - cue['start'] > SUBTITLE_MAX_MS
+            or len(cue['text']) + 1 + len(word['text']) > SUBTITLE_MAX_CHARS
+            or cue['text'].endswith(('.', '?', '!'))
+        ):
+            yield cue
+            cue = None
+        if cue is None:
+            cue = {'speaker': word['speaker'] or 'A', 'start': word['start'], 'end': word['end'], 'text': word['text']}
+        else:
+            cue['end'] = word['end']
+            cue['text'] += ' ' + word['text']
+    if cue is not None:
+        yield cue
+
+def _cues(raw):
+    # Subtitle cues from the stored word timings, one per utterance without them
+    if raw.get('words_key'):
+        try:
+            words = iter_words(raw['words_key'])
+            first = next(words, None)
+        except FileNotFoundError:
+            first = None
+        if first is not None:
+            return _word_cues(itertools.chain([first], words))
+    return _utterances(raw)
+
+def export_srt(raw):
+    # SubRip subtitles
+    for index, u in enumerate(_cues(raw), 1):
+        yield f"{index}\n{format_timestamp(u['start'], ',')} --> {format_timestamp(u['end'], ',')}\n[Speaker {u['speaker']}] {u['text']}\n\n"
+
+def export_vtt(raw):
+    # WebVTT subtitles, the speaker as a voice tag
+    yield "WEBVTT\n\n"
+    for u in _cues(raw):
+        yield f"{format_timestamp(u['start'])} --> {format_timestamp(u['end'])}\n<v Speaker {u['speaker']}>{u['text']}\n\n"
+
+def export_txt(raw):
+    # Plain text, one paragraph per utterance
+    for u in _utterances(raw):
+        yield f"Speaker {u['speaker']} : {u['text']}\n\n"
+
+def export_json(raw):
+    # The raw transcript as JSON, the utterances being encoded one at a time
+    yield '{"summary": ' + json.dumps(raw.get('summary'), ensure_ascii=False)
+    yield ', "topics": ' + json.dumps(raw.get('topics') or {}, ensure_ascii=False)
+    yield ', "entities": ' + json.dumps(raw.get('entities') or [], ensure_ascii=False)
+    if not raw.get('utterances'):
+        yield ', "text": ' + json.dumps(raw.get('text') or '', ensure_ascii=False)
+    yield ', "utterances": ['
+    for index, u in enumerate(raw.get('utterances') or []):
+        yield (', ' if index else '') + json.dumps(u, ensure_ascii=False)
+    yield ']}\n'
+
+# Export format: (generator, MIME type, file extension)
+EXPORT_FORMATS = {
+    'srt': (export_srt, 'application/x-subrip', 'srt'),
+    'vtt': (export_vtt, 'text/vtt', 'vtt'),
+    'json': (export_json, 'application/json', 'json'),
+    'txt': (export_txt, 'text/plain', 'txt'),
+}
+
+def write_export(raw, export_format, file):
+    """
+    Writes an export of a raw transcript to a text file object.
+
+    Parameters:
+    - raw (dict): The raw transcript, as stored in the cache.
+    - export_format (str): One of EXPORT_FORMATS.
+
+    Returns:
+    - int: The number of characters written.
+    """
+    generator = EXPORT_FORMATS[export_format][0]
+    written = 0
+    for piece in generator(raw):
+        written += file.write(piece)
+    return written
+
+def export_path(key, raw, export_format):
+    """
+    Path of an export of a cached transcript, built on first request and reused by
+    every session afterwards (until the transcript is made again).
+
+    Parameters:
+    - key (str): The cache key of the transcript.
+    - raw (dict): Its raw transcript.
+    - export_format (str): One of EXPORT_FORMATS.
+    """
+    extension = EXPORT_FORMATS[export_format][2]
+    version = f"{key}|{','.join(raw.get('transcript_ids') or [])}"
+    path = os.path.join(EXPORTS_PATH, f"{hashlib.sha256(version.encode()).hexdigest()[:32]}.{extension}")
+    return _build(path, lambda f: write_export(raw, export_format, f))
+
+def markdown_path(transcript_id, output):
+    """
+    Path of the Markdown download of a stored transcript, named by its store ID
+    (a hash of the text, see transcript_store) so sessions downloading the same text share it.
+    """
+    return _build(os.path.join(EXPORTS_PATH, f"{transcript_id}.md"), lambda f: f.write(output))
+
+def _build(path, write):
+    # Write an export file once, atomically, or mark an existing one as recently used
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+    os.makedirs(EXPORTS_PATH, exist_ok=True)
+    temp = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp, 'w', encoding='utf-8') as f:
+        write(f)
+    os.replace(temp, path)
+    _prune()
+    return path
+
+def _prune():
+    # Keep the most recently used exports only
+    entries = []
+    for entry in os.scandir(EXPORTS_PATH):
+        if not entry.name.endswith('.tmp'):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass
+    for _, path in sorted(entries)[:-EXPORTS_MAX_FILES]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
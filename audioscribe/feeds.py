@@ -0,0 +1,393 @@
+import os
+import time
+import random
+import sqlite3
+import threading
+from email.utils import parsedate_to_datetime
+from xml.etree.ElementTree import XMLPullParser
+from concurrent.futures import ThreadPoolExecutor
+from audioscribe.http_client import provider_session, ServiceUnavailableError, BREAKER_COOLDOWN_SEC
+from audioscribe.metrics import count, observe
+
+# Podcast RSS subscriptions: every feed is checked on its own adaptive schedule with a
+# conditional GET (ETag / Last-Modified), so unchanged feeds cost a 304 and no parsing.
+# Changed feeds are parsed as they download and reading stops at the first known episodes.
+# New episodes are transcribed through the direct link path of the pipeline.
+FEEDS_PATH = os.path.join('.cache', 'feeds.sqlite3')
+FEED_DEFAULT_INTERVAL_SEC = 3600
+FEED_MIN_INTERVAL_SEC = 15 * 60
+FEED_MAX_INTERVAL_SEC = 24 * 3600
+# Feeds checked at the same time, and at most per pass
+FEED_MAX_WORKERS = 16
+FEED_BATCH = 500
+# Reading a changed feed stops after this many episodes in a row already known
+FEED_KNOWN_STOP = 3
+# Episodes transcribed when subscribing, the older ones are only recorded
+FEED_BACKFILL = 1
+FEED_TIMEOUT = (5, 30)
+
+ITUNES_NS = '{http://www.itunes.com/dtds/podcast-1.0.dtd}'
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+
+def _connect():
+    # Open a connection to the subscriptions database, creating it if needed
+    os.makedirs(os.path.dirname(FEEDS_PATH), exist_ok=True)
+    conn = sqlite3.connect(FEEDS_PATH, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS feeds (
+            url TEXT PRIMARY KEY,
+            title TEXT,
+            profile TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            interval REAL NOT NULL,
+            next_check REAL NOT NULL,
+            last_checked REAL,
+            failures INTEGER NOT NULL DEFAULT 0,
+            created REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS feeds_due ON feeds (next_check)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS episodes (
+            feed_url TEXT NOT NULL,
+            guid TEXT NOT NULL,
+            enclosure TEXT NOT NULL,
+            title TEXT,
+            link TEXT,
+            duration REAL,
+            published REAL,
+            state TEXT NOT NULL,
+            job_id TEXT,
+            created REAL NOT NULL,
+            PRIMARY KEY (feed_url, guid)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS episodes_enclosure ON episodes (enclosure)")
+    conn.execute("CREATE INDEX IF NOT EXISTS episodes_state ON episodes (state)")
+    return conn
+
+def subscribe(url, profile=None, backfill=FEED_BACKFILL):
+    """
+    Adds a feed, checked right away. Its latest `backfill` episodes are transcribed,
+    the older ones are recorded as skipped.
+    """
+    from audioscribe.clients import DEFAULT_PROFILE
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO feeds (url, profile, interval, next_check, created) VALUES (?, ?, ?, ?, ?)",
+            (url, profile or DEFAULT_PROFILE, FEED_DEFAULT_INTERVAL_SEC, now, now)
+        )
+    return check_feed(url, backfill=backfill)
+
+def unsubscribe(url):
+    # Remove a feed and the record of its episodes
+    with _connect() as conn:
+        conn.execute("DELETE FROM feeds WHERE url = ?", (url,))
+        conn.execute("DELETE FROM episodes WHERE feed_url = ?", (url,))
+
+def list_feeds():
+    # Every feed with its schedule and episode counts per state
+    with _connect() as conn:
+        conn.row_factory = sqlite3.Row
+        feeds = [dict(row) for row in conn.execute("SELECT * FROM feeds ORDER BY url")]
+        states = conn.execute("SELECT feed_url, state, COUNT(*) FROM episodes GROUP BY feed_url, state").fetchall()
+    for feed in feeds:
+        feed['episodes'] = {state: n for feed_url, state, n in states if feed_url == feed['url']}
+    return feeds
+
+def parse_duration(text):
+    # itunes:duration is "3723", "62:03" or "1:02:03"
+    if not text:
+        return None
+    try:
+        seconds = 0.0
+        for part in text.strip().split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        return None
+
+def _published(text):
+    try:
+        return parsedate_to_datetime(text).timestamp() if text else None
+    except (TypeError, ValueError):
+        return None
+
+def _item(elem):
+    # Episode of an RSS <item> or Atom <entry>, None without an audio enclosure
+    if elem.tag == 'item':
+        enclosure = elem.find('enclosure')
+        url = enclosure.get('url') if enclosure is not None else None
+        if not url or not (enclosure.get('type') or 'audio').startswith(('audio', 'video')):
+            return None
+        return {
+            'guid': (elem.findtext('guid') or url).strip(),
+            'enclosure': url.strip(),
+            'title': (elem.findtext('title') or '').strip() or None,
+            'link': (elem.findtext('link') or '').strip() or None,
+            'duration': parse_duration(elem.findtext(f'{ITUNES_NS}duration')),
+            'published': _published(elem.findtext('pubDate')),
+        }
+    links = elem.findall(f'{ATOM_NS}link')
+    url = next((link.get('href') for link in links if link.get('rel') == 'enclosure'), None)
+    if not url:
+        return None
+    alternate = next((link.get('href') for link in links if link.get('rel', 'alternate') == 'alternate'), None)
+    return {
+        'guid': (elem.findtext(f'{ATOM_NS}id') or url).strip(),
+        'enclosure': url.strip(),
+        'title': (elem.findtext(f'{ATOM_NS}title') or '').strip() or None,
+        'link': alternate,
+        'duration': parse_duration(elem.findtext(f'{ITUNES_NS}duration')),
+        'published': None,
+    }
+
+def read_feed(chunks, is_known):
+    """
+    Parses a feed while it downloads, newest episodes first as feeds list them.
+
+    Parameters:
+    - chunks (iterable): The bytes of the feed, e.g. response.iter_content().
+    - is_known (callable): Tells whether an episode guid was already seen.
+
+    Returns:
+    - tuple: (feed title, new episodes). Reading stops after FEED_KNOWN_STOP known episodes in a row.
+    """
+    parser = XMLPullParser(events=('end',))
+    title = None
+    episodes = []
+    known = 0
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, elem in parser.read_events():
+            if elem.tag in ('item', f'{ATOM_NS}entry'):
+                episode = _item(elem)
+                # Items are dropped once read, the feed is never held in memory
+                elem.clear()
+                if episode is None:
+                    continue
+                if is_known(episode['guid']):
+                    known += 1
+                    if known >= FEED_KNOWN_STOP:
+                        return title, episodes
+                else:
+                    known = 0
+                    episodes.append(episode)
+            elif elem.tag in ('title', f'{ATOM_NS}title') and title is None and not episodes and not known:
+                title = (elem.text or '').strip() or None
+    parser.close()
+    return title, episodes
+
+def _next_interval(interval, new_episodes, failures):
+    # Shorter after new episodes, longer while nothing changes, backed off on errors, with jitter to spread the checks
+    if failures:
+        interval = min(FEED_MAX_INTERVAL_SEC, FEED_DEFAULT_INTERVAL_SEC * 2 ** min(failures, 6))
+    elif new_episodes:
+        interval = max(FEED_MIN_INTERVAL_SEC, interval / 2)
+    else:
+        interval = min(FEED_MAX_INTERVAL_SEC, interval * 1.5)
+    return interval * random.uniform(0.9, 1.1)
+
+def check_feed(url, backfill=None):
+    """
+    Checks one feed with a conditional GET and enqueues the transcription of its new episodes.
+
+    Parameters:
+    - url (str): The feed URL, subscribed beforehand.
+    - backfill (int): On a first check, the number of latest episodes to transcribe.
+
+    Returns:
+    - list: The new episodes found.
+    """
+    with _connect() as conn:
+        conn.row_factory = sqlite3.Row
+        feed = conn.execute("SELECT * FROM feeds WHERE url = ?", (url,)).fetchone()
+        known_guids = {row[0] for row in conn.execute("SELECT guid FROM episodes WHERE feed_url = ?", (url,))}
+    if feed is None:
+        raise ValueError(f"Not subscribed to {url}")
+    first_check = feed['last_checked'] is None
+
+    headers = {}
+    if feed['etag']:
+        headers['If-None-Match'] = feed['etag']
+    if feed['last_modified']:
+        headers['If-Modified-Since'] = feed['last_modified']
+    started = time.perf_counter()
+    title, episodes, failures, skipped = feed['title'], [], 0, False
+    etag, last_modified = feed['etag'], feed['last_modified']
+    try:
+        response = provider_session('feeds').get(url, headers=headers, stream=True, timeout=FEED_TIMEOUT)
+        try:
+            if response.status_code == 304:
+                count('audioscribe_feed_checks_total', result='not_modified')
+            elif response.status_code == 200:
+                title, episodes = read_feed(response.iter_content(chunk_size=16 * 1024), known_guids.__contains__)
+                title = title or feed['title']
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                count('audioscribe_feed_checks_total', result='changed' if episodes else 'unchanged')
+            else:
+                raise ValueError(f"HTTP {response.status_code}")
+        finally:
+            response.close()
+    except ServiceUnavailableError as e:
+        # The breaker of its host is open: not a failure of this feed, checked again after the cooldown
+        print(f"feed {url} check skipped:", e)
+        count('audioscribe_feed_checks_total', result='skipped')
+        failures, skipped = feed['failures'], True
+    except Exception as e:
+        print(f"feed {url} check failed:", e)
+        count('audioscribe_feed_checks_total', result='error')
+        failures = feed['failures'] + 1
+    observe('audioscribe_feed_check_seconds', time.perf_counter() - started)
+
+    now = time.time()
+    if first_check and backfill is None:
+        backfill = FEED_BACKFILL
+    if skipped:
+        with _connect() as conn:
+            conn.execute("UPDATE feeds SET next_check = ? WHERE url = ?", (now + BREAKER_COOLDOWN_SEC * random.uniform(1, 1.5), url))
+        return []
+    interval = _next_interval(feed['interval'], bool(episodes) and not first_check, failures)
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE feeds SET title = ?, etag = ?, last_modified = ?, interval = ?, next_check = ?, last_checked = ?, failures = ? WHERE url = ?",
+            (title, etag, last_modified, interval, now + interval, now, failures, url)
+        )
+        for index, episode in enumerate(episodes):
+            state = 'skipped' if first_check and index >= backfill else 'new'
+            conn.execute(
+                "INSERT OR IGNORE INTO episodes (feed_url, guid, enclosure, title, link, duration, published, state, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, episode['guid'], episode['enclosure'], episode['title'], episode['link'], episode['duration'], episode['published'], state, now)
+            )
+    if episodes:
+        print(f"feed {title or url}: {len(episodes)} new episodes")
+    enqueue_episodes(url, feed['profile'], title)
+    return episodes
+
+def enqueue_episodes(feed_url, profile, feed_title=None):
+    """
+    Submits the transcription of the new episodes of a feed to the job pool.
+    An episode whose audio was already transcribed or queued, from this feed or another one, isn't submitted again.
+    """
+    from audioscribe.cache import source_key
+    from audioscribe.jobs import submit_job
+    from audioscribe.pipeline import cached_transcript
+
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT guid, enclosure, title, link, duration FROM episodes WHERE feed_url = ? AND state = 'new' ORDER BY published",
+            (feed_url,)
+        ).fetchall()
+    for guid, enclosure, title, link, duration in rows:
+        cache_key = source_key('dt', enclosure)
+        with _connect() as conn:
+            duplicate = conn.execute(
+                "SELECT 1 FROM episodes WHERE enclosure = ? AND state IN ('queued', 'done') LIMIT 1", (enclosure,)
+            ).fetchone()
+        if duplicate:
+            state, job_id = 'duplicate', None
+        elif cached_transcript(cache_key, profile) is not None:
+            state, job_id = 'done', None
+        else:
+            job_id = submit_job(
+                transcribe_episode, enclosure, title or feed_title or 'Not available', link or enclosure, duration, cache_key, profile,
+                job_key=f"{cache_key}#{profile}",
+            )
+            state = 'queued'
+            count('audioscribe_feed_episodes_total', result='queued')
+        with _connect() as conn:
+            conn.execute("UPDATE episodes SET state = ?, job_id = ? WHERE feed_url = ? AND guid = ?", (state, job_id, feed_url, guid))
+
+def transcribe_episode(enclosure, title, link, duration, cache_key, profile, report):
+    # Transcribe a feed episode as a direct link, probing its duration when the feed doesn't give it
+    from audioscribe.pipeline import resolve_source, transcribe_audio
+
+    if not duration:
+        service_code, data = resolve_source(enclosure)
+        duration = data['audio_length_sec'] if isinstance(data, dict) else 0
+    return transcribe_audio(enclosure, title, link, duration, cache_key, profile=profile, report=report)
+
+def update_episode_states():
+    """
+    Records the outcome of the queued episodes whose job ended, 'done' and 'failed' being final.
+    Episodes whose job was lost (e.g. on a restart or between two `feeds check` runs) get the outcome
+    recorded by the cache or the job journal, and are otherwise set back to new, to be submitted again:
+    the job journal then resumes their provider job rather than paying for it twice.
+    """
+    from audioscribe.cache import source_key
+    from audioscribe.jobs import get_job
+    from audioscribe.job_journal import journal_state
+    from audioscribe.pipeline import cached_transcript, transcription_key
+
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT e.feed_url, e.guid, e.job_id, e.enclosure, f.profile FROM episodes e JOIN feeds f ON f.url = e.feed_url"
+            " WHERE e.state = 'queued'"
+        ).fetchall()
+    updates = []
+    for feed_url, guid, job_id, enclosure, profile in rows:
+        job = get_job(job_id) if job_id else None
+        if job is None:
+            cache_key = source_key('dt', enclosure)
+            if cached_transcript(cache_key, profile) is not None:
+                updates.append(('done', feed_url, guid))
+            elif journal_state(transcription_key(enclosure, cache_key, profile)) in ('failed', 'abandoned'):
+                updates.append(('failed', feed_url, guid))
+                count('audioscribe_feed_episodes_total', result='failed')
+            else:
+                updates.append(('new', feed_url, guid))
+        elif job['status'] == 'completed':
+            updates.append(('done', feed_url, guid))
+        elif job['status'] == 'error':
+            updates.append(('failed', feed_url, guid))
+            count('audioscribe_feed_episodes_total', result='failed')
+    if updates:
+        with _connect() as conn:
+            conn.executemany("UPDATE episodes SET state = ? WHERE feed_url = ? AND guid = ?", updates)
+            conn.row_factory = sqlite3.Row
+            feeds = conn.execute(
+                "SELECT url, profile, title FROM feeds WHERE url IN (SELECT feed_url FROM episodes WHERE state = 'new')"
+            ).fetchall()
+        for feed in feeds:
+            enqueue_episodes(feed['url'], feed['profile'], feed['title'])
+    return updates
+
+def check_due_feeds(limit=FEED_BATCH):
+    """
+    Checks the feeds whose next check is due, on a bounded thread pool.
+
+    Returns:
+    - int: The number of feeds checked.
+    """
+    update_episode_states()
+    with _connect() as conn:
+        due = [row[0] for row in conn.execute(
+            "SELECT url FROM feeds WHERE next_check <= ? ORDER BY next_check LIMIT ?", (time.time(), limit)
+        )]
+    if due:
+        with ThreadPoolExecutor(max_workers=FEED_MAX_WORKERS, thread_name_prefix='audioscribe-feed') as executor:
+            list(executor.map(check_feed, due))
+    return len(due)
+
+def next_due_in():
+    # Seconds until the next feed check is due, None without any feed
+    with _connect() as conn:
+        row = conn.execute("SELECT MIN(next_check) FROM feeds").fetchone()
+    return None if row[0] is None else max(0.0, row[0] - time.time())
+
+def watch_feeds(stop=None, max_sleep=60):
+    """
+    Checks the feeds as they become due until `stop` (a threading.Event) is set.
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        checked = check_due_feeds()
+        if checked:
+            print(f"{checked} feeds checked")
+        wait = next_due_in()
+        stop.wait(max_sleep if wait is None else min(max_sleep, max(1.0, wait)))
@@ -0,0 +1,122 @@
+import os
+import time
+import sqlite3
+import threading
+
+# Observed stage timings of past jobs, used to predict the waiting time of new ones
+HISTORY_PATH = os.path.join('.cache', 'history.sqlite3')
+# Samples used to fit a stage, most recent first
+HISTORY_FIT_SAMPLES = 200
+HISTORY_REFIT_SEC = 300
+
+# Stages of a job, in order. The provider statuses (queued, processing) are only known at
+# status checks, their boundary can't be timed reliably so they form a single stage
+STAGES = ['submitting', 'provider', 'formatting']
+STAGE_OF_STATUS = {'queued': 'provider', 'processing': 'provider'}
+# Used until enough jobs have been observed: (fixed seconds, seconds per second of audio)
+DEFAULT_MODEL = {
+    'submitting': (2.0, 0.0),
+    'provider': (15.0, 0.15),
+    'formatting': (0.5, 0.0),
+}
+# Jobs of the same source service needed before the fit is specific to it
+HISTORY_MIN_SAMPLES = 3
+
+_models = {}
+_lock = threading.Lock()
+
+def _connect():
+    os.makedirs(os.path.dirname(HISTORY_PATH), exist_ok=True)
+    conn = sqlite3.connect(HISTORY_PATH, timeout=10)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS timings (
+            service TEXT NOT NULL,
+            features TEXT NOT NULL,
+            duration REAL NOT NULL,
+            stage TEXT NOT NULL,
+            seconds REAL NOT NULL,
+            created REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS timings_fit ON timings (features, stage, created)")
+    conn.execute("CREATE INDEX IF NOT EXISTS timings_service ON timings (features, service, stage, created)")
+    return conn
+
+def record_timings(service, duration, features, timings):
+    """
+    Stores the observed stage timings of a finished job.
+
+    Parameters:
+    - service (str): The service code of the source ('ln', 'yt'...).
+    - duration (float): The audio duration in seconds.
+    - features (str): The enabled transcription features (profile name).
+    - timings (dict): Seconds spent in each stage.
+    """
+    now = time.time()
+    with _connect() as conn:
+        conn.executemany(
+            "INSERT INTO timings (service, features, duration, stage, seconds, created) VALUES (?, ?, ?, ?, ?, ?)",
+            [(service, features, float(duration or 0), stage, seconds, now) for stage, seconds in timings.items()]
+        )
+
+def _fit(rows):
+    # Least squares fit of seconds = a + b * duration
+    n = len(rows)
+    mean_x = sum(x for x, _ in rows) / n
+    mean_y = sum(y for _, y in rows) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in rows)
+    if var_x == 0:
+        return (mean_y, 0.0)
+    slope = max(0.0, sum((x - mean_x) * (y - mean_y) for x, y in rows) / var_x)
+    return (max(0.0, mean_y - slope * mean_x), slope)
+
+def stage_model(features, service=None):
+    """
+    Returns {stage: (a, b)} so that a stage takes about a + b * duration seconds,
+    fitted on the recent history of jobs with the same features, and of the same source
+    service once it has enough of them (remote sources are fetched by the provider,
+    uploads aren't). Refitted every few minutes.
+    """
+    with _lock:
+        cached = _models.get((features, service))
+        if cached is not None and time.monotonic() - cached[0] < HISTORY_REFIT_SEC:
+            return cached[1]
+    model = dict(DEFAULT_MODEL)
+    with _connect() as conn:
+        for stage in STAGES:
+            rows = []
+            if service is not None:
+                rows = conn.execute(
+                    "SELECT duration, seconds FROM timings WHERE features = ? AND service = ? AND stage = ? ORDER BY created DESC LIMIT ?",
+                    (features, service, stage, HISTORY_FIT_SAMPLES)
+                ).fetchall()
+            if len(rows) < HISTORY_MIN_SAMPLES:
+                rows = conn.execute(
+                    "SELECT duration, seconds FROM timings WHERE features = ? AND stage = ? ORDER BY created DESC LIMIT ?",
+                    (features, stage, HISTORY_FIT_SAMPLES)
+                ).fetchall()
+            if len(rows) >= HISTORY_MIN_SAMPLES:
+                model[stage] = _fit(rows)
+    with _lock:
+        _models[features, service] = (time.monotonic(), model)
+    return model
+
+def estimate_remaining(features, duration, stage, stage_elapsed, service=None):
+    """
+    Predicts the seconds left for a job in `stage` (a stage or a provider status) since `stage_elapsed` seconds.
+
+    Returns:
+    - tuple: (remaining_sec, total_sec), the total being the predicted duration of the whole job.
+    """
+    model = stage_model(features, service)
+    stage = STAGE_OF_STATUS.get(stage, stage)
+    duration = float(duration or 0)
+    estimates = {name: a + b * duration for name, (a, b) in model.items()}
+    total = sum(estimates.values())
+    if stage not in STAGES:
+        return total, total
+    index = STAGES.index(stage)
+    # A stage running late is assumed to be almost done rather than to have a negative remaining time
+    current = max(estimates[stage] - stage_elapsed, estimates[stage] * 0.1)
+    remaining = current + sum(estimates[name] for name in STAGES[index + 1:])
+    return remaining, total
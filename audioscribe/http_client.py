@@ -0,0 +1,276 @@
+import time
+import random
+import functools
+import threading
+from audioscribe.config import get_secret
+from audioscribe.metrics import observe, count, gauge
+
+# One outbound policy for every external service: keep-alive connection pools,
+# a token-bucket rate limit per provider shared by every session of the process,
+# retries with jittered exponential backoff and a circuit breaker.
+
+# Requests per second and burst per provider, can be overridden in a [rate_limits]
+# secrets section, e.g. listennotes = 2 (or [2, 5] for the burst as well)
+RATE_LIMITS = {
+    'listennotes': (5, 10),
+    'spotify': (10, 20),
+    'assemblyai': (20, 40),
+    'youtube': (2, 5),
+    'direct': (10, 20),
+    'feeds': (20, 50),
+}
+# Providers made of many independent hosts (podcast CDNs, feed servers): their rate limit
+# and circuit breaker apply to each host apart, with the limits of the provider
+PER_HOST_PROVIDERS = ('direct', 'feeds')
+HTTP_RETRIES = 3
+HTTP_BACKOFF_BASE_SEC = 0.5
+HTTP_BACKOFF_MAX_SEC = 30
+HTTP_POOL_SIZE = 16
+# Statuses worth another attempt, only 429 for non-idempotent methods (the request was refused, not processed)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+# The breaker opens after this many failures in a row, and lets a trial request through after the cooldown
+BREAKER_FAILURES = 5
+BREAKER_COOLDOWN_SEC = 30
+
+class ServiceUnavailableError(Exception):
+    # Raised without calling a provider while its circuit breaker is open
+    pass
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average and bursts of `capacity` requests.
+    acquire() blocks until a token is available.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.waiting = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        # Returns the seconds spent waiting for a token
+        started = time.monotonic()
+        queued = False
+        while True:
+            with self.lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    if queued:
+                        self.waiting -= 1
+                    return time.monotonic() - started, self.waiting
+                if not queued:
+                    queued = True
+                    self.waiting += 1
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+class CircuitBreaker:
+    """
+    Counts the consecutive failures of a provider. Once open, requests fail fast
+    until the cooldown is over, then one trial request decides whether it closes again.
+    """
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN_SEC):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened is None:
+                return True
+            if time.monotonic() - self.opened >= self.cooldown:
+                # Half-open: let one request through, the next failure reopens it
+                self.opened = time.monotonic()
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+
+    def failure(self):
+        # Returns True if this failure opened the breaker
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.max_failures and self.opened is None:
+                self.opened = time.monotonic()
+                return True
+            if self.opened is not None:
+                self.opened = time.monotonic()
+            return False
+
+    @property
+    def is_open(self):
+        return self.opened is not None
+
+_buckets = {}
+_breakers = {}
+_lock = threading.Lock()
+
+def rate_limiter(provider, host=None):
+    # Token bucket of a provider (or of one of its hosts), shared by the whole process
+    with _lock:
+        if (provider, host) not in _buckets:
+            limit = get_secret(f'rate_limits.{provider}', RATE_LIMITS.get(provider, (10, 20)))
+            if isinstance(limit, str):
+                # From an environment variable, e.g. AUDIOSCRIBE_RATE_LIMITS_LISTENNOTES="2,5"
+                limit = [float(value) for value in limit.split(',')]
+            if isinstance(limit, (int, float)) or len(limit) == 1:
+                rate = limit if isinstance(limit, (int, float)) else limit[0]
+                limit = (rate, rate * 2)
+            rate, capacity = limit
+            _buckets[provider, host] = TokenBucket(rate, capacity)
+        return _buckets[provider, host]
+
+def circuit_breaker(provider, host=None):
+    # Circuit breaker of a provider (or of one of its hosts), shared by the whole process
+    with _lock:
+        if (provider, host) not in _breakers:
+            _breakers[provider, host] = CircuitBreaker()
+        return _breakers[provider, host]
+
+def throttle(provider, host=None):
+    # Wait for the rate limit of a provider (or of one of its hosts) before calling it
+    waited, queue_depth = rate_limiter(provider, host).acquire()
+    gauge('audioscribe_http_queue_depth', queue_depth, provider=provider)
+    if waited > 0.001:
+        count('audioscribe_http_throttled_total', provider=provider)
+        observe('audioscribe_http_throttle_seconds', waited, provider=provider)
+
+def backoff_delay(attempt, retry_after=None):
+    # Full jitter exponential backoff, or the delay asked by the server
+    if retry_after is not None:
+        try:
+            return min(HTTP_BACKOFF_MAX_SEC, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    return random.uniform(0, min(HTTP_BACKOFF_MAX_SEC, HTTP_BACKOFF_BASE_SEC * 2 ** attempt))
+
+def send(provider, method, attempt, retries=HTTP_RETRIES, retry_exceptions=(), host=None):
+    """
+    Calls attempt() under the policy of a provider and returns its response.
+
+    Parameters:
+    - provider (str): The provider name, see RATE_LIMITS.
+    - method (str): The HTTP method, non-idempotent requests are only retried on 429.
+    - attempt (callable): Sends the request once, returns a response with status_code and headers.
+    - retries (int): Extra attempts after a retryable failure, 0 when the body can't be sent twice.
+    - retry_exceptions (tuple): Transport errors worth another attempt (connection reset, timeout...).
+    - host (str): The host called, for the providers of PER_HOST_PROVIDERS.
+    """
+    breaker = circuit_breaker(provider, host)
+    name = f"{provider} ({host})" if host else provider
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    for index in range(retries + 1):
+        if not breaker.allow():
+            count('audioscribe_http_requests_total', provider=provider, status='circuit_open')
+            raise ServiceUnavailableError(f"{name} is unavailable after repeated failures, retry in a moment")
+        throttle(provider, host)
+        started = time.perf_counter()
+        try:
+            response = attempt()
+        except retry_exceptions as e:
+            count('audioscribe_http_requests_total', provider=provider, status='error')
+            _failure(provider, name, breaker)
+            if index == retries or not idempotent:
+                raise
+            print(f"{name} request failed ({e}), attempt {index + 1} of {retries + 1}")
+            time.sleep(backoff_delay(index))
+            continue
+        observe('audioscribe_http_request_seconds', time.perf_counter() - started, provider=provider)
+        status = response.status_code
+        count('audioscribe_http_requests_total', provider=provider, status=str(status))
+        if status >= 500:
+            _failure(provider, name, breaker)
+        else:
+            breaker.success()
+            gauge('audioscribe_http_circuit_open', 0, provider=provider)
+        if status in RETRY_STATUSES and index < retries and (idempotent or status == 429):
+            count('audioscribe_http_retries_total', provider=provider, status=str(status))
+            delay = backoff_delay(index, response.headers.get('Retry-After'))
+            response.close()
+            time.sleep(delay)
+            continue
+        return response
+
+def _failure(provider, name, breaker):
+    if breaker.failure():
+        print(f"circuit breaker open for {name}")
+    if breaker.is_open:
+        gauge('audioscribe_http_circuit_open', 1, provider=provider)
+
+@functools.lru_cache(maxsize=None)
+def provider_session(provider):
+    """
+    A requests.Session with a keep-alive connection pool whose requests go through send().
+    Extra keyword argument of its requests: retries (0 for streamed bodies).
+    """
+    import requests
+    from urllib.parse import urlparse
+    from requests.adapters import HTTPAdapter
+
+    class ProviderSession(requests.Session):
+        def request(self, method, url, retries=HTTP_RETRIES, **kwargs):
+            parent = super().request
+            return send(
+                provider, method, lambda: parent(method, url, **kwargs),
+                retries=retries, retry_exceptions=(requests.ConnectionError, requests.Timeout),
+                host=urlparse(url).hostname if provider in PER_HOST_PROVIDERS else None,
+            )
+
+    session = ProviderSession()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def guard_httpx_client(client, provider):
+    """
+    Routes the requests of an httpx client (AssemblyAI SDK) through send(),
+    by wrapping its transport. The client keeps its own connection pool.
+    """
+    import httpx
+
+    class ProviderTransport(httpx.BaseTransport):
+        def __init__(self, transport):
+            self.provider = provider
+            self.transport = transport
+
+        def handle_request(self, request):
+            return send(
+                provider, request.method, lambda: self.transport.handle_request(request),
+                retry_exceptions=(httpx.TransportError,),
+            )
+
+        def close(self):
+            self.transport.close()
+
+    with _lock:
+        # Already guarded, e.g. by another thread building the same client
+        if getattr(client._transport, 'provider', None) is None:
+            client._transport = ProviderTransport(client._transport)
+    return client
+
+def http_stats():
+    # Queue depth, available tokens and breaker state of every provider (and host) used so far
+    with _lock:
+        buckets, breakers = dict(_buckets), dict(_breakers)
+    return {
+        f"{provider}:{host}" if host else provider: {
+            'waiting': buckets[provider, host].waiting if (provider, host) in buckets else 0,
+            'tokens': round(buckets[provider, host].tokens, 1) if (provider, host) in buckets else None,
+            'circuit_open': breakers[provider, host].is_open if (provider, host) in breakers else False,
+        }
+        for provider, host in set(buckets) | set(breakers)
+    }
@@ -0,0 +1,94 @@
+import os
+import time
+import sqlite3
+
+# Every provider job is written here once submitted and before any polling, so that
+# its transcript ID survives a restart of the process or a closed tab. Unfinished
+# jobs are resumed on startup instead of being submitted (and paid for) again.
+JOURNAL_PATH = os.path.join('.cache', 'jobs.sqlite3')
+# Older unfinished jobs aren't resumed, the provider may have dropped them
+JOURNAL_MAX_AGE_SEC = 3 * 24 * 3600
+# Finished entries are kept this long for inspection
+JOURNAL_TTL_SEC = 30 * 24 * 3600
+
+def _connect():
+    # Open a connection to the journal database, creating it if needed
+    os.makedirs(os.path.dirname(JOURNAL_PATH), exist_ok=True)
+    conn = sqlite3.connect(JOURNAL_PATH, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            transcript_id TEXT PRIMARY KEY,
+            job_key TEXT NOT NULL,
+            cache_key TEXT,
+            profile TEXT NOT NULL,
+            audio_url TEXT NOT NULL,
+            title TEXT,
+            link TEXT,
+            audio_length_sec REAL,
+            audio_bytes INTEGER,
+            state TEXT NOT NULL,
+            error TEXT,
+            created REAL NOT NULL,
+            updated REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (state, job_key)")
+    return conn
+
+def journal_submitted(transcript_id, job_key, source):
+    """
+    Records a job just submitted to the provider, in the 'polling' state.
+
+    Parameters:
+    - transcript_id (str): The provider job ID.
+    - job_key (str): The key shared by every request for the same source and profile.
+    - source (dict): 'cache_key', 'profile', 'audio_url', 'title', 'link', 'audio_length_sec' and 'audio_bytes'.
+    """
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (transcript_id, job_key, cache_key, profile, audio_url, title, link,"
+            " audio_length_sec, audio_bytes, state, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'polling', ?, ?)",
+            (
+                transcript_id, job_key, source.get('cache_key'), source['profile'], source['audio_url'], source.get('title'),
+                source.get('link'), float(source.get('audio_length_sec') or 0), source.get('audio_bytes'), now, now,
+            )
+        )
+
+def journal_finished(transcript_id, state, error=None):
+    # Mark a job 'completed', 'failed' or 'abandoned'
+    now = time.time()
+    with _connect() as conn:
+        conn.execute("UPDATE jobs SET state = ?, error = ?, updated = ? WHERE transcript_id = ?", (state, error, now, transcript_id))
+        conn.execute("DELETE FROM jobs WHERE state != 'polling' AND updated < ?", (now - JOURNAL_TTL_SEC,))
+
+def journal_find(job_key):
+    # Transcript ID of the unfinished job of a source and profile, None if there is none
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT transcript_id FROM jobs WHERE job_key = ? AND state = 'polling' AND created > ? ORDER BY created DESC LIMIT 1",
+            (job_key, time.time() - JOURNAL_MAX_AGE_SEC)
+        ).fetchone()
+    return row[0] if row else None
+
+def journal_state(job_key):
+    # State of the latest job of a source and profile, None if it was never submitted
+    with _connect() as conn:
+        row = conn.execute("SELECT state FROM jobs WHERE job_key = ? ORDER BY created DESC LIMIT 1", (job_key,)).fetchone()
+    return row[0] if row else None
+
+def journal_pending():
+    """
+    Returns the unfinished jobs young enough to be resumed, oldest first, as dicts.
+    Older ones are marked 'abandoned'.
+    """
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET state = 'abandoned', updated = ? WHERE state = 'polling' AND created <= ?",
+            (now, now - JOURNAL_MAX_AGE_SEC)
+        )
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT * FROM jobs WHERE state = 'polling' ORDER BY created").fetchall()
+    return [dict(row) for row in rows]
@@ -0,0 +1,96 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from audioscribe.transcript_store import store_put
+
+# Transcriptions running at the same time in this process, whatever the number of sessions
+JOB_MAX_WORKERS = 8
+# Finished jobs are forgotten after this delay
+JOB_TTL_SEC = 3600
+
+_executor = ThreadPoolExecutor(max_workers=JOB_MAX_WORKERS, thread_name_prefix='audioscribe-job')
+_jobs = {}
+# Job ID of the unfinished job of each job key
+_inflight = {}
+_lock = threading.Lock()
+
+def _update(job_id, **fields):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            job.update(fields, updated=time.time())
+
+def _prune():
+    # Forget the jobs finished for a while, called with the lock held
+    limit = time.time() - JOB_TTL_SEC
+    for job_id in [j['id'] for j in _jobs.values() if j['status'] in ('completed', 'error') and j['updated'] < limit]:
+        del _jobs[job_id]
+
+def _finish(job_id, job_key, **fields):
+    _update(job_id, **fields)
+    with _lock:
+        if job_key is not None and _inflight.get(job_key) == job_id:
+            del _inflight[job_key]
+
+def _run(job_id, job_key, fn, args, kwargs):
+    _update(job_id, status='running')
+    report = lambda **fields: _update(job_id, **fields)
+    try:
+        result = fn(*args, report=report, **kwargs)
+    except Exception as e:
+        print(f"job {job_id} failed:", e)
+        _finish(job_id, job_key, status='error', error=str(e))
+    else:
+        if isinstance(result, str):
+            # Transcripts are held once by the store, the job only keeps their ID
+            result = store_put(result)
+        _finish(job_id, job_key, status='completed', result=result)
+
+def submit_job(fn, *args, job_key=None, **kwargs):
+    """
+    Runs fn(*args, report=..., **kwargs) on the shared worker pool.
+    fn can call report(stage=..., ...) to publish progress fields on its job.
+    While a job with the same job_key is unfinished, its ID is returned instead of
+    starting a new one, so every session asking for the same source shares its outcome.
+
+    Returns:
+    - str: The job ID to pass to get_job().
+    """
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _lock:
+        _prune()
+        if job_key is not None and job_key in _inflight:
+            print(f"job {_inflight[job_key]} already running for {job_key}")
+            return _inflight[job_key]
+        if job_key is not None:
+            _inflight[job_key] = job_id
+        _jobs[job_id] = {
+            'id': job_id,
+            'status': 'queued',
+            'stage': None,
+            'result': None,
+            'error': None,
+            'created': now,
+            'updated': now,
+        }
+    _executor.submit(_run, job_id, job_key, fn, args, kwargs)
+    return job_id
+
+def get_job(job_id):
+    """
+    Returns a snapshot of a job, or None if it is unknown (e.g. after a server restart).
+    Status is one of 'queued', 'running', 'completed', 'error'.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+def job_stats():
+    # Number of jobs per status
+    with _lock:
+        stats = {}
+        for job in _jobs.values():
+            stats[job['status']] = stats.get(job['status'], 0) + 1
+        return stats
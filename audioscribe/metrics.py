@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+# Per-stage spans of the pipeline: every span is logged as a JSON line on the
+# "audioscribe.trace" logger and aggregated for a Prometheus-style text export.
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+trace_logger = logging.getLogger('audioscribe.trace')
+_histograms = {}
+_counters = {}
+_gauges = {}
+_lock = threading.Lock()
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def observe(name, value, **labels):
+    # Record one value in the histogram `name`
+    key = (name, _labels_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * len(DURATION_BUCKETS), 'sum': 0.0, 'count': 0}
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                histogram['buckets'][index] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+def count(name, value=1, **labels):
+    # Increment the counter `name`
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def gauge(name, value, **labels):
+    # Set the current value of the gauge `name`
+    key = (name, _labels_key(labels))
+    with _lock:
+        _gauges[key] = value
+
+@contextmanager
+def span(stage, **attrs):
+    """
+    Times a stage of the pipeline:
+
+        with span('upload', service='dt') as s:
+            ...
+            s['bytes'] = size
+
+    The yielded dict can be filled with attributes (sizes, cache hits...) logged with the span.
+    """
+    started = time.perf_counter()
+    record = dict(attrs)
+    try:
+        yield record
+    except BaseException as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        status = 'error' if 'error' in record else 'ok'
+        observe('audioscribe_stage_duration_seconds', duration, stage=stage)
+        count('audioscribe_stage_total', stage=stage, status=status)
+        if isinstance(record.get('bytes'), (int, float)):
+            count('audioscribe_stage_bytes_total', record['bytes'], stage=stage)
+        trace_logger.info(json.dumps(dict(record, stage=stage, status=status, duration=round(duration, 4), ts=time.time()), default=str))
+
+def render_prometheus():
+    # Text exposition format of every metric recorded so far
+    lines = []
+    with _lock:
+        histograms = {key: dict(value, buckets=list(value['buckets'])) for key, value in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+    names = set()
+    for (name, labels), histogram in sorted(histograms.items()):
+        if name not in names:
+            lines.append(f"# TYPE {name} histogram")
+            names.add(name)
+        label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+        for bound, value in zip(DURATION_BUCKETS, histogram['buckets']):
+            lines.append(f'{name}_bucket{{{label_text}{"," if label_text else ""}le="{bound}"}} {value}')
+        lines.append(f'{name}_bucket{{{label_text}{"," if label_text else ""}le="+Inf"}} {histogram["count"]}')
+        lines.append(f"{name}_sum{{{label_text}}} {histogram['sum']:.6f}")
+        lines.append(f"{name}_count{{{label_text}}} {histogram['count']}")
+    for (name, labels), value in sorted(counters.items()):
+        if name not in names:
+            lines.append(f"# TYPE {name} counter")
+            names.add(name)
+        label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+        lines.append(f"{name}{{{label_text}}} {value}")
+    for (name, labels), value in sorted(gauges.items()):
+        if name not in names:
+            lines.append(f"# TYPE {name} gauge")
+            names.add(name)
+        label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+        lines.append(f"{name}{{{label_text}}} {value}")
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path):
+    # Write the metrics to a file, e.g. for the node_exporter textfile collector
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(render_prometheus())
+    os.replace(temp_path, path)
+
+_metrics_server = None
+
+def start_metrics_server(port=9108, host='0.0.0.0'):
+    """
+    Serves the metrics on http://host:port/metrics, once per process.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    global _metrics_server
+    with _lock:
+        if _metrics_server is not None:
+            return _metrics_server
+
+        class _MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                data = render_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        _metrics_server.daemon_threads = True
+        threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+        print(f"metrics served on {host}:{port}/metrics")
+        return _metrics_server
+
+def configure_metrics():
+    """
+    Applies the optional [metrics] secrets section, e.g.:
+        [metrics]
+        log = "trace.jsonl"   # or "stderr"
+        port = 9108
+    """
+    from audioscribe.config import get_secret
+    settings = get_secret('metrics') or {}
+    if settings.get('log'):
+        configure_trace_log(None if settings['log'] == 'stderr' else settings['log'])
+    if settings.get('port'):
+        start_metrics_server(int(settings['port']))
+
+def configure_trace_log(path=None):
+    """
+    Sends the JSON span lines to a file (or stderr if path is None), once per process.
+    """
+    if trace_logger.handlers:
+        return
+    handler = logging.FileHandler(path) if path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    trace_logger.addHandler(handler)
+    trace_logger.setLevel(logging.INFO)
+    trace_logger.propagate = False
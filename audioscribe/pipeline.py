@@ -0,0 +1,800 @@
+import re
+import time
+import threading
+from functools import partial
+from types import SimpleNamespace
+from audioscribe.config import get_secret
+from audioscribe.clients import (
+    endpoint,
+    listennotes_client,
+    spotify_client,
+    assemblyai,
+    transcriber,
+    youtube_extractor,
+    PROFILES,
+    DEFAULT_PROFILE,
+    profile_fallbacks
+)
+from audioscribe.utils import (
+    upload_file_stream,
+    insert_spaces,
+    youtube_url_is_playlist
+)
+from audioscribe.cache import (
+    source_key,
+    cache_get,
+    cache_put
+)
+from audioscribe.resolution_cache import (
+    resolution_get,
+    resolution_put
+)
+from audioscribe.singleflight import single_flight
+from audioscribe.spotify_mapping import mapping_get, mapping_put, best_match, MATCH_MIN_SCORE
+from audioscribe.history import record_timings, STAGE_OF_STATUS
+from audioscribe.job_journal import journal_submitted, journal_finished, journal_find, journal_pending
+from audioscribe.jobs import submit_job
+from audioscribe.search_index import index_transcript
+from audioscribe.word_timings import transcript_words, write_words
+from audioscribe.metrics import span, count
+from audioscribe.http_client import throttle, ServiceUnavailableError
+from audioscribe.audio_probe import probe_remote_audio
+from audioscribe.polling import (
+    TranscriptionError,
+    TranscriptRejectedError,
+    ProviderUnreachableError,
+    wait_for_transcript
+)
+from audioscribe.chunking import (
+    segment_bounds,
+    transcribe_segments,
+    utterances_with_offset,
+    stitch_chunks
+)
+from audioscribe.playlist import (
+    youtube_playlist_entries,
+    batch_transcribe,
+    combined_export
+)
+from audioscribe.audio_prep import preprocess_audio
+
+# Duration assumed for a direct link whose headers can't be read
+DIRECT_DEFAULT_LENGTH_SEC = 60
+
+class SourceNotFoundError(TranscriptionError):
+    # Raised when no episode or audio matches the input
+    pass
+
+def classify_input(text):
+    """
+    Identify the service of an input without any network call.
+    Returns (service_code, kind, value) where value is the canonical ID,
+    URL or search query for this kind of input.
+    """
+    # Remove leading and trailing whitespace from input
+    text = text.strip()
+
+    # Regular expression patterns for service identification
+    listen_notes_id_pattern = r"^[a-f0-9]{32}$"
+    youtube_id_pattern = r"^[a-zA-Z0-9_-]{11}$"
+    spotify_id_pattern = r"^[A-Za-z0-9]{22}$"
+
+    # URL patterns for YouTube and Spotify
+    youtube_url_pattern = r"(youtu\.be\/|youtube\.com\/watch\?v=)([a-zA-Z0-9_-]{11})"
+    spotify_url_pattern = r"spotify\.com\/episode\/([A-Za-z0-9]{22})"
+
+    # Check for URL matches
+    youtube_match = re.search(youtube_url_pattern, text)
+    spotify_match = re.search(spotify_url_pattern, text)
+
+    # Service identification logic
+    if re.match(listen_notes_id_pattern, text):
+        return ("ln", "id", text)
+    elif re.match(youtube_id_pattern, text):
+        return ("yt", "id", text)
+    elif re.match(spotify_id_pattern, text):
+        return ("sp", "id", text)
+    elif youtube_match:
+        return ("yt", "id", youtube_match.group(2))
+    elif spotify_match:
+        return ("sp", "id", spotify_match.group(1))
+    elif text.startswith("http"):
+        return ("dt", "url", text)
+    else:
+        # Default: treat as Listen Notes search query
+        return ("ln", "search", " ".join(text.lower().split()))
+
+def determine_service_to_data(text):
+    # Resolve the input into the audio data of its service
+    with span('classify') as s:
+        service_code, kind, value = classify_input(text)
+        s.update(service=service_code, kind=kind)
+    with span('metadata', service=service_code, kind=kind):
+        if service_code == "ln" and kind == "id":
+            data = listennotes_get_data_by_id(value)
+        elif service_code == "yt":
+            data = youtube_get_data_by_url(f"https://www.youtube.com/watch?v={value}")
+        elif service_code == "sp":
+            data = spotify_get_data_by_id(value)
+        elif service_code == "dt":
+            data = direct_get_data_by_url(value)
+        else:
+            data = listennotes_get_data_by_search(value)
+
+    return (service_code, data)
+
+def resolve_source(text):
+    """
+    Cached version of determine_service_to_data, shared across sessions.
+    Inputs are keyed by their normalized form so a URL and a bare ID hit the same entry.
+    """
+    service_code, kind, value = classify_input(text)
+    key = f"{service_code}:{kind}:{value}"
+    analysis = resolution_get(key)
+    count('audioscribe_cache_total', cache='resolution', result='miss' if analysis is None else 'hit')
+    if analysis is None:
+        # Joins a resolution already in flight, e.g. started speculatively while the input was typed
+        analysis = single_flight(f"resolve:{key}", _resolve_and_cache, key, text)
+    return analysis
+
+def _resolve_and_cache(key, text):
+    analysis = determine_service_to_data(text)
+    if isinstance(analysis[1], dict):
+        resolution_put(key, analysis)
+    return analysis
+
+def prefetch_source(text, check):
+    """
+    Speculative resolution of typed input, run by prefetch() once the input stopped changing.
+    YouTube playlists are listed, other inputs resolved into the resolution cache.
+    """
+    check()
+    if youtube_url_is_playlist(text):
+        return youtube_playlist_entries(text)
+    return resolve_source(text)
+
+def listennotes_get_data_by_id(episode_id):
+    # Fetch episode data from Listen Notes API using ID
+    response = listennotes_client().fetch_episode_by_id(
+        id=episode_id,
+        show_transcript=1,
+    )
+    data = response.json()
+    data = {
+        'id': data['id'],
+        'title': data['title'],
+        'link': data['link'],
+        'audio': data['audio'],
+        'audio_length_sec': data['audio_length_sec'],
+    }
+    return data
+
+def listennotes_search(query, **params):
+    # Search for podcast episodes using Listen Notes API, returns the raw results
+    search = dict(
+        q=query,
+        sort_by_date=0,
+        type='episode',
+        offset=0,
+        len_min=3,
+        len_max=180,
+        published_after=0,
+        only_in='title,description',
+        region='fr',
+        safe_mode=0,
+        unique_podcasts=1,
+        page_size=10,
+    )
+    search.update(params)
+    response = listennotes_client().search(**search)
+    return response.json()['results']
+
+def listennotes_episode_data(result):
+    # Audio data of a Listen Notes episode (search results have "title_original" instead of "title")
+    return {
+        'id': result['id'],
+        'title': result.get('title') or result.get('title_original'),
+        'link': result['link'],
+        'audio': result['audio'],
+        'audio_length_sec': result['audio_length_sec'],
+    }
+
+def listennotes_get_data_by_search(episode_keyword):
+    # Return the first Listen Notes episode found for a search query
+    results = listennotes_search(episode_keyword)
+    if not results:
+        print("No results found.")
+        raise SourceNotFoundError(f"No episode found for \"{episode_keyword}\"")
+    return listennotes_episode_data(results[0])
+
+def direct_get_data_by_url(url):
+    # Audio data of a direct link, read from the file headers with range requests
+    try:
+        info = probe_remote_audio(url)
+    except Exception as e:
+        print(f"Could not probe {url}: {e}")
+        info = {}
+    return {
+        'id': url,
+        'title': info.get('title') or 'Not available',
+        'link': 'Not available',
+        'audio': url,
+        'audio_length_sec': round(info['duration']) if info.get('duration') else DIRECT_DEFAULT_LENGTH_SEC,
+    }
+
+def youtube_get_data_by_url(url):
+    """
+    Extract the best audio-only stream URL (m4a preferred) of a YouTube video
+    Uses yt-dlp library: https://github.com/yt-dlp/yt-dlp/blob/5fb450a64c300056476cfef481b7b5377ff82d54/yt_dlp/YoutubeDL.py
+    """
+    try:
+        # yt-dlp has its own HTTP stack, only its rate is shared with the other sessions
+        throttle('youtube')
+        with youtube_extractor() as extractor:
+            info = extractor.extract_info(url, download=False)
+    except Exception as e:
+        print("Error extracting video information:", e)
+        return "stop"
+
+    # yt-dlp already selected the format, older results may only list them
+    url_audio = info.get('url')
+    if not url_audio:
+        for format in (info.get('formats') or [])[::-1]:
+            if format.get('resolution') == "audio only" and format.get('ext') == "m4a":
+                url_audio = format['url']
+                break
+    data = {
+        'id': info['id'],
+        'title': info['title'],
+        'link': url,
+        'audio': url_audio,
+        'audio_length_sec': info["duration"],
+        'expires': signed_url_expiry(url_audio),
+    }
+    return data
+
+def signed_url_expiry(url):
+    # Unix time after which a signed stream URL stops working (its "expire" parameter), None if unknown
+    if not url:
+        return None
+    match = re.search(r"[?&/]expire[=/](\d+)", url)
+    return int(match.group(1)) if match else None
+
+def spotify_get_data_by_id(id):
+    """
+    Get the Listen Notes copy of a Spotify episode.
+    Known episodes are read from the persistent mapping, others are searched on Listen Notes
+    and every candidate is scored on title, show, duration and release date.
+    """
+    data = mapping_get(id)
+    count('audioscribe_cache_total', cache='spotify_mapping', result='miss' if data is None else 'hit')
+    if data is None:
+        info = spotify_client().episode(id, market="FR")
+        # Several episodes of the same show are needed to pick the right one
+        candidates = listennotes_search(f"{info['name']} {info['show']['name']}", unique_podcasts=0)
+        match, score = best_match(info, candidates)
+        print(f"spotify episode {id} matched with score {score:.2f}")
+        if match is None or score < MATCH_MIN_SCORE:
+            raise SourceNotFoundError(f"No Listen Notes episode matches the Spotify episode \"{info['name']}\"")
+        data = listennotes_episode_data(match)
+        mapping_put(id, data, score)
+    data['id'] = id
+    return data
+
+def transc_send(audio_url, profile=DEFAULT_PROFILE):
+    # Submit transcription to AssemblyAI without waiting for completion
+    with span('submit', profile=profile) as s:
+        transcript = transcriber(profile).submit(audio_url)
+        transcript_id = transcript.id
+        s['transcript_id'] = transcript_id
+    return transcript_id
+
+def transc_fetch(transcript_id):
+    """
+    Fetch the current state of a transcript with a single request
+    (aai.Transcript.get_by_id would block polling until completion).
+    Raises TranscriptRejectedError if the provider refuses the ID (4xx),
+    ProviderUnreachableError if it couldn't be asked (5xx, network, open circuit breaker).
+    """
+    import httpx
+
+    aai = assemblyai()
+    client = aai.Client.get_default()
+    try:
+        response = aai.api.get_transcript(client.http_client, transcript_id)
+    except aai.types.TranscriptError as e:
+        if e.status_code is not None and 400 <= e.status_code < 500 and e.status_code != 429:
+            raise TranscriptRejectedError(f"Transcript {transcript_id} was rejected by the provider: {e}") from e
+        raise ProviderUnreachableError(f"Transcript {transcript_id} could not be fetched: {e}") from e
+    except (httpx.HTTPError, ServiceUnavailableError) as e:
+        raise ProviderUnreachableError(f"Transcript {transcript_id} could not be fetched: {e}") from e
+    return aai.Transcript.from_response(client=client, response=response)
+
+def transc_get(transcript_id, audio_length_sec=0, on_status=None):
+    # Wait for transcription completion (webhook if configured, adaptive polling otherwise)
+    with span('wait', transcript_id=transcript_id):
+        return wait_for_transcript(transcript_id, transc_fetch, audio_length_sec, on_status=on_status)
+
+# Analyses computed on demand for transcripts made without the matching provider feature
+ANALYSIS_PROMPTS = {
+    'summary': "Summarize key points from this transcript in 5 bullets. Reply in French.",
+    'topics': "List the main topics of this transcript as 3 to 8 short markdown bullets, most important first.",
+    'entities': "List the people, organizations, places and products named in this transcript, as markdown bullets under a bold title per kind.",
+}
+# Provider feature giving each analysis at transcription time
+ANALYSIS_FEATURES = {'summary': 'summarization', 'topics': 'iab_categories', 'entities': 'entity_detection'}
+# Model of the LLM Gateway, for SDK versions without LeMUR
+ANALYSIS_MODEL = 'gpt-4o'
+
+def llm_task(prompt, raw):
+    # Run a prompt over a stored transcript with AssemblyAI LeMUR (or the LLM Gateway on newer SDKs)
+    aai = assemblyai()
+    if hasattr(aai, 'Lemur'):
+        source = {'transcript_ids': raw['transcript_ids']} if raw.get('transcript_ids') else {'input_text': raw['text']}
+        return aai.Lemur().task(prompt, final_model=aai.LemurModel.basic, **source).response
+    text = "\n".join(f"Speaker {u['speaker']} : {u['text']}" for u in raw.get('utterances') or []) or raw['text']
+    completion = aai.LLMGateway().chat.completions.create(
+        model=get_secret('analysis.model', ANALYSIS_MODEL),
+        messages=[{'role': 'user', 'content': f"{prompt}\n\nTranscript:\n{text}"}],
+    )
+    return completion.choices[0].message.content
+
+def stored_analysis(raw, section):
+    """
+    Returns the summary, topics or entities of a stored transcript if they are already known,
+    from its transcription profile or a previous analysis, None if they must be computed.
+    """
+    analysis = (raw.get('analysis') or {}).get(section)
+    if analysis is not None:
+        return analysis
+    if ANALYSIS_FEATURES[section] not in PROFILES.get(raw.get('profile', DEFAULT_PROFILE), {}):
+        return None
+    if section == 'summary':
+        return raw.get('summary') or ''
+    if section == 'topics':
+        return topic_transcript(SimpleNamespace(iab_categories=SimpleNamespace(summary=raw.get('topics') or {})))
+    return entity_transcript(SimpleNamespace(entities=[SimpleNamespace(**e) for e in raw.get('entities') or []]))
+
+def analyze_transcript(cache_key, section):
+    """
+    Returns the summary, topics or entities of a cached transcript, computing them
+    on the first request only. The result is stored with the transcript.
+    """
+    cached = cache_get(cache_key)
+    if cached is None:
+        raise TranscriptionError("This transcript is no longer available")
+    output, raw = cached
+    analysis = stored_analysis(raw, section)
+    if analysis is None:
+        with span('analysis', section=section):
+            analysis = llm_task(ANALYSIS_PROMPTS[section], raw)
+        raw.setdefault('analysis', {})[section] = analysis
+        cache_put(cache_key, output, raw)
+    return analysis
+
+def speaker_transcript(transcript):
+    # Format transcript with speaker labels if available
+    if transcript.utterances:
+        formatted_utterances = [f"Speaker {utterance.speaker} : {utterance.text}" for utterance in transcript.utterances]
+        return "\n\n".join(formatted_utterances)
+    else:
+        return transcript.text
+
+def topic_transcript(transcript):
+    # Extract and format transcript topics with confidence scores
+    if not transcript.iab_categories:
+        return None
+    summary = transcript.iab_categories.summary
+    if len(summary) > 0:
+        formatted_topics = [
+            f"- {insert_spaces(last_element)} ({value * 100:.0f}%)"
+            for key, value in summary.items() if value > 0.4
+            for last_element in [key.split(">")[-1]]
+        ]
+        return "\n".join(formatted_topics)
+    else:
+        return ""
+
+def entity_transcript(transcript):
+    # Extract and format named entities from transcript
+    if transcript.entities is None:
+        return None
+    if len(transcript.entities) > 0:
+        entities_sorted = transcript.entities
+        grouped_entities = {}
+        # Group entities by type and remove duplicates
+        for entity in entities_sorted:
+            entity_type = entity.entity_type
+            text = entity.text
+            if entity_type not in grouped_entities:
+                grouped_entities[entity_type] = set()
+            grouped_entities[entity_type].add(text)
+
+        formatted_entities = []
+        ignore_list = ["language", "nationality"]
+        # Format entities for display
+        for entity_type, texts in grouped_entities.items():
+            entity = entity_type.split(".")[-1]
+            if entity.lower() in ignore_list:
+                continue
+            formatted_entities.append(f"\n**{entity.capitalize()}**:")
+            for text in texts:
+                formatted_entities.append(f"- {text.capitalize()}")
+        return "\n".join(formatted_entities)
+    else:
+        return ""
+
+def raw_transcript(transcript, profile=DEFAULT_PROFILE):
+    # Keep the raw utterances, entities and topics for the cache
+    return {
+        'profile': profile,
+        'transcript_ids': [transcript.id],
+        'text': transcript.text,
+        'summary': transcript.summary,
+        'utterances': [
+            {'speaker': u.speaker, 'start': u.start, 'end': u.end, 'text': u.text}
+            for u in (transcript.utterances or [])
+        ],
+        'entities': [
+            {'entity_type': str(getattr(e.entity_type, 'value', e.entity_type)), 'text': e.text}
+            for e in (transcript.entities or [])
+        ],
+        'topics': dict(transcript.iab_categories.summary) if transcript.iab_categories else {},
+    }
+
+def _no_report(**fields):
+    pass
+
+def _index_transcript(key, title, link, raw, topics, entities):
+    # Add a finished transcript to the search index, the transcription succeeded even if this fails
+    try:
+        index_transcript(key, title, link, raw, topics, entities)
+    except Exception as e:
+        print("Error while indexing the transcript:", e)
+
+def _store_words(key, words, raw):
+    # Keep the word timings apart from the raw transcript, the transcription succeeded even if this fails
+    try:
+        if write_words(key, words):
+            raw['words_key'] = key
+    except Exception as e:
+        print("Error while storing the word timings:", e)
+
+def profile_cache_key(cache_key, profile):
+    # Transcripts made with another profile than the default one are cached apart
+    if not cache_key or profile == DEFAULT_PROFILE:
+        return cache_key
+    return f"{cache_key}#{profile}"
+
+def cached_transcript(cache_key, profile=DEFAULT_PROFILE):
+    """
+    Looks up a transcript of a source made with this profile or a richer one.
+
+    Returns:
+    - tuple: (key, output, raw) of the cache entry found, None otherwise.
+    """
+    for candidate in profile_fallbacks(profile):
+        key = profile_cache_key(cache_key, candidate)
+        cached = cache_get(key)
+        if cached is not None:
+            return key, cached[0], cached[1]
+    return None
+
+def _stage_timeline(report):
+    """
+    Publishes the stage of a job with the time it started, and remembers the
+    transitions so the time spent in each stage can be stored in the history.
+    The provider statuses are published as they are seen but timed as one stage
+    (see history.STAGE_OF_STATUS), their boundary is only known to a poll interval.
+    """
+    timeline = []
+
+    def enter(stage, **fields):
+        if timeline and timeline[-1][0] == stage:
+            return
+        timed = STAGE_OF_STATUS.get(stage, stage)
+        if timeline and STAGE_OF_STATUS.get(timeline[-1][0], timeline[-1][0]) == timed:
+            report(stage=stage, **fields)
+            return
+        now = time.time()
+        timeline.append((stage, now))
+        report(stage=stage, stage_started=now, **fields)
+
+    def timings():
+        # Seconds spent in each stage, until now for the last one
+        ends = [started for _, started in timeline[1:]] + [time.time()]
+        result = {}
+        for (stage, started), ended in zip(timeline, ends):
+            stage = STAGE_OF_STATUS.get(stage, stage)
+            result[stage] = result.get(stage, 0) + ended - started
+        return result
+
+    return enter, timings
+
+def _provider_stage(enter):
+    # Publish the provider status (queued, processing) as the job stage, completion is followed by formatting
+    def on_status(transcript):
+        status = str(getattr(transcript.status, 'value', transcript.status))
+        if status != 'completed':
+            enter(status)
+    return on_status
+
+def transcribe_audio(audio_url, audio_title, audio_link, audio_length_sec, cache_key=None, audio_bytes=None, profile=DEFAULT_PROFILE, report=_no_report):
+    """
+    Transcribe an audio URL with a feature profile (see clients.PROFILES) and return the formatted result.
+    Doesn't touch the session state so it can run on worker threads,
+    progress is published through report(stage=..., stage_started=...) (see audioscribe.jobs).
+    """
+    # Reuse a previous transcription of the same source
+    cached = cached_transcript(cache_key, profile)
+    count('audioscribe_cache_total', cache='transcript', result='miss' if cached is None else 'hit')
+    if cached is not None:
+        print("cache hit " + cached[0])
+        return cached[1]
+
+    # Concurrent requests for the same source share a single provider job
+    key = transcription_key(audio_url, cache_key, profile)
+    return single_flight(key, _transcribe_audio, audio_url, audio_title, audio_link, audio_length_sec, cache_key, audio_bytes, profile, report)
+
+def transcription_key(audio_url, cache_key, profile):
+    # Key of the provider job of a source and profile
+    return profile_cache_key(cache_key, profile) or f"{audio_url}#{profile}"
+
+def _journal(fn, *args):
+    # The journal only makes jobs resumable, a failed write mustn't fail the job
+    try:
+        fn(*args)
+    except Exception as e:
+        print("Error while writing the job journal:", e)
+
+def _submit_transcription(key, source, enter, service):
+    # Submit a job and journal it before any polling, returns its transcript ID
+    enter('submitting', features=source['profile'], service=service)
+    transcript_id = transc_send(source['audio_url'], source['profile'])
+    _journal(journal_submitted, transcript_id, key, source)
+    return transcript_id
+
+def _transcribe_audio(audio_url, audio_title, audio_link, audio_length_sec, cache_key, audio_bytes, profile, report):
+    enter, timings = _stage_timeline(report)
+    key = transcription_key(audio_url, cache_key, profile)
+    service = cache_key.split(':')[0] if cache_key else 'dt'
+    # A job submitted before a restart or by a closed session is resumed rather than paid twice
+    try:
+        transcript_id = journal_find(key)
+    except Exception as e:
+        print("Error while reading the job journal:", e)
+        transcript_id = None
+    resumed = transcript_id is not None
+    source = {
+        'cache_key': cache_key, 'profile': profile, 'audio_url': audio_url, 'title': audio_title,
+        'link': audio_link, 'audio_length_sec': audio_length_sec, 'audio_bytes': audio_bytes,
+    }
+    if resumed:
+        print(f"resuming transcript {transcript_id} for {key}")
+        count('audioscribe_jobs_resumed_total')
+    else:
+        transcript_id = _submit_transcription(key, source, enter, service)
+    retry_rejected = resumed
+    while True:
+        enter('queued', transcript_id=transcript_id, features=profile, service=service)
+        try:
+            transcript = transc_get(transcript_id, audio_length_sec, on_status=_provider_stage(enter))
+            break
+        except ProviderUnreachableError:
+            # The job may still be running, it stays in the journal to be resumed
+            raise
+        except TranscriptionError as e:
+            _journal(journal_finished, transcript_id, 'failed', str(e))
+            if not (retry_rejected and isinstance(e, TranscriptRejectedError)):
+                raise
+        # The provider no longer knows the resumed job: it is submitted again, once
+        print(f"resumed transcript {transcript_id} was rejected, submitting {key} again")
+        count('audioscribe_jobs_resubmitted_total')
+        retry_rejected = False
+        transcript_id = _submit_transcription(key, source, enter, service)
+
+    # Generate various transcript analyses
+    enter('formatting')
+    with span('postprocess') as s:
+        text = speaker_transcript(transcript)
+        topics = topic_transcript(transcript)
+        entities = entity_transcript(transcript)
+        summary = transcript.summary
+
+        output = format_output(audio_title, audio_link, summary, text, topics, entities)
+        s['bytes'] = len(output)
+    raw = raw_transcript(transcript, profile)
+    _store_words(cache_key or audio_url, transcript_words(transcript), raw)
+    cache_put(profile_cache_key(cache_key, profile), output, raw)
+    _journal(journal_finished, transcript_id, 'completed')
+    _index_transcript(cache_key or audio_url, audio_title, audio_link, raw, topics, entities)
+
+    # The observed timings feed the ETA of the next jobs, a resumed job misses its first stages
+    if resumed:
+        return output
+    try:
+        record_timings(service, audio_length_sec, profile, timings())
+    except Exception as e:
+        print("Error while recording the job timings:", e)
+    return output
+
+def format_output(audio_title, audio_link, summary, text, topics, entities):
+    # Format output
+    return f"""
+###
+Title:\n
+{audio_title.strip()}
+###
+URL:\n
+{audio_link}
+###
+Summary:\n
+{summary if summary is not None else 'Not Available'}
+###
+Transcription:\n
+{text}
+###
+Topics:\n
+{topics if topics is not None else 'Not Available'}
+###
+Entities:\n
+{entities if entities is not None else 'Not Available'}
+###
+    """
+
+def upload_audio(file, on_progress=None):
+    # Stream a local file to AssemblyAI, returns the URL to transcribe
+    with span('upload') as s:
+        file.seek(0, 2)
+        s['bytes'] = file.tell()
+        return upload_file_stream(file, get_secret('assemblyai'), on_progress=on_progress, url=endpoint('assemblyai') + '/v2/upload')
+
+def prefetch_upload(file, optimize, trim_silence, cache_key, check):
+    """
+    Speculative upload of a dropped file, run by prefetch(): optional pre-processing,
+    then the streamed upload, cancelled between two chunks once check() raises.
+    The uploaded URL is resolved as well, so Step 2 has its duration at once.
+    Nothing is uploaded for a file already transcribed (cache_key, see cache.file_key).
+
+    Returns:
+    - dict: 'url', 'audio_bytes' (the uploaded size), 'prep_metrics' (None if not optimized)
+      and 'cached' (the key of the transcript found, None if the file was uploaded).
+    """
+    cached = cached_transcript(cache_key) if cache_key else None
+    if cached is not None:
+        return {'url': None, 'audio_bytes': None, 'prep_metrics': None, 'cached': cached[0]}
+    upload_source, prep_metrics = file, None
+    if optimize:
+        check(stage='optimizing')
+        upload_source, prep_metrics = preprocess_audio(file, trim_silence=trim_silence)
+    try:
+        check(stage='uploading')
+        url = upload_audio(upload_source, on_progress=lambda sent, total: check(sent=sent, total=total))
+        upload_source.seek(0, 2)
+        audio_bytes = upload_source.tell()
+    finally:
+        if upload_source is not file:
+            upload_source.close()
+    check(stage='resolving')
+    try:
+        resolve_source(url)
+    except Exception as e:
+        print("Error while resolving the uploaded file:", e)
+    return {'url': url, 'audio_bytes': audio_bytes, 'prep_metrics': prep_metrics, 'cached': None}
+
+def transcribe_segment(segment, duration_sec, profile=DEFAULT_PROFILE):
+    # Upload one segment of a long audio and wait for its transcript
+    upload_url = upload_audio(segment)
+    return transc_get(transc_send(upload_url, profile), duration_sec)
+
+def merge_segment_transcripts(transcripts, bounds, profile=DEFAULT_PROFILE):
+    """
+    Stitch the transcripts of overlapping segments and merge their analyses.
+    Returns (text, summary, topics, entities, raw) like a single transcript would give,
+    and the words of the kept utterances for write_words().
+    """
+    utterances = stitch_chunks([utterances_with_offset(t, bounds[i][0]) for i, t in enumerate(transcripts)], bounds)
+    words = [(*w, u['speaker']) for u in utterances for w in u.pop('words')]
+    text = "\n\n".join(f"Speaker {u['speaker']} : {u['text']}" for u in utterances)
+    topics_summary = {}
+    for t in transcripts:
+        if t.iab_categories:
+            for key, value in t.iab_categories.summary.items():
+                topics_summary[key] = max(topics_summary.get(key, 0), value)
+    features = PROFILES[profile]
+    merged = SimpleNamespace(
+        entities=[e for t in transcripts for e in (t.entities or [])] if features.get('entity_detection') else None,
+        iab_categories=SimpleNamespace(summary=topics_summary) if features.get('iab_categories') else None,
+    )
+    summaries = [t.summary for t in transcripts if t.summary]
+    summary = "\n".join(summaries) if summaries else None
+    raw = {
+        'profile': profile,
+        'transcript_ids': [t.id for t in transcripts],
+        'text': text,
+        'summary': summary,
+        'utterances': utterances,
+        'entities': [{'entity_type': str(getattr(e.entity_type, 'value', e.entity_type)), 'text': e.text} for e in merged.entities or []],
+        'topics': topics_summary,
+    }
+    return text, summary, topic_transcript(merged), entity_transcript(merged), raw, words
+
+def transcribe_chunked(audio_url, audio_title, audio_link, audio_length_sec, cache_key=None, profile=DEFAULT_PROFILE, report=_no_report):
+    """
+    Transcribe a long audio as overlapping segments in parallel.
+    The text of each segment is published with report(parts=...) as soon as it is done.
+    """
+    cached = cached_transcript(cache_key, profile)
+    if cached is not None:
+        print("cache hit " + cached[0])
+        return cached[1]
+
+    bounds = segment_bounds(audio_length_sec)
+    transcripts = [None] * len(bounds)
+    parts = [None] * len(bounds)
+    report(stage='transcribing parts', bounds=bounds, parts=list(parts))
+    for index, transcript in transcribe_segments(audio_url, bounds, partial(transcribe_segment, profile=profile)):
+        transcripts[index] = transcript
+        parts[index] = speaker_transcript(transcript)
+        report(parts=list(parts))
+
+    # Stitch the segments and merge their analyses
+    report(stage='formatting')
+    text, summary, topics, entities, raw, words = merge_segment_transcripts(transcripts, bounds, profile)
+    output = format_output(audio_title, audio_link, summary, text, topics, entities)
+    _store_words(cache_key or audio_url, words, raw)
+    cache_put(profile_cache_key(cache_key, profile), output, raw)
+    _index_transcript(cache_key or audio_url, audio_title, audio_link, raw, topics, entities)
+    return output
+
+def transcribe_playlist_entry(entry, profile=DEFAULT_PROFILE):
+    # Resolve one playlist video and transcribe it
+    service_code, data = resolve_source(entry['id'])
+    if not isinstance(data, dict) or not data['audio']:
+        raise TranscriptionError(f"No audio stream found for {entry['link']}")
+    return transcribe_audio(data['audio'], data['title'], data['link'], data['audio_length_sec'], source_key(service_code, data['id']), profile=profile)
+
+def transcribe_playlist(entries, profile=DEFAULT_PROFILE, report=_no_report):
+    """
+    Transcribe every video of a playlist on a bounded pool.
+    Per-video statuses are published with report(items=...), failed videos don't stop the others.
+    """
+    results = [None] * len(entries)
+    items = ['waiting'] * len(entries)
+    report(stage='transcribing videos', items=list(items))
+    for index, result, error in batch_transcribe(entries, partial(transcribe_playlist_entry, profile=profile)):
+        if error is None:
+            results[index] = result
+            items[index] = 'done'
+        else:
+            print("Error during playlist transcription:", error)
+            items[index] = f"failed ({error})"
+        report(items=list(items))
+    return combined_export(entries, results)
+
+_recovered = False
+_recover_lock = threading.Lock()
+
+def recover_transcriptions():
+    """
+    Resumes the polling of the jobs left unfinished by a previous process, once per process.
+    Each one runs on the job pool under the key a session asking for the same source uses,
+    so a returning user attaches to it, and its result lands in the transcript cache.
+
+    Returns:
+    - list: The job IDs started.
+    """
+    global _recovered
+    with _recover_lock:
+        if _recovered:
+            return []
+        _recovered = True
+    job_ids = []
+    for entry in journal_pending():
+        print(f"recovering transcript {entry['transcript_id']} of {entry['job_key']}")
+        job_ids.append(submit_job(
+            transcribe_audio, entry['audio_url'], entry['title'] or 'Not available', entry['link'] or 'Not available',
+            entry['audio_length_sec'], entry['cache_key'], entry['audio_bytes'], entry['profile'],
+            job_key=f"{entry['cache_key']}#{entry['profile']}" if entry['cache_key'] else entry['job_key'],
+        ))
+    return job_ids
@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from audioscribe.http_client import throttle
+
+# Number of playlist entries resolved and transcribed at the same time
+PLAYLIST_MAX_WORKERS = 4
+
+def youtube_playlist_entries(url):
+    """
+    Lists the videos of a YouTube playlist with flat extraction.
+    Only the playlist page is fetched, formats of each video are not resolved.
+
+    Returns:
+    - list: One dict per video with 'id', 'title', 'link' and 'audio_length_sec'.
+    """
+    import yt_dlp
+
+    options = {
+        'extract_flat': 'in_playlist',
+        'skip_download': True,
+        'quiet': True,
+    }
+    throttle('youtube')
+    with yt_dlp.YoutubeDL(options) as ydl:
+        info = ydl.extract_info(url, download=False)
+    entries = []
+    for entry in info.get('entries') or []:
+        if not entry or not entry.get('id'):
+            continue
+        entries.append({
+            'id': entry['id'],
+            'title': entry.get('title') or entry['id'],
+            'link': f"https://www.youtube.com/watch?v={entry['id']}",
+            'audio_length_sec': entry.get('duration') or 0,
+        })
+    return entries
+
+def batch_transcribe(entries, worker, max_workers=PLAYLIST_MAX_WORKERS):
+    """
+    Runs worker(entry) for every entry on a bounded thread pool.
+    Yields (index, result, error) as soon as each entry is done, in completion order.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(worker, entry): index for index, entry in enumerate(entries)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                yield index, future.result(), None
+            except Exception as e:
+                yield index, None, e
+
+def combined_export(entries, results):
+    # Join the transcriptions of a playlist in playlist order
+    parts = []
+    for entry, result in zip(entries, results):
+        if result is None:
+            parts.append(f"###\nTitle:\n\n{entry['title']}\n\nURL:\n\n{entry['link']}\n\nNot Available\n")
+        else:
+            parts.append(result)
+    return "\n".join(parts)
@@ -0,0 +1,193 @@
+import json
+import time
+import threading
+from audioscribe.metrics import observe
+
+# Processing time is roughly proportional to audio length
+POLL_PROCESSING_RATIO = 0.15
+POLL_MIN_EXPECTED_SEC = 15
+POLL_MIN_INTERVAL_SEC = 3
+POLL_MAX_INTERVAL_SEC = 60
+# First check soon after submission, failures such as an unreachable audio URL are reported right away
+POLL_FIRST_CHECK_SEC = 3
+POLL_TIMEOUT_RATIO = 3
+POLL_MIN_TIMEOUT_SEC = 15 * 60
+# The queue/processing split is only observed when the polls bracket the start of processing
+# within this share of the provider time (never with a webhook, which fetches the job once)
+POLL_SPLIT_MAX_ERROR = 0.2
+# With a webhook, polling is only a safety net in case a notification is lost
+WEBHOOK_SAFETY_POLL_SEC = 300
+
+TERMINAL_STATUSES = ('completed', 'error')
+
+class TranscriptionError(Exception):
+    # Raised when the provider reports a failed transcription
+    pass
+
+class TranscriptRejectedError(TranscriptionError):
+    # Raised when the provider refuses a transcript ID (unknown, deleted or of another account)
+    pass
+
+class ProviderUnreachableError(TranscriptionError):
+    # Raised when the state of a job couldn't be fetched, the job itself may still be running
+    pass
+
+def poll_delays(audio_length_sec):
+    """
+    Yields the successive waits between two status checks.
+    The first check comes a few seconds after submission to catch immediate failures,
+    the next ones are spaced out (doubling) until half of the expected processing time,
+    are dense around the expected end, then back off.
+    """
+    expected = max(POLL_MIN_EXPECTED_SEC, float(audio_length_sec or 0) * POLL_PROCESSING_RATIO)
+    interval = min(POLL_FIRST_CHECK_SEC, expected * 0.5)
+    elapsed = 0
+    while elapsed + interval < expected * 0.5:
+        yield interval
+        elapsed += interval
+        interval = min(interval * 2, POLL_MAX_INTERVAL_SEC)
+    yield expected * 0.5 - elapsed
+    elapsed = expected * 0.5
+    interval = min(max(expected * 0.05, POLL_MIN_INTERVAL_SEC), 15)
+    while elapsed < expected * 1.5:
+        yield interval
+        elapsed += interval
+    while True:
+        interval = min(interval * 1.5, POLL_MAX_INTERVAL_SEC)
+        yield interval
+
+def poll_timeout(audio_length_sec):
+    # Overall time allowed for a job before giving up
+    return max(POLL_MIN_TIMEOUT_SEC, float(audio_length_sec or 0) * POLL_TIMEOUT_RATIO)
+
+def wait_for_transcript(transcript_id, get_transcript, audio_length_sec, timeout=None, on_status=None):
+    """
+    Waits for a transcription job to reach a terminal status.
+
+    Parameters:
+    - transcript_id (str): The provider job ID.
+    - get_transcript (callable): Fetches the job, e.g. aai.Transcript.get_by_id.
+    - audio_length_sec (int): Audio duration, drives the polling schedule.
+    - timeout (float): Overall timeout in seconds, derived from the duration if None.
+    - on_status (callable): Called with each fetched transcript.
+
+    Returns:
+    - The completed transcript.
+    """
+    if timeout is None:
+        timeout = poll_timeout(audio_length_sec)
+    deadline = time.monotonic() + timeout
+    use_webhook = webhook_receiver_running()
+    delays = poll_delays(audio_length_sec)
+    polls = 0
+    # First and last time each provider status was seen, to split queue wait from processing
+    started = time.monotonic()
+    seen, last_seen = {}, {}
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Transcript {transcript_id} not completed after {timeout:.0f} s")
+        if use_webhook:
+            webhook_wait(transcript_id, min(remaining, WEBHOOK_SAFETY_POLL_SEC))
+        else:
+            time.sleep(min(remaining, next(delays)))
+        transcript = get_transcript(transcript_id)
+        polls += 1
+        if on_status is not None:
+            on_status(transcript)
+        status = str(getattr(transcript.status, 'value', transcript.status))
+        now = time.monotonic()
+        seen.setdefault(status, now)
+        last_seen[status] = now
+        if status == 'completed':
+            print(f"transcript {transcript_id} completed after {polls} status checks")
+            _observe_provider_times(started, seen, last_seen)
+            return transcript
+        if status == 'error':
+            raise TranscriptionError(f"Transcript {transcript_id} failed: {transcript.error}")
+
+def _observe_provider_times(started, seen, last_seen):
+    # The provider time is known to a poll interval, its split only when a poll caught processing
+    # soon enough after the last queued one
+    total = seen['completed'] - started
+    observe('audioscribe_provider_seconds', total)
+    if 'processing' not in seen:
+        return
+    queued_until = last_seen.get('queued', started)
+    if seen['processing'] - queued_until > POLL_SPLIT_MAX_ERROR * total:
+        return
+    processing_from = (queued_until + seen['processing']) / 2
+    observe('audioscribe_provider_queue_seconds', processing_from - started)
+    observe('audioscribe_provider_processing_seconds', seen['completed'] - processing_from)
+
+# Webhook receiver: the provider POSTs {"transcript_id": ..., "status": ...} when a job ends
+WEBHOOK_AUTH_HEADER = 'X-Webhook-Token'
+_webhook_server = None
+_webhook_token = None
+_webhook_events = {}
+_webhook_lock = threading.Lock()
+
+def _webhook_event(transcript_id):
+    with _webhook_lock:
+        if transcript_id not in _webhook_events:
+            _webhook_events[transcript_id] = threading.Event()
+        return _webhook_events[transcript_id]
+
+def start_webhook_receiver(host='0.0.0.0', port=8765, token=None):
+    """
+    Starts the local HTTP receiver for completion webhooks, once per process.
+    The public URL forwarding to it must be set on the transcription config.
+    """
+    # Imported here, http.server is only needed when a webhook is configured
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    global _webhook_server, _webhook_token
+    with _webhook_lock:
+        if _webhook_server is not None:
+            return _webhook_server
+        _webhook_token = token
+
+        class _WebhookHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if _webhook_token and self.headers.get(WEBHOOK_AUTH_HEADER) != _webhook_token:
+                    self.send_response(401)
+                    self.end_headers()
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    payload = json.loads(self.rfile.read(length))
+                    transcript_id = payload['transcript_id']
+                    status = payload.get('status')
+                except (ValueError, KeyError):
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                if status in TERMINAL_STATUSES:
+                    _webhook_event(transcript_id).set()
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                # Keep the Streamlit console quiet
+                pass
+
+        _webhook_server = ThreadingHTTPServer((host, port), _WebhookHandler)
+        _webhook_server.daemon_threads = True
+        threading.Thread(target=_webhook_server.serve_forever, daemon=True).start()
+        print(f"webhook receiver listening on {host}:{port}")
+        return _webhook_server
+
+def webhook_receiver_running():
+    return _webhook_server is not None
+
+def webhook_wait(transcript_id, timeout):
+    """
+    Blocks until the webhook for this job arrives or the timeout expires.
+    Returns True if the notification was received.
+    """
+    event = _webhook_event(transcript_id)
+    received = event.wait(timeout)
+    if received:
+        with _webhook_lock:
+            _webhook_events.pop(transcript_id, None)
+    return received
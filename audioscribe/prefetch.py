@@ -0,0 +1,118 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Speculative work started while the user is still on Step 1 (uploading a dropped file,
+# resolving typed input), so it is ready or under way when they confirm.
+# Tasks are cancellable: an input that changes drops the work started for the old one.
+PREFETCH_MAX_WORKERS = 4
+# Typed input is resolved once it stopped changing for this long
+PREFETCH_DEBOUNCE_SEC = 0.8
+# Finished tasks are forgotten after this delay
+PREFETCH_TTL_SEC = 1800
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_MAX_WORKERS, thread_name_prefix='audioscribe-prefetch')
+_tasks = {}
+_lock = threading.Lock()
+
+class PrefetchCancelled(Exception):
+    # Raised inside a task by check() once it is cancelled
+    pass
+
+def _prune():
+    # Forget the tasks finished for a while, called with the lock held
+    limit = time.time() - PREFETCH_TTL_SEC
+    for key in [key for key, task in _tasks.items() if task['status'] != 'running' and task['updated'] < limit]:
+        del _tasks[key]
+
+def _run(key, task, fn, args, delay):
+    def check(**progress):
+        # Called by fn between steps: publishes progress fields, stops the task once cancelled
+        if task['cancel'].is_set():
+            raise PrefetchCancelled(key)
+        if progress:
+            with _lock:
+                task['progress'].update(progress)
+
+    try:
+        # Debounce: nothing is started if the input changes during the delay
+        if task['cancel'].wait(delay):
+            raise PrefetchCancelled(key)
+        result = fn(*args, check=check)
+    except PrefetchCancelled:
+        print(f"prefetch {key} cancelled")
+        status, result, error = 'cancelled', None, None
+    except Exception as e:
+        print(f"prefetch {key} failed:", e)
+        status, result, error = 'error', None, e
+    else:
+        status, error = 'completed', None
+    with _lock:
+        task.update(status=status, result=result, error=error, updated=time.time())
+        if status == 'cancelled' and _tasks.get(key) is task:
+            del _tasks[key]
+    task['done'].set()
+
+def prefetch(key, fn, *args, delay=0):
+    """
+    Starts fn(*args, check=...) in the background, unless a task with the same key
+    is already running or done, in which case it is reused (and counted as one more user).
+    fn should call check() between its steps, with optional progress fields.
+
+    Returns:
+    - str: The key, to pass to prefetch_state(), prefetch_wait() and cancel_prefetch().
+    """
+    with _lock:
+        _prune()
+        task = _tasks.get(key)
+        if task is not None and not task['cancel'].is_set():
+            task['users'] += 1
+            return key
+        now = time.time()
+        task = _tasks[key] = {
+            'status': 'running',
+            'result': None,
+            'error': None,
+            'progress': {},
+            'users': 1,
+            'cancel': threading.Event(),
+            'done': threading.Event(),
+            'created': now,
+            'updated': now,
+        }
+    _executor.submit(_run, key, task, fn, args, delay)
+    return key
+
+def cancel_prefetch(key):
+    # Drop one user of a task, the task is cancelled when nobody needs it anymore
+    with _lock:
+        task = _tasks.get(key)
+        if task is None:
+            return
+        task['users'] -= 1
+        if task['users'] <= 0 and task['status'] == 'running':
+            task['cancel'].set()
+
+def prefetch_state(key):
+    """
+    Returns a snapshot of a task ('status', 'result', 'error', 'progress'), None if it is unknown.
+    Status is one of 'running', 'completed', 'error', 'cancelled'.
+    """
+    with _lock:
+        task = _tasks.get(key)
+        if task is None:
+            return None
+        return {'status': task['status'], 'result': task['result'], 'error': task['error'], 'progress': dict(task['progress'])}
+
+def prefetch_wait(key, timeout=None):
+    """
+    Waits for a task and returns its result, raising its error.
+    Returns None if the task is unknown or still running after timeout.
+    """
+    with _lock:
+        task = _tasks.get(key)
+    if task is None or not task['done'].wait(timeout):
+        return None
+    if task['error'] is not None:
+        raise task['error']
+    return task['result']
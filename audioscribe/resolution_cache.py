@@ -0,0 +1,69 @@
+import copy
+import time
+import threading
+from collections import OrderedDict
+from audioscribe.metrics import gauge
+
+# Time-to-live of a resolved source, per service code.
+# YouTube audio URLs are signed: they are kept until their own expiry, an hour if it is unknown.
+# Podcast metadata doesn't change.
+RESOLUTION_TTL_SEC = {
+    'ln': 7 * 24 * 3600,
+    'sp': 7 * 24 * 3600,
+    'yt': 3600,
+    'dt': 24 * 3600,
+}
+RESOLUTION_MAX_ENTRIES = 1024
+# Signed stream URLs are dropped this long before they expire, so the provider still has time to fetch them
+RESOLUTION_EXPIRY_MARGIN_SEC = 900
+
+# Shared by every session of the Streamlit server (modules are only imported once)
+_entries = OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'expired': 0}
+
+def resolution_get(key):
+    """
+    Returns the cached (service_code, data) of a normalized input, or None.
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats['misses'] += 1
+            return None
+        expires, value = entry
+        if expires < now:
+            del _entries[key]
+            _stats['expired'] += 1
+            _stats['misses'] += 1
+            gauge('audioscribe_resolution_cache_entries', len(_entries))
+            return None
+        _entries.move_to_end(key)
+        _stats['hits'] += 1
+    # Callers get their own copy so a session can't alter the shared entry
+    return copy.deepcopy(value)
+
+def resolution_put(key, value):
+    """
+    Stores the (service_code, data) resolved for a normalized input.
+    The TTL depends on the service code, or on the expiry of a signed audio URL (data['expires']).
+    """
+    service_code, data = value
+    ttl = RESOLUTION_TTL_SEC.get(service_code, 3600)
+    if data.get('expires'):
+        ttl = data['expires'] - time.time() - RESOLUTION_EXPIRY_MARGIN_SEC
+        if ttl <= 0:
+            return
+    expires = time.monotonic() + ttl
+    with _lock:
+        _entries[key] = (expires, copy.deepcopy(value))
+        _entries.move_to_end(key)
+        while len(_entries) > RESOLUTION_MAX_ENTRIES:
+            _entries.popitem(last=False)
+        gauge('audioscribe_resolution_cache_entries', len(_entries))
+
+def resolution_stats():
+    # Hit/miss counters of the resolution cache
+    with _lock:
+        return dict(_stats, size=len(_entries))
@@ -0,0 +1,193 @@
+import os
+import re
+import time
+import sqlite3
+from audioscribe.metrics import span
+from audioscribe.word_timings import find_word
+
+# Full-text index of every finished transcript, one row per utterance (SQLite FTS5).
+# Transcripts are added as their jobs finish, nothing is ever rebuilt.
+INDEX_PATH = os.path.join('.cache', 'search.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    title TEXT,
+    link TEXT,
+    topics TEXT,
+    entities TEXT,
+    indexed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS utterances (
+    id INTEGER PRIMARY KEY,
+    document INTEGER NOT NULL,
+    speaker TEXT,
+    start INTEGER,
+    end INTEGER,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS utterances_document ON utterances (document);
+CREATE VIRTUAL TABLE IF NOT EXISTS utterance_fts USING fts5(
+    text, content='utterances', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS document_fts USING fts5(
+    title, topics, entities, content='documents', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS utterances_insert AFTER INSERT ON utterances BEGIN
+    INSERT INTO utterance_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS utterances_delete AFTER DELETE ON utterances BEGIN
+    INSERT INTO utterance_fts (utterance_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_insert AFTER INSERT ON documents BEGIN
+    INSERT INTO document_fts (rowid, title, topics, entities) VALUES (new.id, new.title, new.topics, new.entities);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_delete AFTER DELETE ON documents BEGIN
+    INSERT INTO document_fts (document_fts, rowid, title, topics, entities) VALUES ('delete', old.id, old.title, old.topics, old.entities);
+END;
+"""
+
+def _connect():
+    # Open a connection to the index, creating it if needed
+    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+    conn = sqlite3.connect(INDEX_PATH, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def index_transcript(key, title, link, raw, topics=None, entities=None):
+    """
+    Adds a finished transcript to the index, replacing a previous version of the same source.
+
+    Parameters:
+    - key (str): The cache key of the source (see cache.source_key).
+    - title, link (str): Shown with the hits.
+    - raw (dict): The raw transcript (see pipeline.raw_transcript), its utterances are indexed.
+    - topics, entities (str): The formatted topics and entities, searchable as well.
+    """
+    utterances = raw.get('utterances') or [{'speaker': None, 'start': 0, 'end': None, 'text': raw.get('text') or ''}]
+    link = source_link(key, link)
+    with span('index', key=key) as s, _connect() as conn:
+        conn.execute("DELETE FROM utterances WHERE document IN (SELECT id FROM documents WHERE key = ?)", (key,))
+        conn.execute("DELETE FROM documents WHERE key = ?", (key,))
+        document = conn.execute(
+            "INSERT INTO documents (key, title, link, topics, entities, indexed) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, (title or '').strip(), link, topics, entities, time.time())
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO utterances (document, speaker, start, end, text) VALUES (?, ?, ?, ?, ?)",
+            [(document, u['speaker'], u['start'], u['end'], u['text']) for u in utterances if u['text']]
+        )
+        s['utterances'] = len(utterances)
+
+def fts_query(text):
+    """
+    Turns user input into an FTS5 query: every word must match, words ending with * as prefixes.
+    Quoting the words keeps FTS5 operators and punctuation from breaking the query.
+    Prefixes are opt-in as a short one can expand to thousands of terms and slow the ranking down.
+    """
+    words = re.findall(r"\w+\*?", text)
+    if not words:
+        return None
+    return " ".join(f'"{word.rstrip("*")}"' + ('*' if word.endswith('*') else '') for word in words)
+
+def source_link(key, link):
+    """
+    Link of an indexed source: the audio file of direct links (podcast feed episodes
+    included), the Spotify episode of Spotify sources, the given link otherwise.
+    None when there is no web link (uploaded files).
+    """
+    if key.startswith('dt:'):
+        return key[3:]
+    if key.startswith('sp:'):
+        return f"https://open.spotify.com/episode/{key[3:]}"
+    return link if link and link.startswith('http') else None
+
+def deep_link(link, key, start_ms):
+    # Link to a moment of the source, when the service supports it
+    if not link or not link.startswith('http') or start_ms is None:
+        return link
+    seconds = int(start_ms) // 1000
+    if key.startswith('yt:'):
+        return f"{link}{'&' if '?' in link else '?'}t={seconds}s"
+    if key.startswith('sp:') and link.startswith('https://open.spotify.com/'):
+        return f"{link}{'&' if '?' in link else '?'}t={seconds}"
+    if key.startswith('dt:'):
+        # Media fragment, honoured by browsers for direct audio links
+        return f"{link.split('#')[0]}#t={seconds}"
+    # Listen Notes and other web pages have no way to start at a moment
+    return link
+
+def search(text, limit=20, offset=0):
+    """
+    Searches the utterances of every indexed transcript.
+
+    Returns:
+    - list: Hits ranked by relevance (bm25), as dicts with key, title, link (at the
+      moment `at` the first matching word is said when word timings are stored, at the
+      utterance start otherwise), speaker, start, end and a snippet where the matches are in bold.
+    """
+    query = fts_query(text)
+    if query is None:
+        return []
+    with span('search') as s, _connect() as conn:
+        rows = conn.execute("""
+            SELECT d.key, d.title, d.link, u.speaker, u.start, u.end,
+                   snippet(utterance_fts, 0, '**', '**', '…', 24)
+            FROM utterance_fts
+            JOIN utterances u ON u.id = utterance_fts.rowid
+            JOIN documents d ON d.id = u.document
+            WHERE utterance_fts MATCH ?
+            ORDER BY utterance_fts.rank
+            LIMIT ? OFFSET ?
+        """, (query, limit, offset)).fetchall()
+        s['hits'] = len(rows)
+    terms = re.findall(r"\w+\*?", text)
+    hits = []
+    for key, title, link, speaker, start, end, snippet in rows:
+        at = _word_time(key, terms, start, end)
+        hits.append({
+            'key': key, 'title': title, 'link': deep_link(link, key, at), 'at': at,
+            'speaker': speaker, 'start': start, 'end': end, 'snippet': snippet,
+        })
+    return hits
+
+def _word_time(key, terms, start, end):
+    # Moment of the first matching word of an utterance, its start without word timings
+    if start is None or end is None:
+        return start
+    try:
+        at = find_word(key, terms, start, end)
+    except Exception as e:
+        print("Error while reading the word timings:", e)
+        at = None
+    return start if at is None else at
+
+def search_sources(text, limit=10):
+    """
+    Searches the titles, topics and entities of the indexed transcripts.
+
+    Returns:
+    - list: Ranked dicts with key, title, link and the number of indexed utterances.
+    """
+    query = fts_query(text)
+    if query is None:
+        return []
+    with _connect() as conn:
+        rows = conn.execute("""
+            SELECT d.key, d.title, d.link, (SELECT count(*) FROM utterances u WHERE u.document = d.id)
+            FROM document_fts
+            JOIN documents d ON d.id = document_fts.rowid
+            WHERE document_fts MATCH ?
+            ORDER BY document_fts.rank
+            LIMIT ?
+        """, (query, limit)).fetchall()
+    return [{'key': key, 'title': title, 'link': link, 'utterances': n} for key, title, link, n in rows]
+
+def index_stats():
+    # Number of indexed transcripts and utterances
+    with _connect() as conn:
+        documents = conn.execute("SELECT count(*) FROM documents").fetchone()[0]
+        utterances = conn.execute("SELECT count(*) FROM utterances").fetchone()[0]
+    return {'documents': documents, 'utterances': utterances}
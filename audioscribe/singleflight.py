@@ -0,0 +1,45 @@
+import threading
+
+# Calls in flight per key: the first caller runs the work, the others wait for its outcome
+_calls = {}
+_lock = threading.Lock()
+_stats = {'leaders': 0, 'followers': 0}
+
+def single_flight(key, fn, *args, **kwargs):
+    """
+    Runs fn(*args, **kwargs) once for all concurrent callers sharing the same key.
+    Callers arriving while it runs wait and get the same result, or the same exception.
+    A key of None disables de-duplication.
+    """
+    if key is None:
+        return fn(*args, **kwargs)
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = {'done': threading.Event(), 'result': None, 'error': None}
+            _calls[key] = call
+            _stats['leaders'] += 1
+        else:
+            _stats['followers'] += 1
+    if not leader:
+        print(f"single flight: joining in-flight call {key}")
+        call['done'].wait()
+        if call['error'] is not None:
+            raise call['error']
+        return call['result']
+    try:
+        call['result'] = fn(*args, **kwargs)
+        return call['result']
+    except BaseException as e:
+        call['error'] = e
+        raise
+    finally:
+        with _lock:
+            del _calls[key]
+        call['done'].set()
+
+def single_flight_stats():
+    # Number of calls that ran the work and of calls that joined one in flight
+    with _lock:
+        return dict(_stats, in_flight=len(_calls))
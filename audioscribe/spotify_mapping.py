@@ -0,0 +1,114 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import difflib
+import unicodedata
+from datetime import datetime, timezone
+
+# Spotify episodes are transcribed from their ListenNotes copy. Confirmed matches are kept
+# here so a Spotify episode asked for again costs no external call.
+MAPPING_PATH = os.path.join('.cache', 'spotify_mapping.sqlite3')
+
+# Weight of each criterion in the match score
+MATCH_WEIGHTS = {'title': 0.45, 'show': 0.2, 'duration': 0.2, 'date': 0.15}
+# Below this score no candidate is accepted
+MATCH_MIN_SCORE = 0.6
+
+def _connect():
+    # Open a connection to the mapping database, creating it if needed
+    os.makedirs(os.path.dirname(MAPPING_PATH), exist_ok=True)
+    conn = sqlite3.connect(MAPPING_PATH, timeout=10)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS spotify_episodes (
+            spotify_id TEXT PRIMARY KEY,
+            listennotes_id TEXT NOT NULL,
+            data TEXT NOT NULL,
+            score REAL NOT NULL,
+            created REAL NOT NULL
+        )
+    """)
+    return conn
+
+def mapping_get(spotify_id):
+    """
+    Returns the ListenNotes episode data mapped to a Spotify episode ID, or None.
+    """
+    with _connect() as conn:
+        row = conn.execute("SELECT data FROM spotify_episodes WHERE spotify_id = ?", (spotify_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def mapping_put(spotify_id, data, score):
+    # Store a confirmed match
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO spotify_episodes (spotify_id, listennotes_id, data, score, created) VALUES (?, ?, ?, ?, ?)",
+            (spotify_id, data['id'], json.dumps(data, ensure_ascii=False), score, time.time())
+        )
+
+def _normalize(text):
+    # Lowercase, without accents nor punctuation
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode()
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+def _similarity(a, b):
+    a, b = _normalize(a), _normalize(b)
+    if not a or not b:
+        return 0.0
+    if a in b or b in a:
+        # e.g. "#12 - Title" on one side and "Title" on the other
+        return max(0.9, difflib.SequenceMatcher(None, a, b).ratio())
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+def _release_date(episode):
+    # Release date of a Spotify episode, None if only the year or month is known
+    if episode.get('release_date_precision', 'day') != 'day' or not episode.get('release_date'):
+        return None
+    try:
+        return datetime.strptime(episode['release_date'], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def match_score(episode, candidate):
+    """
+    Scores how likely a ListenNotes search result is the given Spotify episode.
+
+    Parameters:
+    - episode (dict): The Spotify episode, as returned by spotipy.
+    - candidate (dict): A ListenNotes search result.
+
+    Returns:
+    - float: From 0 to 1, a weighted mix of title and show similarity, duration and release date closeness.
+    """
+    scores = {}
+    scores['title'] = _similarity(episode.get('name'), candidate.get('title_original') or candidate.get('title'))
+    podcast = candidate.get('podcast') or {}
+    scores['show'] = _similarity((episode.get('show') or {}).get('name'), podcast.get('title_original') or podcast.get('title'))
+
+    duration = (episode.get('duration_ms') or 0) / 1000
+    if duration and candidate.get('audio_length_sec'):
+        # Equal durations score 1, a gap of 10% (at least a minute) or more scores 0
+        scores['duration'] = max(0.0, 1 - abs(duration - candidate['audio_length_sec']) / max(60, duration * 0.1))
+    else:
+        scores['duration'] = 0.5
+
+    released = _release_date(episode)
+    if released and candidate.get('pub_date_ms'):
+        published = datetime.fromtimestamp(candidate['pub_date_ms'] / 1000, timezone.utc).date()
+        # Time zones can shift the date by a day, a month apart or more scores 0
+        days = max(0, abs((published - released).days) - 1)
+        scores['date'] = max(0.0, 1 - days / 30)
+    else:
+        scores['date'] = 0.5
+    return sum(MATCH_WEIGHTS[name] * value for name, value in scores.items())
+
+def best_match(episode, candidates):
+    """
+    Returns (candidate, score) of the best scoring candidate, (None, 0) if there is none.
+    """
+    scored = [(match_score(episode, candidate), index) for index, candidate in enumerate(candidates)]
+    if not scored:
+        return None, 0.0
+    score, index = max(scored)
+    return candidates[index], score
@@ -0,0 +1,245 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from audioscribe.config import get_secret
+from audioscribe.metrics import gauge
+
+# Finished transcripts are held once per process here, whatever the number of sessions
+# showing them: sessions only keep the ID. The least recently used texts spill to disk
+# once the memory budget is reached and are read back when asked for again.
+STORE_PATH = os.path.join('.cache', 'transcript_store')
+STORE_MAX_BYTES = 64 * 1024 * 1024
+STORE_DISK_MAX_BYTES = 1024 * 1024 * 1024
+# Transcript bytes a single session can reference, its oldest references are released beyond
+STORE_SESSION_MAX_BYTES = 16 * 1024 * 1024
+# Sessions not seen for this long are forgotten (Streamlit doesn't tell when a session ends)
+STORE_SESSION_TTL_SEC = 2 * 3600
+
+_memory = OrderedDict()
+_memory_bytes = 0
+# Texts evicted from memory while they are being written to disk, still readable from here
+_spilling = {}
+# Size of every known text, in memory or spilled
+_sizes = {}
+# IDs referenced by each session, oldest first, and when each session was last seen
+_sessions = {}
+_seen = {}
+_lock = threading.Lock()
+# Serializes the disk pruning, which runs without the lock above
+_disk_lock = threading.Lock()
+
+def _limit(name, default):
+    # Limits can be overridden in a [store] secrets section
+    return int(get_secret(f'store.{name}', default))
+
+def _path(transcript_id):
+    return os.path.join(STORE_PATH, f"{transcript_id}.txt")
+
+def _spill(spilled):
+    """
+    Writes evicted texts to disk, once, without holding the lock: until written,
+    they are read from _spilling, so a text is always in memory, being spilled or on disk.
+    """
+    for transcript_id, text in spilled:
+        path = _path(transcript_id)
+        try:
+            if os.path.exists(path):
+                os.utime(path)
+            else:
+                os.makedirs(STORE_PATH, exist_ok=True)
+                temp = f"{path}.{threading.get_ident()}.tmp"
+                with open(temp, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(temp, path)
+        except OSError as e:
+            print(f"Error while spilling transcript {transcript_id}:", e)
+        with _lock:
+            if _spilling.get(transcript_id) is text:
+                del _spilling[transcript_id]
+    if spilled:
+        _prune_disk()
+
+def _prune_disk():
+    # Drop the least recently used spilled texts beyond the disk budget
+    with _disk_lock:
+        entries = []
+        try:
+            scan = list(os.scandir(STORE_PATH))
+        except FileNotFoundError:
+            return
+        for entry in scan:
+            if entry.name.endswith('.txt'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        limit = _limit('disk_max_bytes', STORE_DISK_MAX_BYTES)
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+def _remove(transcript_ids):
+    # Delete the spilled copies of released texts
+    for transcript_id in transcript_ids:
+        try:
+            os.remove(_path(transcript_id))
+        except FileNotFoundError:
+            pass
+
+def _admit(transcript_id, text):
+    # Keep a text in memory as the most recently used, spilling the oldest ones. Called with the lock held.
+    global _memory_bytes
+    if transcript_id not in _memory:
+        _sizes[transcript_id] = len(text.encode())
+        _memory_bytes += _sizes[transcript_id]
+    _memory[transcript_id] = text
+    _memory.move_to_end(transcript_id)
+    spilled = []
+    limit = _limit('max_bytes', STORE_MAX_BYTES)
+    while _memory_bytes > limit and len(_memory) > 1:
+        key, old = _memory.popitem(last=False)
+        _memory_bytes -= _sizes[key]
+        _spilling[key] = old
+        spilled.append((key, old))
+    return spilled
+
+def _release(transcript_id):
+    # Drop a text no session references anymore, called with the lock held. Returns True if it was dropped.
+    global _memory_bytes
+    if any(transcript_id in refs for refs in _sessions.values()):
+        return False
+    if transcript_id in _memory:
+        del _memory[transcript_id]
+        _memory_bytes -= _sizes[transcript_id]
+    _spilling.pop(transcript_id, None)
+    _sizes.pop(transcript_id, None)
+    return True
+
+def _session_id():
+    # Streamlit session running this thread, None outside the app (CLI, workers)
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+def _reference(session, transcript_id):
+    """
+    Records that a session shows a transcript and enforces its budget: the oldest references
+    beyond it are dropped, and so are their texts unless another session shows them.
+    Called with the lock held, returns the released IDs whose spilled copy is to delete.
+    """
+    now = time.time()
+    expired = [key for key, seen in _seen.items() if now - seen > STORE_SESSION_TTL_SEC]
+    for old in expired:
+        _sessions.pop(old, None)
+        del _seen[old]
+    if expired:
+        referenced = {key for refs in _sessions.values() for key in refs}
+        for key in [key for key in _sizes if key not in _memory and key not in referenced]:
+            del _sizes[key]
+    _seen[session] = now
+    refs = _sessions.setdefault(session, [])
+    if transcript_id in refs:
+        refs.remove(transcript_id)
+    refs.append(transcript_id)
+    limit = _limit('session_max_bytes', STORE_SESSION_MAX_BYTES)
+    released = []
+    while len(refs) > 1 and sum(_sizes.get(key, 0) for key in refs) > limit:
+        key = refs.pop(0)
+        print(f"session {session} over its budget, released transcript {key}")
+        if _release(key):
+            released.append(key)
+    return released
+
+def store_put(text, session=None):
+    """
+    Stores a transcript text and returns its ID. The ID is a hash of the text,
+    so sessions showing the same transcript share a single copy.
+
+    Parameters:
+    - text (str): The formatted transcript.
+    - session (str): The session referencing it, the current Streamlit session by default.
+    """
+    transcript_id = hashlib.sha256(text.encode()).hexdigest()[:32]
+    session = session or _session_id()
+    with _lock:
+        spilled = _admit(transcript_id, text)
+        released = _reference(session, transcript_id) if session is not None else []
+    _spill(spilled)
+    _remove(released)
+    _publish()
+    return transcript_id
+
+def store_get(transcript_id, session=None):
+    """
+    Returns the text of a transcript ID, read back from disk if it was spilled, or None if it is gone.
+    """
+    if not transcript_id:
+        return None
+    session = session or _session_id()
+    with _lock:
+        text = _memory.get(transcript_id)
+        if text is not None:
+            _memory.move_to_end(transcript_id)
+            released = _reference(session, transcript_id) if session is not None else []
+    if text is not None:
+        _remove(released)
+        return text
+    with _lock:
+        # Evicted but maybe not written yet
+        text = _spilling.get(transcript_id)
+    if text is None:
+        try:
+            with open(_path(transcript_id), encoding='utf-8') as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+    with _lock:
+        spilled = _admit(transcript_id, text)
+        released = _reference(session, transcript_id) if session is not None else []
+    _spill(spilled)
+    _remove(released)
+    _publish()
+    return text
+
+def session_usage(session=None):
+    """
+    Transcript bytes referenced by a session (current Streamlit session by default).
+
+    Returns:
+    - dict: 'transcripts' (count), 'bytes' (referenced) and 'max_bytes' (the session budget).
+    """
+    session = session or _session_id()
+    with _lock:
+        refs = list(_sessions.get(session, []))
+        size = sum(_sizes.get(key, 0) for key in refs)
+    return {'transcripts': len(refs), 'bytes': size, 'max_bytes': _limit('session_max_bytes', STORE_SESSION_MAX_BYTES)}
+
+def store_stats():
+    # Memory held by the store, and the number of live sessions and their largest usage
+    with _lock:
+        usage = [sum(_sizes.get(key, 0) for key in refs) for refs in _sessions.values()]
+        return {
+            'transcripts': len(_memory),
+            'bytes': _memory_bytes,
+            'sessions': len(_sessions),
+            'max_session_bytes': max(usage, default=0),
+        }
+
+def _publish():
+    stats = store_stats()
+    gauge('audioscribe_store_bytes', stats['bytes'])
+    gauge('audioscribe_store_transcripts', stats['transcripts'])
+    gauge('audioscribe_store_sessions', stats['sessions'])
+    gauge('audioscribe_store_max_session_bytes', stats['max_session_bytes'])
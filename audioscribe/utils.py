@@ -1,42 +1,59 @@
 import re
-import requests
+import time
+from audioscribe.http_client import provider_session, backoff_delay
 
-def upload_file_url(file):
+# AssemblyAI upload endpoint, files are streamed there directly
+ASSEMBLYAI_UPLOAD_URL = 'https://api.assemblyai.com/v2/upload'
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+UPLOAD_RETRIES = 3
+
+def upload_file_stream(file, api_key, chunk_size=UPLOAD_CHUNK_SIZE, on_progress=None, url=ASSEMBLYAI_UPLOAD_URL):
     """
-    Uploads a file to a temporary storage service.
+    Streams a file to the AssemblyAI upload endpoint in fixed-size chunks.
+    Only one chunk is held in memory at a time. The upload endpoint can't resume
+    a partial upload, so after a failed chunk the file is rewound and sent again.
 
     Parameters:
-    - file_path (str): The path to the file to be uploaded.
+    - file: A seekable binary file object (e.g. a Streamlit UploadedFile).
+    - api_key (str): The AssemblyAI API key.
+    - chunk_size (int): The size of each chunk in bytes.
+    - on_progress (callable): Called with (bytes_sent, total_bytes) after each chunk.
+    - url (str): The upload endpoint.
 
     Returns:
-    - str: The response from the upload service.
+    - str: The upload URL to pass to the transcriber.
     """
-    # URL de l'API pour l'upload
-    url = 'https://tmpfiles.org/api/v1/upload'
+    import requests
+
+    file.seek(0, 2)
+    total = file.tell()
 
-    try:
-        # Ouvrir le fichier en mode binaire
-        files = {'file': (file.name, file, file.type)}
-            
-        # Faire la requête POST avec le fichier
-        response = requests.post(url, files=files)
+    def chunks():
+        sent = 0
+        file.seek(0)
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            yield chunk
+            sent += len(chunk)
+            if on_progress is not None:
+                on_progress(sent, total)
 
-        # Vérifier que la requête a réussi
-        if response.status_code == 200:
-            # Convertir la réponse en JSON
-            response_json = response.json()
-            
-            # Accéder à l'URL dans la réponse JSON
-            uploaded_file_page = response_json.get('data', {}).get('url', None)
-            uploaded_file_url = uploaded_file_page.replace("tmpfiles.org/", "tmpfiles.org/dl/")
-            
-            return uploaded_file_url
-        else:
-            print(f"Failed to upload file. Status code: {response.status_code}")
-            return None
-    except Exception as e:
-        # Gérer les exceptions, par exemple si le fichier n'existe pas
-        return f"An error occurred: {e}"
+    for attempt in range(UPLOAD_RETRIES):
+        try:
+            # A generator body can't be replayed by the session, the file is rewound here instead
+            response = provider_session('assemblyai').post(
+                url,
+                data=chunks(),
+                headers={'authorization': api_key, 'content-type': 'application/octet-stream'},
+                timeout=(10, 300),
+                retries=0,
+            )
+            response.raise_for_status()
+            return response.json()['upload_url']
+        except requests.RequestException as e:
+            print(f"Upload attempt {attempt + 1} failed: {e}")
+            if attempt + 1 == UPLOAD_RETRIES:
+                raise
+            time.sleep(backoff_delay(attempt, getattr(e.response, 'headers', {}).get('Retry-After')))
 
 def sanitize_folder_name(folder_name):
     return re.sub(r'[<>:"/\\|?*\']+', '_', folder_name)
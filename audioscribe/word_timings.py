@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import zlib
+import array
+import struct
+import hashlib
+import threading
+import unicodedata
+from functools import lru_cache
+
+# Word-level timings of every finished transcript, one compact file per source in
+# a columnar format: the word texts are interned in a vocabulary and each block of
+# words is stored as typed arrays (vocabulary index, start delta, duration,
+# confidence, speaker index) compressed together. A block index in the header lets
+# a reader decode only the blocks overlapping a time range.
+#
+# File layout, little endian:
+#   header   '<4sBBHII': magic, version, vocabulary index width (2 or 4), words per block, words, blocks
+#   meta     '<I' length, then zlib(JSON [speakers, vocabulary])
+#   index    one '<iiII' per block: first start, last end (ms), offset from the end of the index, length
+#   blocks   zlib(ids, start deltas 'i', durations 'I', confidences 'B' (/255), speakers 'B')
+WORDS_PATH = os.path.join('.cache', 'words')
+WORDS_DISK_MAX_BYTES = 512 * 1024 * 1024
+WORDS_BLOCK_WORDS = 1024
+WORDS_MAGIC = b'ASWT'
+WORDS_VERSION = 1
+
+HEADER = struct.Struct('<4sBBHII')
+BLOCK = struct.Struct('<iiII')
+
+_lock = threading.Lock()
+
+class WordTimingsError(Exception):
+    # Raised when a file isn't a word timings file this version can read
+    pass
+
+def _column(typecode, values):
+    # A typed array as little endian bytes
+    column = array.array(typecode, values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column.tobytes()
+
+def _read_column(typecode, data, offset, n):
+    column = array.array(typecode)
+    column.frombytes(data[offset:offset + n * column.itemsize])
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column, offset + n * column.itemsize
+
+def transcript_words(transcript, offset_ms=0):
+    """
+    Extracts the words of an AssemblyAI transcript as (text, start, end, confidence, speaker) tuples,
+    the speaker being the one of their utterance. Times are in milliseconds, shifted by offset_ms.
+    """
+    if transcript.utterances:
+        return [
+            (w.text, w.start + offset_ms, w.end + offset_ms, w.confidence, u.speaker)
+            for u in transcript.utterances for w in (u.words or [])
+        ]
+    return [(w.text, w.start + offset_ms, w.end + offset_ms, w.confidence, getattr(w, 'speaker', None)) for w in (transcript.words or [])]
+
+def encode_words(words, block_words=WORDS_BLOCK_WORDS):
+    """
+    Encodes word tuples (text, start_ms, end_ms, confidence, speaker) in the columnar format.
+
+    Returns:
+    - bytes: The file content.
+    """
+    words = sorted(words, key=lambda w: w[1])
+    vocabulary, speakers = {}, {}
+    ids = [vocabulary.setdefault(w[0], len(vocabulary)) for w in words]
+    speaker_ids = [speakers.setdefault(w[4] or '', len(speakers)) for w in words]
+    if len(speakers) > 256:
+        raise WordTimingsError(f"{len(speakers)} speakers, at most 256 are supported")
+    width = 2 if len(vocabulary) <= 0xFFFF else 4
+    id_typecode = 'H' if width == 2 else 'I'
+
+    index, blocks, offset = [], [], 0
+    for first in range(0, len(words), block_words):
+        block = words[first:first + block_words]
+        starts = [int(w[1]) for w in block]
+        block_data = zlib.compress(b"".join([
+            _column(id_typecode, ids[first:first + block_words]),
+            _column('i', [start - previous for start, previous in zip(starts, [starts[0]] + starts)]),
+            _column('I', [max(0, int(w[2]) - int(w[1])) for w in block]),
+            _column('B', [min(255, max(0, round((w[3] or 0) * 255))) for w in block]),
+            _column('B', speaker_ids[first:first + block_words]),
+        ]), 6)
+        index.append(BLOCK.pack(starts[0], max(int(w[2]) for w in block), offset, len(block_data)))
+        blocks.append(block_data)
+        offset += len(block_data)
+
+    meta = zlib.compress(json.dumps([list(speakers), list(vocabulary)], ensure_ascii=False).encode(), 9)
+    return b"".join(
+        [HEADER.pack(WORDS_MAGIC, WORDS_VERSION, width, block_words, len(words), len(blocks)), struct.pack('<I', len(meta)), meta]
+        + index + blocks
+    )
+
+def _parse_header(head):
+    # Header fields and meta length, from the first HEADER.size + 4 bytes
+    magic, version, width, block_words, n_words, n_blocks = HEADER.unpack_from(head)
+    if magic != WORDS_MAGIC or version != WORDS_VERSION:
+        raise WordTimingsError(f"Not a word timings file (version {WORDS_VERSION})")
+    return width, block_words, n_words, n_blocks, struct.unpack_from('<I', head, HEADER.size)[0]
+
+def _decode_block(data, width, n, first_start, speakers, vocabulary):
+    # The words of one block, as dicts
+    data = zlib.decompress(data)
+    ids, offset = _read_column('H' if width == 2 else 'I', data, 0, n)
+    deltas, offset = _read_column('i', data, offset, n)
+    durations, offset = _read_column('I', data, offset, n)
+    confidences, offset = _read_column('B', data, offset, n)
+    speaker_ids, offset = _read_column('B', data, offset, n)
+    words, start = [], first_start
+    for index in range(n):
+        start += deltas[index]
+        words.append({
+            'text': vocabulary[ids[index]],
+            'start': start,
+            'end': start + durations[index],
+            'confidence': round(confidences[index] / 255, 3),
+            'speaker': speakers[speaker_ids[index]] or None,
+        })
+    return words
+
+def words_path(key):
+    # File of a source key (see cache.source_key)
+    return os.path.join(WORDS_PATH, f"{hashlib.sha256(key.encode()).hexdigest()[:32]}.words")
+
+def write_words(key, words):
+    """
+    Stores the word timings of a source, replacing previous ones, and prunes the oldest files
+    beyond WORDS_DISK_MAX_BYTES.
+
+    Parameters:
+    - key (str): The source key.
+    - words (list): (text, start_ms, end_ms, confidence, speaker) tuples, see transcript_words().
+
+    Returns:
+    - int: The size of the file written, 0 without any word.
+    """
+    if not words:
+        return 0
+    data = encode_words(words)
+    path = words_path(key)
+    os.makedirs(WORDS_PATH, exist_ok=True)
+    temp = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp, 'wb') as f:
+        f.write(data)
+    with _lock:
+        os.replace(temp, path)
+        _prune()
+    return len(data)
+
+def _prune():
+    # Drop the least recently written files beyond the disk budget, called with the lock held
+    entries = []
+    for entry in os.scandir(WORDS_PATH):
+        if entry.name.endswith('.words'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= WORDS_DISK_MAX_BYTES:
+            break
+        os.remove(path)
+        total -= size
+
+@lru_cache(maxsize=32)
+def _directory(path, mtime, size):
+    # Header, vocabulary and block index of a file, kept while the file is unchanged
+    with open(path, 'rb') as f:
+        width, block_words, n_words, n_blocks, meta_length = _parse_header(f.read(HEADER.size + 4))
+        speakers, vocabulary = json.loads(zlib.decompress(f.read(meta_length)))
+        index = [BLOCK.unpack_from(f.read(BLOCK.size)) for _ in range(n_blocks)]
+        base = f.tell()
+    return width, block_words, n_words, speakers, vocabulary, index, base
+
+def iter_words(key, start_ms=None, end_ms=None):
+    """
+    Yields the word timings of a source overlapping [start_ms, end_ms], in time order,
+    as dicts with text, start, end (ms), confidence and speaker.
+    Only the blocks overlapping the range are read and decoded, one at a time.
+    """
+    path = words_path(key)
+    stat = os.stat(path)
+    width, block_words, n_words, speakers, vocabulary, index, base = _directory(path, stat.st_mtime_ns, stat.st_size)
+    with open(path, 'rb') as f:
+        for block, (first_start, last_end, offset, length) in enumerate(index):
+            if (start_ms is not None and last_end < start_ms) or (end_ms is not None and first_start > end_ms):
+                continue
+            f.seek(base + offset)
+            n = min(block_words, n_words - block * block_words)
+            for word in _decode_block(f.read(length), width, n, first_start, speakers, vocabulary):
+                if (start_ms is None or word['end'] >= start_ms) and (end_ms is None or word['start'] <= end_ms):
+                    yield word
+
+def read_words(key, start_ms=None, end_ms=None):
+    # The words of iter_words() as a list, None when no timings are stored for this source
+    try:
+        return list(iter_words(key, start_ms, end_ms))
+    except FileNotFoundError:
+        return None
+
+def _normalize(text):
+    # Lowercase without accents and punctuation, like the unicode61 tokenizer of the search index
+    text = unicodedata.normalize('NFKD', text.lower())
+    return "".join(c for c in text if c.isalnum())
+
+def find_word(key, terms, start_ms, end_ms):
+    """
+    Time of the first word between start_ms and end_ms matching one of the terms
+    (a term ending with * matches as a prefix), None if there is none or no timings are stored.
+    """
+    words = read_words(key, start_ms, end_ms)
+    if not words:
+        return None
+    exact = {_normalize(term) for term in terms if not term.endswith('*')}
+    prefixes = tuple(_normalize(term) for term in terms if term.endswith('*'))
+    for word in words:
+        text = _normalize(word['text'])
+        if text and (text in exact or (prefixes and text.startswith(prefixes))):
+            return word['start']
+    return None
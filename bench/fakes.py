@@ -0,0 +1,423 @@
+import re
+import json
+import time
+import struct
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Local stand-ins for the external services, used by the benchmark.
+# Each fake is an HTTP server with its own latency and failure rate.
+
+WORDS = "podcast episode audio speaker question answer music interview story news".split()
+
+class FakeService:
+    """
+    A local HTTP server answering the routes of one external service.
+
+    Parameters:
+    - latency (float): Mean response time in seconds.
+    - jitter (float): Random extra response time in seconds, uniform in [0, jitter].
+    - failure_rate (float): Share of requests answered with a 503.
+    """
+    def __init__(self, latency=0.05, jitter=0.02, failure_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def handle_request(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                if self.headers.get('Transfer-Encoding') == 'chunked':
+                    body = self.read_chunked()
+                else:
+                    body = self.rfile.read(length) if length else b""
+                status, payload = service.answer(method, urlparse(self.path), self.headers, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def read_chunked(self):
+                # Uploaded bytes are read and dropped
+                while True:
+                    chunk_size = int(self.rfile.readline().strip(), 16)
+                    if chunk_size == 0:
+                        self.rfile.readline()
+                        return b""
+                    self.rfile.read(chunk_size)
+                    self.rfile.readline()
+
+            def do_GET(self):
+                self.handle_request('GET')
+
+            def do_POST(self):
+                self.handle_request('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def answer(self, method, url, headers, body):
+        with self.lock:
+            self.requests += 1
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        if random.random() < self.failure_rate:
+            with self.lock:
+                self.failures += 1
+            return 503, {'error': 'fake failure'}
+        return self.route(method, url, headers, body)
+
+    def route(self, method, url, headers, body):
+        return 404, {'error': f'no route for {method} {url.path}'}
+
+    def stop(self):
+        self.server.shutdown()
+
+def episode(episode_id, audio_base):
+    # A ListenNotes episode as returned by the API
+    return {
+        'id': episode_id,
+        'title': f"Episode {episode_id[:6]}",
+        'link': f"https://podcast.example/{episode_id}",
+        'audio': f"{audio_base}/audio/{episode_id}.mp3",
+        'audio_length_sec': 1800,
+        'pub_date_ms': 1700000000000,
+        'podcast': {'title': 'Fake show'},
+    }
+
+class FakeListenNotes(FakeService):
+    def route(self, method, url, headers, body):
+        if url.path.startswith('/episodes/'):
+            return 200, episode(url.path.split('/')[-1], self.url)
+        if url.path == '/search':
+            return 200, {'results': [episode(f"{random.getrandbits(128):032x}", self.url) for _ in range(10)]}
+        return super().route(method, url, headers, body)
+
+class FakeSpotify(FakeService):
+    def route(self, method, url, headers, body):
+        if url.path == '/api/token':
+            return 200, {'access_token': 'fake', 'token_type': 'Bearer', 'expires_in': 3600}
+        if url.path.startswith('/v1/episodes/'):
+            episode_id = url.path.split('/')[-1]
+            return 200, {
+                'id': episode_id,
+                'name': f"Episode {episode_id[:6]}",
+                'duration_ms': 1800000,
+                'release_date': '2023-11-14',
+                'show': {'name': 'Fake show'},
+            }
+        return super().route(method, url, headers, body)
+
+class FakeAssemblyAI(FakeService):
+    """
+    Transcription jobs complete processing_sec after submission and return
+    utterances utterances of words_per_utterance words each.
+    Every requested analysis (speakers, summary, entities, topics) adds
+    feature_ratio * processing_sec to the processing time.
+    Uploaded files are given a URL under upload_base (e.g. a FakeAudioFiles server).
+    """
+    # Request fields of the analyses, as sent by the SDK
+    FEATURES = ('speaker_labels', 'summarization', 'entity_detection', 'iab_categories')
+
+    def __init__(self, processing_sec=1.0, utterances=200, words_per_utterance=40, feature_ratio=0.15, upload_base=None, **kwargs):
+        self.processing_sec = processing_sec
+        self.upload_base = upload_base
+        self.feature_ratio = feature_ratio
+        self.utterances = utterances
+        self.words_per_utterance = words_per_utterance
+        self.jobs = {}
+        super().__init__(**kwargs)
+
+    def transcript(self, transcript_id):
+        submitted, audio_url, features = self.jobs[transcript_id]
+        elapsed = time.monotonic() - submitted
+        processing_sec = self.processing_sec * (1 + self.feature_ratio * len(features))
+        response = {'id': transcript_id, 'audio_url': audio_url, 'status': 'queued' if elapsed < processing_sec / 4 else 'processing'}
+        if elapsed < processing_sec:
+            return response
+        rng = random.Random(transcript_id)
+        utterances = []
+        for index in range(self.utterances):
+            speaker, start, step = "AB"[index % 2], index * 10000, 9000 // self.words_per_utterance
+            words = [
+                {'text': rng.choice(WORDS), 'start': start + n * step, 'end': start + n * step + step - 20, 'confidence': round(rng.uniform(0.6, 1), 3), 'speaker': speaker}
+                for n in range(self.words_per_utterance)
+            ]
+            text = " ".join(word['text'] for word in words)
+            utterances.append({'speaker': speaker, 'start': start, 'end': start + 9000, 'text': text, 'confidence': 0.9, 'words': words})
+        response.update({
+            'status': 'completed',
+            'text': " ".join(u['text'] for u in utterances),
+            'words': [word for u in utterances for word in u['words']],
+            'audio_duration': self.utterances * 10,
+        })
+        if 'speaker_labels' in features:
+            response['utterances'] = utterances
+        if 'summarization' in features:
+            response['summary'] = "- A fake summary"
+        if 'entity_detection' in features:
+            response['entities'] = [{'entity_type': 'person_name', 'text': rng.choice(WORDS), 'start': 0, 'end': 10} for _ in range(20)]
+        if 'iab_categories' in features:
+            response['iab_categories_result'] = {'status': 'success', 'results': [], 'summary': {'News>Podcasts': 0.9, 'Music>Interviews': 0.5}}
+        return response
+
+    def route(self, method, url, headers, body):
+        if method == 'POST' and url.path == '/v2/upload':
+            return 200, {'upload_url': f"{self.upload_base or self.url}/audio/{random.getrandbits(64):016x}.mp3"}
+        if method == 'POST' and url.path == '/v2/transcript':
+            transcript_id = f"{random.getrandbits(128):032x}"
+            request = json.loads(body)
+            features = [name for name in self.FEATURES if request.get(name)]
+            self.jobs[transcript_id] = (time.monotonic(), request['audio_url'], features)
+            return 200, {'id': transcript_id, 'status': 'queued', 'audio_url': request['audio_url']}
+        if method == 'GET' and url.path.startswith('/v2/transcript/'):
+            transcript_id = url.path.split('/')[-1]
+            if transcript_id not in self.jobs:
+                return 404, {'error': 'transcript not found'}
+            return 200, self.transcript(transcript_id)
+        return super().route(method, url, headers, body)
+
+class FakeYoutubeDL:
+    """
+    Stand-in for yt_dlp.YoutubeDL: extraction takes `latency` seconds and
+    returns an m4a audio format served by the given base URL.
+    """
+    latency = 0.5
+    audio_base = 'http://127.0.0.1'
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def close(self):
+        pass
+
+    def extract_info(self, url, download=False, **kwargs):
+        time.sleep(self.latency)
+        video_id = url.split('v=')[-1][:11]
+        audio_url = f"{self.audio_base}/audio/{video_id}.m4a?expire={int(time.time()) + 6 * 3600}"
+        return {
+            'id': video_id,
+            'title': f"Video {video_id}",
+            'duration': 1800,
+            'url': audio_url,
+            'ext': 'm4a',
+            'formats': [
+                {'format_id': '18', 'resolution': '640x360', 'ext': 'mp4', 'url': audio_url},
+                {'format_id': '140', 'resolution': 'audio only', 'ext': 'm4a', 'url': audio_url},
+            ],
+        }
+
+def fake_audio(ext, duration, title, cover_bytes=0):
+    """
+    Headers of a silent audio file: (head bytes, total size, tail bytes).
+    The bytes in between are zeros and never built, so long files cost nothing.
+    MP3 files can carry a cover picture of cover_bytes in their ID3 tag.
+    """
+    if ext == 'mp3':
+        # ID3v2.4 title and cover, then a 128 kbit/s 44.1 kHz stereo frame holding a Xing header
+        text = b"\x03" + title.encode()
+        frame = b"TIT2" + struct.pack('>I', len(text)) + b"\x00\x00" + text
+        if cover_bytes:
+            picture = b"\x00image/jpeg\x00\x03\x00" + bytes(cover_bytes)
+            syncsafe = bytes([(len(picture) >> 21) & 0x7F, (len(picture) >> 14) & 0x7F, (len(picture) >> 7) & 0x7F, len(picture) & 0x7F])
+            frame += b"APIC" + syncsafe + b"\x00\x00" + picture
+        size = len(frame)
+        tag = b"ID3\x04\x00\x00" + bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F]) + frame
+        frames = int(duration * 44100 / 1152)
+        first = b"\xff\xfb\x90\x00" + bytes(32) + b"Xing" + struct.pack('>II', 1, frames)
+        return tag + first, len(tag) + frames * 417, b""
+    if ext == 'm4a':
+        # ftyp and mdat first, moov at the end as most encoders write it
+        name = title.encode()
+        data = struct.pack('>I', 16 + len(name)) + b"data" + struct.pack('>II', 1, 0) + name
+        nam = struct.pack('>I', 8 + len(data)) + b"\xa9nam" + data
+        ilst = struct.pack('>I', 8 + len(nam)) + b"ilst" + nam
+        meta = struct.pack('>I', 12 + len(ilst)) + b"meta" + bytes(4) + ilst
+        udta = struct.pack('>I', 8 + len(meta)) + b"udta" + meta
+        mvhd = struct.pack('>I', 108) + b"mvhd" + bytes(12) + struct.pack('>II', 1000, int(duration * 1000)) + bytes(80)
+        moov = struct.pack('>I', 8 + len(mvhd) + len(udta)) + b"moov" + mvhd + udta
+        ftyp = struct.pack('>I', 20) + b"ftypM4A " + bytes(4) + b"M4A "
+        mdat_size = int(duration * 16000)
+        head = ftyp + struct.pack('>I', mdat_size) + b"mdat"
+        return head, len(head) - 8 + mdat_size + len(moov), moov
+    # 16 kHz mono 16-bit WAV
+    info = b"INFO" + b"INAM" + struct.pack('<I', len(title) + 1) + title.encode() + b"\x00" + (b"\x00" if len(title) % 2 == 0 else b"")
+    data_size = int(duration * 32000)
+    head = (
+        b"WAVEfmt " + struct.pack('<IHHIIHH', 16, 1, 1, 16000, 32000, 2, 16)
+        + b"LIST" + struct.pack('<I', len(info)) + info + b"data" + struct.pack('<I', data_size)
+    )
+    return b"RIFF" + struct.pack('<I', len(head) + data_size) + head, 8 + len(head) + data_size, b""
+
+class FakeAudioFiles:
+    """
+    A static file server with range request support, serving silent audio files
+    at /audio/<id>.<mp3|m4a|wav> lasting `duration` seconds.
+    """
+    def __init__(self, duration=1800, latency=0.02):
+        self.duration = duration
+        self.latency = latency
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with service.lock:
+                    service.requests += 1
+                time.sleep(service.latency)
+                name = urlparse(self.path).path.rsplit('/', 1)[-1]
+                file_id, _, ext = name.partition('.')
+                head, size, tail = fake_audio(ext, service.duration, f"Direct {file_id}", cover_bytes=100 * 1024 if sum(file_id.encode()) % 2 else 0)
+                start, end = 0, size - 1
+                match = re.match(r"bytes=(\d*)-(\d*)", self.headers.get('Range', ''))
+                if match and match.group(1):
+                    start, end = int(match.group(1)), min(int(match.group(2) or size - 1), size - 1)
+                elif match and match.group(2):
+                    start = max(0, size - int(match.group(2)))
+                body = bytearray(end - start + 1)
+                # Copy the parts of the head and tail that fall in the range
+                for offset, part in ((0, head), (size - len(tail), tail)):
+                    lo, hi = max(start, offset), min(end + 1, offset + len(part))
+                    if lo < hi:
+                        body[lo - start:hi - start] = part[lo - offset:hi - offset]
+                with service.lock:
+                    service.bytes_sent += len(body)
+                self.send_response(206 if match else 200)
+                self.send_header('Content-Type', 'audio/mpeg')
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+class FakeFeeds:
+    """
+    A podcast RSS server at /feed/<n>.xml, newest episodes first, with ETag and
+    Last-Modified validators: a conditional GET of an unchanged feed gets a 304.
+    publish() adds an episode to a feed, its enclosure served by `audio_base`.
+    """
+    def __init__(self, feeds=100, episodes=50, audio_base='http://127.0.0.1', latency=0.01):
+        self.audio_base = audio_base
+        self.latency = latency
+        self.episodes = {feed: [self.episode(feed, index) for index in reversed(range(episodes))] for feed in range(feeds)}
+        self.versions = {feed: 1 for feed in range(feeds)}
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def do_GET(self):
+                time.sleep(service.latency)
+                feed = int(urlparse(self.path).path.rsplit('/', 1)[-1].split('.')[0])
+                with service.lock:
+                    service.requests += 1
+                    version = service.versions[feed]
+                    episodes = list(service.episodes[feed])
+                etag = f'"{feed}-{version}"'
+                modified = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(1700000000 + version))
+                if self.headers.get('If-None-Match') == etag or (
+                    not self.headers.get('If-None-Match') and self.headers.get('If-Modified-Since') == modified
+                ):
+                    with service.lock:
+                        service.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                data = service.render(feed, episodes)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/rss+xml')
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', modified)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                # Written in chunks: a client that stopped parsing early closes the connection
+                for start in range(0, len(data), 16 * 1024):
+                    try:
+                        self.wfile.write(data[start:start + 16 * 1024])
+                    except (BrokenPipeError, ConnectionResetError):
+                        self.close_connection = True
+                        return
+                    with service.lock:
+                        service.bytes_sent += len(data[start:start + 16 * 1024])
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def episode(self, feed, index, enclosure=None):
+        published = time.strftime('%a, %d %b %Y %H:%M:%S +0000', time.gmtime(1600000000 + index * 86400))
+        return (
+            f"<item><title>Feed {feed} episode {index}</title><guid>feed-{feed}-{index}</guid>"
+            f"<link>https://example.com/{feed}/{index}</link><pubDate>{published}</pubDate>"
+            f"<enclosure url=\"{enclosure or f'{self.audio_base}/audio/f{feed}e{index}.mp3'}\" type=\"audio/mpeg\" length=\"0\"/>"
+            f"<itunes:duration>30:00</itunes:duration><description>{' '.join(random.choices(WORDS, k=80))}</description></item>"
+        )
+
+    def publish(self, feed, enclosure=None):
+        # Add a new episode on top of a feed, optionally with the enclosure of another feed
+        with self.lock:
+            index = len(self.episodes[feed])
+            self.episodes[feed].insert(0, self.episode(feed, index, enclosure))
+            self.versions[feed] += 1
+        return f"{self.audio_base}/audio/f{feed}e{index}.mp3"
+
+    def render(self, feed, episodes):
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd"><channel>'
+            f"<title>Fake show {feed}</title><link>https://example.com/{feed}</link>"
+            + "".join(episodes) + "</channel></rss>"
+        ).encode()
+
+    def stop(self):
+        self.server.shutdown()
@@ -0,0 +1,91 @@
+"""
+Benchmark of the podcast feed watcher against a local RSS server.
+
+    python bench/feeds.py --feeds 2000 --episodes 100
+
+Passes: subscription of every feed (full parse), a check with no change (conditional
+GETs answered 304), then a check after new episodes were published on some feeds,
+including the same enclosure on two feeds to exercise the de-duplication.
+"""
+import os
+import sys
+import time
+import types
+import argparse
+import resource
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fakes import FakeFeeds
+from bench.run import setup
+
+def timed_pass(name, feeds_server, fn):
+    requests, not_modified, sent = feeds_server.requests, feeds_server.not_modified, feeds_server.bytes_sent
+    started = time.perf_counter()
+    result = fn()
+    wall = time.perf_counter() - started
+    print(f"{name:<12}{wall:>8.2f} s{feeds_server.requests - requests:>8} GET{feeds_server.not_modified - not_modified:>8} x 304"
+          f"{(feeds_server.bytes_sent - sent) / 1e6:>9.1f} MB")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the feed watcher against a local RSS server.')
+    parser.add_argument('--feeds', type=int, default=500, help='Subscribed feeds')
+    parser.add_argument('--episodes', type=int, default=100, help='Episodes per feed')
+    parser.add_argument('--changed', type=float, default=0.05, help='Share of feeds getting a new episode')
+    parser.add_argument('--rate', type=str, help='Feed requests per second and burst, e.g. "200,400" (default: rate_limits.feeds)')
+    args = parser.parse_args()
+    if args.rate:
+        os.environ['AUDIOSCRIBE_RATE_LIMITS_FEEDS'] = args.rate
+
+    fakes = setup(types.SimpleNamespace(latency=0.01, failure_rate=0.0, processing_sec=1.0, utterances=20, extract_latency=0.1))
+    feeds_server = FakeFeeds(feeds=args.feeds, episodes=args.episodes, audio_base=fakes['files'].url)
+
+    from audioscribe import feeds
+    from audioscribe.jobs import job_stats
+    urls = [f"{feeds_server.url}/feed/{feed}.xml" for feed in range(args.feeds)]
+
+    def due_now():
+        with feeds._connect() as conn:
+            conn.execute("UPDATE feeds SET next_check = 0")
+        return feeds.check_due_feeds(limit=len(urls))
+
+    def subscribe_all():
+        # Subscribed without backfill, only new episodes are transcribed
+        with feeds._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO feeds (url, profile, interval, next_check, created) VALUES (?, 'fast', ?, 0, ?)",
+                [(url, feeds.FEED_DEFAULT_INTERVAL_SEC, time.time()) for url in urls]
+            )
+        feeds.FEED_BACKFILL = 0
+        return feeds.check_due_feeds(limit=len(urls))
+
+    print(f"{args.feeds} feeds of {args.episodes} episodes")
+    print(f"{'pass':<12}{'wall':>10}{'requests':>12}{'':>12}{'received':>9}")
+    timed_pass('subscribe', feeds_server, subscribe_all)
+    timed_pass('unchanged', feeds_server, due_now)
+
+    changed = max(1, int(args.feeds * args.changed))
+    shared = feeds_server.publish(0)
+    for feed in range(1, changed):
+        feeds_server.publish(feed)
+    # The same episode published on a second feed is transcribed once
+    feeds_server.publish(changed, enclosure=shared)
+    jobs_before = fakes['assemblyai'].requests
+    timed_pass('new episodes', feeds_server, due_now)
+
+    while any(job_stats().get(status) for status in ('queued', 'running')):
+        time.sleep(0.2)
+    feeds.update_episode_states()
+    states = {}
+    for feed in feeds.list_feeds():
+        for state, n in feed['episodes'].items():
+            states[state] = states.get(state, 0) + n
+    print(f"episodes: {states}, transcriptions submitted: {len(fakes['assemblyai'].jobs)} "
+          f"({fakes['assemblyai'].requests - jobs_before} AssemblyAI requests), peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    feeds_server.stop()
+    for fake in fakes.values():
+        fake.stop()
+
+if __name__ == '__main__':
+    main()
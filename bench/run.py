@@ -0,0 +1,236 @@
+"""
+End-to-end benchmark of the transcription pipeline against local fake services.
+
+    python bench/run.py --sessions 8 --rounds 5
+    python bench/run.py --sessions 8 --compare bench/results/20261018-120000.json
+
+Every stage runs the real pipeline code (determine_service_to_data, upload_audio,
+transc_send/transc_get and the formatters), only the network peers are fakes.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import resource
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fakes import FakeListenNotes, FakeSpotify, FakeAssemblyAI, FakeAudioFiles, FakeYoutubeDL
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+STAGES = ['resolve', 'upload', 'submit', 'wait', 'format']
+# Kinds of input of the simulated sessions, used in turn
+INPUT_KINDS = ['ln_id', 'ln_search', 'sp_id', 'yt_id', 'dt_url', 'upload']
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(q / 100 * (len(values) - 1)))))
+    return values[index]
+
+def setup(args):
+    # Start the fakes and point the pipeline at them
+    files = FakeAudioFiles(latency=args.latency)
+    fakes = {
+        'listennotes': FakeListenNotes(latency=args.latency, failure_rate=args.failure_rate),
+        'spotify': FakeSpotify(latency=args.latency, failure_rate=args.failure_rate),
+        # Uploaded files are then served by the static file server, like direct links
+        'assemblyai': FakeAssemblyAI(latency=args.latency, failure_rate=args.failure_rate, processing_sec=args.processing_sec, utterances=args.utterances, upload_base=files.url),
+        'files': files,
+    }
+    os.environ.update({
+        'AUDIOSCRIBE_LISTENNOTES': 'fake',
+        'AUDIOSCRIBE_ASSEMBLYAI': 'fake',
+        'AUDIOSCRIBE_SPOTIFY_ID': 'fake',
+        'AUDIOSCRIBE_SPOTIFY_SECRET': 'fake',
+        'AUDIOSCRIBE_ENDPOINTS_LISTENNOTES': fakes['listennotes'].url,
+        'AUDIOSCRIBE_ENDPOINTS_SPOTIFY_API': fakes['spotify'].url + '/v1/',
+        'AUDIOSCRIBE_ENDPOINTS_SPOTIFY_TOKEN': fakes['spotify'].url + '/api/token',
+        'AUDIOSCRIBE_ENDPOINTS_ASSEMBLYAI': fakes['assemblyai'].url,
+    })
+
+    import yt_dlp
+    FakeYoutubeDL.latency = args.extract_latency
+    FakeYoutubeDL.audio_base = fakes['assemblyai'].url
+    yt_dlp.YoutubeDL = FakeYoutubeDL
+
+    # Every store in a fresh temporary directory, so that no cache is hit and .cache/ is left alone,
+    # and a polling schedule scaled to the fake processing time
+    from audioscribe import cache, polling, spotify_mapping, job_journal, word_timings, search_index, history, transcript_store, exports, feeds
+    root = tempfile.mkdtemp()
+    cache.CACHE_PATH = os.path.join(root, 'transcripts.sqlite3')
+    spotify_mapping.MAPPING_PATH = os.path.join(root, 'spotify_mapping.sqlite3')
+    job_journal.JOURNAL_PATH = os.path.join(root, 'jobs.sqlite3')
+    word_timings.WORDS_PATH = os.path.join(root, 'words')
+    search_index.INDEX_PATH = os.path.join(root, 'search.sqlite3')
+    history.HISTORY_PATH = os.path.join(root, 'history.sqlite3')
+    transcript_store.STORE_PATH = os.path.join(root, 'transcript_store')
+    exports.EXPORTS_PATH = os.path.join(root, 'exports')
+    feeds.FEEDS_PATH = os.path.join(root, 'feeds.sqlite3')
+    polling.POLL_PROCESSING_RATIO = args.processing_sec / 1800
+    polling.POLL_MIN_EXPECTED_SEC = 0
+    polling.POLL_MIN_INTERVAL_SEC = args.processing_sec / 20
+    return fakes
+
+def session_input(kind, fakes):
+    # Input typed by a simulated user, unique so that no cache is hit
+    if kind == 'ln_id':
+        return f"{random.getrandbits(128):032x}"
+    if kind == 'ln_search':
+        return f"fake show episode {random.getrandbits(32)}"
+    if kind == 'sp_id':
+        return "".join(random.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(22))
+    if kind == 'yt_id':
+        return "".join(random.choice('abcdefghijklmnopqrstuvwxyz0123456789_-') for _ in range(11))
+    # Direct links to an MP3, M4A or WAV file, probed with range requests
+    return f"{fakes['files'].url}/audio/{random.getrandbits(64):016x}.{random.choice(['mp3', 'm4a', 'wav'])}"
+
+def run_session(kind, fakes, upload_bytes, profile='full'):
+    """
+    One simulated session, stage by stage.
+    Returns ({stage: seconds}, failed_stage or None).
+    """
+    from audioscribe.pipeline import (
+        determine_service_to_data,
+        upload_audio,
+        transc_send,
+        transc_get,
+        speaker_transcript,
+        topic_transcript,
+        entity_transcript,
+        format_output
+    )
+
+    timings = {}
+    stage = None
+    try:
+        text = session_input(kind, fakes)
+        if kind == 'upload':
+            stage = 'upload'
+            started = time.perf_counter()
+            file = io.BytesIO(os.urandom(upload_bytes))
+            text = upload_audio(file)
+            timings['upload'] = time.perf_counter() - started
+
+        stage = 'resolve'
+        started = time.perf_counter()
+        service_code, data = determine_service_to_data(text)
+        timings['resolve'] = time.perf_counter() - started
+
+        stage = 'submit'
+        started = time.perf_counter()
+        transcript_id = transc_send(data['audio'], profile)
+        timings['submit'] = time.perf_counter() - started
+
+        stage = 'wait'
+        started = time.perf_counter()
+        transcript = transc_get(transcript_id, data['audio_length_sec'])
+        timings['wait'] = time.perf_counter() - started
+
+        stage = 'format'
+        started = time.perf_counter()
+        format_output(data['title'], data['link'], transcript.summary, speaker_transcript(transcript), topic_transcript(transcript), entity_transcript(transcript))
+        timings['format'] = time.perf_counter() - started
+    except Exception as e:
+        print(f"session {kind} failed at {stage}: {e}", file=sys.stderr)
+        return timings, stage
+    return timings, None
+
+def run(args):
+    fakes = setup(args)
+    kinds = [INPUT_KINDS[i % len(INPUT_KINDS)] for i in range(args.sessions * args.rounds)]
+    timings = {stage: [] for stage in STAGES}
+    errors = {stage: 0 for stage in STAGES}
+    totals = []
+    lock = threading.Lock()
+
+    def work(kind):
+        started = time.perf_counter()
+        session_timings, failed_stage = run_session(kind, fakes, args.upload_bytes, args.profile)
+        with lock:
+            for stage, seconds in session_timings.items():
+                timings[stage].append(seconds)
+            if failed_stage:
+                errors[failed_stage] += 1
+            else:
+                totals.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        list(executor.map(work, kinds))
+    wall = time.perf_counter() - started
+
+    result = {
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'params': vars(args),
+        'wall_sec': wall,
+        'sessions': len(kinds),
+        'completed': len(totals),
+        'throughput_per_min': len(totals) / wall * 60,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'stages': {
+            stage: {'count': len(values), 'errors': errors[stage], 'p50': percentile(values, 50), 'p95': percentile(values, 95)}
+            for stage, values in timings.items()
+        },
+        'total': {'p50': percentile(totals, 50), 'p95': percentile(totals, 95)},
+        'requests': {name: fake.requests for name, fake in fakes.items()},
+    }
+    for fake in fakes.values():
+        fake.stop()
+    return result
+
+def fmt(value):
+    return "-" if value is None else f"{value * 1000:.0f} ms"
+
+def report(result, previous=None):
+    print(f"{result['completed']}/{result['sessions']} sessions in {result['wall_sec']:.1f} s "
+          f"({result['throughput_per_min']:.1f}/min at {result['params']['sessions']} concurrent), peak RSS {result['peak_rss_mb']:.0f} MB")
+    print(f"{'stage':<10}{'p50':>12}{'p95':>12}{'errors':>8}" + (f"{'p50 before':>14}{'p95 before':>14}" if previous else ""))
+    rows = list(result['stages'].items()) + [('total', dict(result['total'], errors=result['sessions'] - result['completed']))]
+    for stage, stats in rows:
+        line = f"{stage:<10}{fmt(stats['p50']):>12}{fmt(stats['p95']):>12}{stats['errors']:>8}"
+        if previous:
+            before = previous['total'] if stage == 'total' else previous['stages'].get(stage, {})
+            line += f"{fmt(before.get('p50')):>14}{fmt(before.get('p95')):>14}"
+        print(line)
+    print("requests per fake service:", result['requests'])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the transcription pipeline against local fake services.')
+    parser.add_argument('--sessions', type=int, default=4, help='Concurrent simulated sessions')
+    parser.add_argument('--rounds', type=int, default=3, help='Sessions run by each worker')
+    parser.add_argument('--latency', type=float, default=0.05, help='Mean latency of the fake services (s)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of fake service requests failing')
+    parser.add_argument('--extract-latency', type=float, default=0.5, help='Duration of the stubbed yt-dlp extraction (s)')
+    parser.add_argument('--processing-sec', type=float, default=2.0, help='Fake transcription processing time (s)')
+    parser.add_argument('--profile', default='full', help='Transcription profile: fast, speakers or full')
+    parser.add_argument('--utterances', type=int, default=200, help='Utterances per fake transcript')
+    parser.add_argument('--upload-bytes', type=int, default=5 * 1024 * 1024, help='Size of the uploaded test file')
+    parser.add_argument('--compare', help='Previous result file to compare with')
+    parser.add_argument('--no-save', action='store_true', help="Don't save the result")
+    args = parser.parse_args()
+
+    compare, no_save = args.compare, args.no_save
+    del args.compare, args.no_save
+    result = run(args)
+    previous = None
+    if compare:
+        with open(compare) as f:
+            previous = json.load(f)
+    report(result, previous)
+    if not no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=2)
+        print("saved to", path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import streamlit as st
+from audioscribe.exports import format_timestamp
+from audioscribe.search_index import search, search_sources, index_stats
+
+# Hits per page of results
+SEARCH_PAGE_SIZE = 20
+
+# Streamlit page configuration
+st.set_page_config(
+    page_title="AudioScribe App : Search",
+    page_icon="./assets/favicon.ico🧊",
+    layout="centered",
+)
+
+st.image('./assets/logo.png', width=200)
+st.markdown('# Search your transcriptions')
+stats = index_stats()
+st.markdown(f"Every finished transcription is searchable here: {stats['documents']} transcriptions, {stats['utterances']} utterances.")
+
+query = st.text_input("Words to look for (end a word with * to match its beginning only)")
+if query:
+    sources = search_sources(query)
+    if sources:
+        st.markdown("#### Sources")
+        st.markdown("\n".join(
+            f"- [{source['title'] or source['key']}]({source['link']})" if source['link'] else f"- {source['title'] or source['key']}"
+            for source in sources
+        ))
+
+    page = st.number_input("Page", min_value=1, value=1, key="search_page") - 1
+    hits = search(query, limit=SEARCH_PAGE_SIZE, offset=page * SEARCH_PAGE_SIZE)
+    st.markdown("#### Passages")
+    if not hits:
+        st.info("No passage found.")
+    for hit in hits:
+        with st.container(border=True):
+            start = format_timestamp(hit['at'])[:8]
+            speaker = f" · Speaker {hit['speaker']}" if hit['speaker'] else ""
+            name = f"{hit['title'] or hit['key']} · {start}"
+            if hit['link']:
+                name = f"[{name}]({hit['link']})"
+            st.markdown(f"{name}{speaker}\n\n{hit['snippet']}")
@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from bench.fakes import FakeAssemblyAI
+
+@pytest.fixture(scope='session')
+def fake_assemblyai():
+    # A local AssemblyAI whose jobs complete at once, the SDK pointed at it for the whole session
+    from audioscribe import clients
+
+    fake = FakeAssemblyAI(latency=0, jitter=0, processing_sec=0, utterances=5)
+    os.environ['AUDIOSCRIBE_ASSEMBLYAI'] = 'fake'
+    os.environ['AUDIOSCRIBE_ENDPOINTS_ASSEMBLYAI'] = fake.url
+    clients.assemblyai.cache_clear()
+    clients.transcriber.cache_clear()
+    yield fake
+    fake.stop()
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    # Every store in a temporary directory, and a polling schedule without waits
+    from audioscribe import cache, job_journal, word_timings, search_index, history, transcript_store, exports, feeds, polling
+
+    for module, name, path in [
+        (cache, 'CACHE_PATH', 'transcripts.sqlite3'),
+        (job_journal, 'JOURNAL_PATH', 'jobs.sqlite3'),
+        (word_timings, 'WORDS_PATH', 'words'),
+        (search_index, 'INDEX_PATH', 'search.sqlite3'),
+        (history, 'HISTORY_PATH', 'history.sqlite3'),
+        (transcript_store, 'STORE_PATH', 'transcript_store'),
+        (exports, 'EXPORTS_PATH', 'exports'),
+        (feeds, 'FEEDS_PATH', 'feeds.sqlite3'),
+    ]:
+        monkeypatch.setattr(module, name, str(tmp_path / path))
+    monkeypatch.setattr(polling, 'POLL_MIN_EXPECTED_SEC', 0)
+    monkeypatch.setattr(polling, 'POLL_MIN_INTERVAL_SEC', 0.05)
+    return tmp_path
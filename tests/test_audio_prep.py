@@ -0,0 +1,50 @@
+import io
+
+import pytest
+
+from audioscribe import audio_prep
+
+class FakeProcess:
+    # Stands in for the ffmpeg process, recording its command line
+    commands = []
+
+    def __init__(self, command, **kwargs):
+        self.commands.append(command)
+        self.stdout = io.BytesIO(b"OggS")
+        self.stderr = io.BytesIO()
+
+    def wait(self):
+        return 0
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    monkeypatch.setattr(audio_prep, 'ffmpeg_available', lambda: True)
+    monkeypatch.setattr(audio_prep.subprocess, 'Popen', FakeProcess)
+    FakeProcess.commands = []
+    return FakeProcess.commands
+
+def input_of(command):
+    return command[command.index('-i') + 1]
+
+def test_upload_named_like_a_local_file_is_copied(ffmpeg, tmp_path, monkeypatch):
+    (tmp_path / 'requirements.txt').write_text("server file")
+    monkeypatch.chdir(tmp_path)
+    upload = io.BytesIO(b"uploaded audio")
+    upload.name = 'requirements.txt'
+    output, metrics = audio_prep.preprocess_audio(upload)
+    assert input_of(ffmpeg[0]) != 'requirements.txt'
+    assert metrics['bytes_in'] == len(b"uploaded audio") and output.read() == b"OggS"
+
+def test_file_opened_from_disk_is_read_in_place(ffmpeg, tmp_path):
+    path = tmp_path / 'episode.mp3'
+    path.write_bytes(b"audio")
+    with open(path, 'rb') as file:
+        audio_prep.preprocess_audio(file)
+    assert input_of(ffmpeg[0]) == str(path)
+
+def test_trimming_keeps_inner_silences(ffmpeg):
+    upload = io.BytesIO(b"audio")
+    audio_prep.preprocess_audio(upload, trim_silence=True)
+    filters = ffmpeg[0][ffmpeg[0].index('-af') + 1]
+    assert 'stop_periods' not in filters
+    assert filters.count('areverse') == 2
@@ -0,0 +1,18 @@
+import pytest
+
+from bench.fakes import FakeAudioFiles
+from audioscribe.audio_probe import probe_remote_audio
+
+@pytest.fixture(scope='module')
+def files():
+    server = FakeAudioFiles(duration=1800, latency=0)
+    yield server
+    server.stop()
+
+# 'a' is served with a 100 KB cover in its ID3 tag, 'b' without
+@pytest.mark.parametrize('name', ['a.mp3', 'b.mp3', 'a.m4a', 'b.wav'])
+def test_duration_is_read_from_ranges(files, name):
+    sent = files.bytes_sent
+    info = probe_remote_audio(f"{files.url}/audio/{name}")
+    assert round(info['duration']) == 1800
+    assert files.bytes_sent - sent < info['size'] / 10
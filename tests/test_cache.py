@@ -0,0 +1,24 @@
+import io
+
+from audioscribe.cache import source_key, file_key, cache_get, cache_put
+from audioscribe.pipeline import cached_transcript, profile_cache_key
+
+def test_source_key_normalizes_direct_links():
+    assert source_key('yt', ' dQw4w9WgXcQ ') == 'yt:dQw4w9WgXcQ'
+    assert source_key('dt', 'https://host/a.mp3#t=10') == 'dt:https://host/a.mp3'
+    assert source_key('dt', 'https://host/feed/') == 'dt:https://host/feed'
+
+def test_file_key_hashes_the_content_and_rewinds():
+    first = io.BytesIO(b"x" * (3 * 1024 * 1024 + 5))
+    first.read(10)
+    key = file_key(first, chunk_size=1024 * 1024)
+    assert key.startswith('up:') and first.tell() == 0
+    assert file_key(io.BytesIO(b"x" * (3 * 1024 * 1024 + 5))) == key
+    assert file_key(io.BytesIO(b"y")) != key
+
+def test_cached_transcript_falls_back_to_richer_profiles(stores):
+    key = source_key('ln', 'episode')
+    cache_put(profile_cache_key(key, 'full'), "output", {'text': 'raw'})
+    assert cache_get(key) == ("output", {'text': 'raw'})
+    assert cached_transcript(key, 'fast')[0] == key
+    assert cached_transcript(source_key('ln', 'other'), 'fast') is None
@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+from audioscribe.chunking import segment_bounds, stitch_chunks, utterances_with_offset
+
+def segment_transcript(start_sec, end_sec, offset_sec, utterances=True):
+    # A transcript of one segment, a word per second, times relative to the segment
+    words = [
+        SimpleNamespace(text=f"w{second}", start=(second - offset_sec) * 1000, end=(second - offset_sec) * 1000 + 800, confidence=0.9)
+        for second in range(start_sec, end_sec)
+    ]
+    text = " ".join(w.text for w in words)
+    if not utterances:
+        return SimpleNamespace(utterances=None, words=words, text=text, audio_duration=end_sec - start_sec)
+    speeches = [words[i:i + 10] for i in range(0, len(words), 10)]
+    return SimpleNamespace(
+        utterances=[
+            SimpleNamespace(speaker="AB"[i % 2], start=ws[0].start, end=ws[-1].end, text=" ".join(w.text for w in ws), words=ws)
+            for i, ws in enumerate(speeches)
+        ],
+        words=words, text=text, audio_duration=end_sec - start_sec,
+    )
+
+def stitched_words(duration_sec, utterances):
+    bounds = segment_bounds(duration_sec)
+    chunks = [utterances_with_offset(segment_transcript(int(start), int(end), int(start), utterances), start) for start, end in bounds]
+    return [w[0] for u in stitch_chunks(chunks, bounds) for w in u['words']]
+
+def test_stitch_without_utterances_keeps_each_word_once():
+    words = stitched_words(1800, utterances=False)
+    assert words == [f"w{second}" for second in range(1800)]
+
+def test_stitch_with_utterances_keeps_each_word_once():
+    words = stitched_words(1800, utterances=True)
+    assert words == [f"w{second}" for second in range(1800)]
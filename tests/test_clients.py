@@ -0,0 +1,39 @@
+import pytest
+
+from bench.fakes import FakeYoutubeDL
+from audioscribe import clients
+
+class TrackedYoutubeDL(FakeYoutubeDL):
+    # Records whether the pool closed it
+    latency = 0
+
+    def __init__(self, params=None):
+        super().__init__(params)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def extractors(monkeypatch):
+    import yt_dlp
+
+    monkeypatch.setattr(yt_dlp, 'YoutubeDL', TrackedYoutubeDL)
+    monkeypatch.setattr(clients, '_youtube', clients.queue.Queue(maxsize=clients.YOUTUBE_POOL_SIZE))
+    return clients._youtube
+
+def test_extractor_is_reused(extractors):
+    with clients.youtube_extractor() as first:
+        pass
+    with clients.youtube_extractor() as second:
+        assert second is first
+    assert not first.closed
+
+def test_failed_extractor_is_closed_and_dropped(extractors):
+    with pytest.raises(ValueError):
+        with clients.youtube_extractor() as failed:
+            raise ValueError("extraction failed")
+    assert failed.closed
+    assert extractors.empty()
+    with clients.youtube_extractor() as fresh:
+        assert fresh is not failed
@@ -0,0 +1,45 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from audioscribe import http_client
+from audioscribe.http_client import CircuitBreaker, TokenBucket, ServiceUnavailableError, send
+
+def response(status):
+    return SimpleNamespace(status_code=status, headers={}, close=lambda: None)
+
+def test_token_bucket_allows_the_burst_then_the_rate():
+    bucket = TokenBucket(rate=50, capacity=3)
+    started = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - started < 0.01
+    waited, _ = bucket.acquire()
+    assert 0.01 < waited < 0.1
+
+def test_breaker_opens_after_repeated_failures_and_lets_a_trial_through():
+    breaker = CircuitBreaker(failures=2, cooldown=0.05)
+    assert not breaker.failure()
+    assert breaker.failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.success()
+    assert not breaker.is_open and breaker.allow()
+
+def test_open_breaker_fails_fast_for_its_host_only(monkeypatch):
+    monkeypatch.setattr(http_client, '_breakers', {})
+    monkeypatch.setattr(http_client, '_buckets', {})
+    calls = []
+
+    def failing():
+        calls.append(1)
+        return response(503)
+
+    for _ in range(http_client.BREAKER_FAILURES):
+        send('direct', 'GET', failing, retries=0, host='dead.example')
+    with pytest.raises(ServiceUnavailableError):
+        send('direct', 'GET', failing, retries=0, host='dead.example')
+    assert len(calls) == http_client.BREAKER_FAILURES
+    assert send('direct', 'GET', lambda: response(200), retries=0, host='alive.example').status_code == 200
@@ -0,0 +1,24 @@
+import time
+
+from audioscribe import job_journal
+from audioscribe.job_journal import journal_submitted, journal_finished, journal_find, journal_state, journal_pending
+
+SOURCE = {'cache_key': 'ln:episode', 'profile': 'fast', 'audio_url': 'https://podcast.example/a.mp3', 'audio_length_sec': 60}
+
+def test_unfinished_job_is_found_until_it_finishes(stores):
+    journal_submitted('t1', 'ln:episode#fast', SOURCE)
+    assert journal_find('ln:episode#fast') == 't1'
+    assert journal_state('ln:episode#fast') == 'polling'
+    assert [entry['transcript_id'] for entry in journal_pending()] == ['t1']
+
+    journal_finished('t1', 'failed', 'rejected')
+    assert journal_find('ln:episode#fast') is None
+    assert journal_state('ln:episode#fast') == 'failed'
+    assert journal_pending() == []
+
+def test_old_jobs_are_abandoned(stores, monkeypatch):
+    journal_submitted('old', 'ln:episode#fast', SOURCE)
+    monkeypatch.setattr(time, 'time', lambda now=time.time(): now + job_journal.JOURNAL_MAX_AGE_SEC + 1)
+    assert journal_find('ln:episode#fast') is None
+    assert journal_pending() == []
+    assert journal_state('ln:episode#fast') == 'abandoned'
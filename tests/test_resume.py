@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+
+from audioscribe import job_journal
+from audioscribe.job_journal import journal_submitted, journal_find
+from audioscribe.polling import TranscriptRejectedError, ProviderUnreachableError
+from audioscribe.pipeline import transc_fetch, transc_send, transcribe_audio, transcription_key
+
+AUDIO_URL = 'https://podcast.example/episode.mp3'
+
+def journal_states():
+    with sqlite3.connect(job_journal.JOURNAL_PATH) as conn:
+        return dict(conn.execute("SELECT transcript_id, state FROM jobs").fetchall())
+
+def test_fetch_of_unknown_id_is_rejected(fake_assemblyai, stores):
+    with pytest.raises(TranscriptRejectedError):
+        transc_fetch('0' * 32)
+
+def test_rejected_resumed_job_is_submitted_again(fake_assemblyai, stores):
+    cache_key = f"dt:{AUDIO_URL}"
+    key = transcription_key(AUDIO_URL, cache_key, 'fast')
+    journal_submitted('dead', key, {'cache_key': cache_key, 'profile': 'fast', 'audio_url': AUDIO_URL})
+    submitted = len(fake_assemblyai.jobs)
+
+    output = transcribe_audio(AUDIO_URL, 'Episode', AUDIO_URL, 0, cache_key, profile='fast')
+
+    assert 'Episode' in output
+    assert len(fake_assemblyai.jobs) == submitted + 1
+    states = journal_states()
+    assert states.pop('dead') == 'failed'
+    assert list(states.values()) == ['completed']
+    assert journal_find(key) is None
+
+def test_unfinished_job_is_resumed_without_submitting(fake_assemblyai, stores):
+    cache_key = f"dt:{AUDIO_URL}#resumed"
+    key = transcription_key(AUDIO_URL, cache_key, 'fast')
+    transcript_id = transc_send(AUDIO_URL, 'fast')
+    journal_submitted(transcript_id, key, {'cache_key': cache_key, 'profile': 'fast', 'audio_url': AUDIO_URL})
+    submitted = len(fake_assemblyai.jobs)
+
+    transcribe_audio(AUDIO_URL, 'Episode', AUDIO_URL, 0, cache_key, profile='fast')
+
+    assert len(fake_assemblyai.jobs) == submitted
+    assert journal_states() == {transcript_id: 'completed'}
+
+def test_unreachable_provider_keeps_the_job_resumable(fake_assemblyai, stores, monkeypatch):
+    import assemblyai as aai
+
+    def unavailable(client, transcript_id):
+        raise aai.types.TranscriptError("service unavailable", 503)
+
+    monkeypatch.setattr(aai.api, 'get_transcript', unavailable)
+    with pytest.raises(ProviderUnreachableError):
+        transc_fetch('0' * 32)
+
+    cache_key = f"dt:{AUDIO_URL}#unreachable"
+    key = transcription_key(AUDIO_URL, cache_key, 'fast')
+    journal_submitted('alive', key, {'cache_key': cache_key, 'profile': 'fast', 'audio_url': AUDIO_URL})
+    with pytest.raises(ProviderUnreachableError):
+        transcribe_audio(AUDIO_URL, 'Episode', AUDIO_URL, 0, cache_key, profile='fast')
+    assert journal_find(key) == 'alive'
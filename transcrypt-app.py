@@ -1,22 +1,52 @@
 import streamlit as st
 import streamlit.components.v1 as components
 from streamlit import session_state as ss
+import io
 import time
-import re
 import json
 from datetime import datetime
-from listennotes import podcast_api
-import assemblyai as aai
-import yt_dlp
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-from utils import (
-    upload_file_url,
-    sanitize_folder_name,
+from audioscribe.utils import (
     convert_time_format,
-    insert_spaces,
     youtube_url_is_playlist
 )
+from audioscribe.cache import file_key, source_key, cache_raw
+from audioscribe.exports import EXPORT_FORMATS, export_path, markdown_path, format_timestamp
+from audioscribe.audio_prep import ffmpeg_available
+from audioscribe.chunking import CHUNK_MIN_DURATION_SEC
+from audioscribe.playlist import youtube_playlist_entries
+from audioscribe.clients import PROFILES, DEFAULT_PROFILE
+from audioscribe.pipeline import (
+    resolve_source,
+    cached_transcript,
+    stored_analysis,
+    analyze_transcript,
+    prefetch_source,
+    prefetch_upload,
+    transcribe_audio,
+    transcribe_chunked,
+    transcribe_playlist,
+    recover_transcriptions,
+    SourceNotFoundError
+)
+from audioscribe.history import estimate_remaining
+from audioscribe.jobs import submit_job, get_job
+from audioscribe.transcript_store import store_put, store_get
+from audioscribe.prefetch import prefetch, cancel_prefetch, prefetch_state, PREFETCH_DEBOUNCE_SEC
+from audioscribe.metrics import configure_metrics, span
+
+# Delay between two reruns reading the state of a running job
+JOB_REFRESH_SEC = 2
+# Size of a page of the transcript view
+TRANSCRIPT_PAGE_UTTERANCES = 50
+TRANSCRIPT_PAGE_CHARS = 20000
+# Choices of transcription profile
+PROFILE_LABELS = {
+    'fast': "Fast: text only",
+    'speakers': "Speakers: text by speaker",
+    'full': "Full analysis: speakers, summary, topics and entities",
+}
+# Analyses shown with the transcription, computed on demand when the profile didn't include them
+ANALYSIS_TITLES = {'summary': "Summary", 'topics': "Topics", 'entities': "Entities"}
 
 # Streamlit page configuration
 st.set_page_config(
@@ -31,206 +61,10 @@ st.set_page_config(
     }
 )
 
-def determine_service_to_data(text):
-    # Remove leading and trailing whitespace from input
-    text = text.strip()
-
-    # Regular expression patterns for service identification
-    listen_notes_id_pattern = r"^[a-f0-9]{32}$"
-    youtube_id_pattern = r"^[a-zA-Z0-9_-]{11}$"
-    spotify_id_pattern = r"^[A-Za-z0-9]{22}$"
-
-    # URL patterns for YouTube and Spotify
-    youtube_url_pattern = r"(youtu\.be\/|youtube\.com\/watch\?v=)([a-zA-Z0-9_-]{11})"
-    spotify_url_pattern = r"spotify\.com\/episode\/([A-Za-z0-9]{22})"
-
-    # Check for URL matches
-    youtube_match = re.search(youtube_url_pattern, text)
-    spotify_match = re.search(spotify_url_pattern, text)
-
-    # Service identification logic and data retrieval
-    if re.match(listen_notes_id_pattern, text):
-        data = listennotes_get_data_by_id(text)
-        service_code = "ln"
-    elif re.match(youtube_id_pattern, text):
-        data = youtube_get_data_by_url(f"https://www.youtube.com/watch?v={text}")
-        service_code = "yt"
-    elif re.match(spotify_id_pattern, text):
-        data = spotify_get_data_by_id(text)
-        service_code = "sp"
-    elif youtube_match:
-        data = youtube_get_data_by_url(text)
-        service_code = "yt"
-    elif spotify_match:
-        spotify_id = spotify_match.group(1)
-        data = spotify_get_data_by_id(spotify_id)
-        service_code = "sp"
-    elif text.startswith("http") and not youtube_match and not spotify_match:
-        data = {
-            'title': 'Not available',
-            'link': 'Not available',
-            'audio': text,
-            'audio_length_sec': "60",
-        }
-        service_code = "dt"
-    else:
-        # Default: treat as Listen Notes search query
-        data = listennotes_get_data_by_search(text)
-        service_code = "ln"
-
-    return (service_code, data)
-
-def listennotes_get_data_by_id(episode_id):
-    # Fetch episode data from Listen Notes API using ID
-    response = client.fetch_episode_by_id(
-        id=episode_id,
-        show_transcript=1,
-    )
-    data = response.json()
-    data = {
-        'title': data['title'],
-        'link': data['link'],
-        'audio': data['audio'],
-        'audio_length_sec': data['audio_length_sec'],
-    }
-    return data
-
-def listennotes_get_data_by_search(episode_keyword):
-    # Search for podcast episodes using Listen Notes API
-    response = client.search(
-        q=episode_keyword,
-        sort_by_date=0,
-        type='episode',
-        offset=0,
-        len_min=3,
-        len_max=180,
-        published_after=0,
-        only_in='title,description',
-        region='fr',
-        safe_mode=0,
-        unique_podcasts=1,
-        page_size=10,
-    )
-    data_results = response.json()
-    # Process and return first search result if available
-    if data_results['results']:
-        data = data_results['results'][0]
-        data = {
-            'title': data['title'],
-            'link': data['link'],
-            'audio': data['audio'],
-            'audio_length_sec': data['audio_length_sec'],
-        }
-        return data
-    else:
-        print("No results found.")
-        exit(1)
-
-def youtube_get_data_by_url(url):
-    """
-    Extract audio URL (m4a format) from a YouTube video
-    Uses yt-dlp library: https://github.com/yt-dlp/yt-dlp/blob/5fb450a64c300056476cfef481b7b5377ff82d54/yt_dlp/YoutubeDL.py
-    """
-    try:
-        with yt_dlp.YoutubeDL() as ydl:
-            info = ydl.extract_info(url, download=False)
-    except Exception as e:
-        print("Error extracting video information:", e)
-        print ("caught: {}".format(error))
-        return "stop"
-
-    # Find m4a audio format URL
-    url_audio = None
-    for format in info["formats"][::-1]:
-        if format["resolution"] == "audio only" and format["ext"] == "m4a":
-            url_audio = format["url"]
-            break
-    data = {
-        'title': info['title'],
-        'link': url,
-        'audio': url_audio,
-        'audio_length_sec': info["duration"],
-    }
-    return data
-
-def spotify_get_data_by_id(id):
-    # Get Spotify episode info and search for corresponding Listen Notes episode
-    info = sp.episode(id,market="FR")
-    search_input = f"{info['name']} {info['show']['name']}"
-    data = listennotes_get_data_by_search(search_input)
-    return data
-
-def transc_send(audio_url):
-    # Initiate transcription with AssemblyAI
-    transcript = transcriber.transcribe(audio_url)
-    transcript_id = transcript.id
-    return transcript_id
-
-def transc_get(transcript_id):
-    # Poll for transcription completion
-    polling_response = aai.Transcript.get_by_id(transcript_id)
-    while polling_response.status != 'completed':
-        time.sleep(3)
-        polling_response = aai.Transcript.get_by_id(transcript_id)
-    return polling_response
-
-def summary_transcript(transcript):
-    # Generate French summary of transcript using AssemblyAI Lemur
-    prompt = "Summarize key points from this transcript in 5 bullets. Reply in French."
-    result = aai.Lemur().task(
-        prompt,
-        final_model=aai.LemurModel.basic,
-        input_text=transcript,
-    )
-    return result
-
-def speaker_transcript(transcript):
-    # Format transcript with speaker labels if available
-    if len(transcript.utterances) > 0:
-        formatted_utterances = [f"Speaker {utterance.speaker} : {utterance.text}" for utterance in transcript.utterances]
-        return "\n\n".join(formatted_utterances)
-    else:
-        return transcript.text
-
-def topic_transcript(transcript):
-    # Extract and format transcript topics with confidence scores
-    summary = transcript.iab_categories.summary
-    if len(summary) > 0:
-        formatted_topics = [
-            f"- {insert_spaces(last_element)} ({value * 100:.0f}%)"
-            for key, value in summary.items() if value > 0.4
-            for last_element in [key.split(">")[-1]]
-        ]
-        return "\n".join(formatted_topics)
-    else:
-        return ""
-
-def entity_transcript(transcript):
-    # Extract and format named entities from transcript
-    if len(transcript.entities) > 0:
-        entities_sorted = transcript.entities
-        grouped_entities = {}
-        # Group entities by type and remove duplicates
-        for entity in entities_sorted:
-            entity_type = entity.entity_type
-            text = entity.text
-            if entity_type not in grouped_entities:
-                grouped_entities[entity_type] = set()
-            grouped_entities[entity_type].add(text)
-
-        formatted_entities = []
-        ignore_list = ["language", "nationality"]
-        # Format entities for display
-        for entity_type, texts in grouped_entities.items():
-            entity = entity_type.split(".")[-1]
-            if entity.lower() in ignore_list:
-                continue
-            formatted_entities.append(f"\n**{entity.capitalize()}**:")
-            for text in texts:
-                formatted_entities.append(f"- {text.capitalize()}")
-        return "\n".join(formatted_entities)
-    else:
-        return ""
+# JSON trace log and metrics endpoint, if configured
+configure_metrics()
+# Resume the transcriptions a previous run of the server left unfinished (once per process)
+recover_transcriptions()
 
 def clip(text):
     # Copy text to clipboard using JavaScript
@@ -240,109 +74,229 @@ def clip(text):
     """
     components.html(html_string,height=0,width=0)
 
-def notify_and_copy(text,title):
-    # Copy text and show success notification
-    clip(text)
+def request_copy(transcript_id, title):
+    # Button callback: the copy script is rendered by the run the click starts, and by no other
+    ss.copy_request = (transcript_id, title)
+
+def notify_and_copy(transcript_id,title):
+    # Copy a stored transcript and show success notification, the text isn't kept in the session
+    clip(store_get(transcript_id) or "")
     st.toast(f'{title} copied successfully!', icon='🎉')
-    ss.copied.append(text)
+
+def prepare_export(result_key, export_format):
+    # Build (or reuse) the export file of a transcript, offered for download on the next run
+    if export_format == 'md':
+        output = store_get(ss.transcript_id)
+        if output is not None:
+            markdown_path(ss.transcript_id, output)
+            ss.export_ready = (result_key, export_format)
+        return
+    raw = cache_raw(result_key)
+    if raw:
+        export_path(result_key, raw, export_format)
+        ss.export_ready = (result_key, export_format)
+
+def download_path(export_format, raw):
+    # The export file prepared by prepare_export(), rebuilt if it was pruned since
+    if export_format == 'md':
+        output = store_get(ss.transcript_id)
+        return markdown_path(ss.transcript_id, output) if output is not None else None
+    return export_path(ss.result_key, raw, export_format)
+
+def forget_export():
+    # The file is only read into the page again if the user asks for it
+    ss.pop('export_ready', None)
+
+def source_prefetch_key(text):
+    return f"source:{' '.join(text.split())}"
+
+def start_prefetch(file, text, optimize, trim_silence):
+    """
+    Starts the background work of the current Step 1 input, so it is done or under way
+    by the time the user confirms: a dropped file is uploaded at once, typed input is
+    resolved once it stopped changing. The work of a previous input is cancelled.
+    """
+    if file is not None:
+        identity = (getattr(file, 'file_id', None), file.name, file.size)
+        if ss.get('prefetch_file') != identity:
+            ss.prefetch_file = identity
+            ss.file_key = file_key(file)
+            # A file transcribed before isn't uploaded again
+            ss.file_cached = cached_transcript(ss.file_key, ss.get('profile', DEFAULT_PROFILE)) is not None
+        key = None if ss.file_cached else f"upload:{ss.file_key}:{int(optimize)}:{int(trim_silence)}"
+    elif text.strip():
+        key = source_prefetch_key(text)
+    else:
+        key = None
+    if key == ss.get('prefetch_key'):
+        return
+    if ss.get('prefetch_key'):
+        cancel_prefetch(ss.prefetch_key)
+    ss.prefetch_key = key
+    if key is None:
+        return
+    if file is not None:
+        # A copy of the file object for the worker thread, the bytes themselves aren't copied
+        data = io.BytesIO(file.getvalue())
+        data.name = file.name
+        prefetch(key, prefetch_upload, data, optimize, trim_silence, ss.file_key)
+    else:
+        prefetch(key, prefetch_source, text, delay=PREFETCH_DEBOUNCE_SEC)
+
+def prefetched(key):
+    # Result of a finished background task, None if it isn't done or failed
+    state = prefetch_state(key) if key else None
+    return state['result'] if state and state['status'] == 'completed' else None
+
+def wait_for_upload(file, optimize, trim_silence):
+    # Wait for the upload started when the file was dropped, showing its progress
+    upload_bar = st.progress(0, text="Uploading...")
+    while True:
+        state = prefetch_state(ss.prefetch_key)
+        if state is None or state['status'] == 'cancelled':
+            # Forgotten or cancelled meanwhile: start it again
+            ss.prefetch_key = None
+            start_prefetch(file, "", optimize, trim_silence)
+            continue
+        if state['status'] != 'running':
+            break
+        progress = state['progress']
+        if progress.get('total'):
+            upload_bar.progress(min(progress['sent'] / progress['total'], 1.0), text=f"Uploading... {progress['sent'] / 1e6:.0f} / {progress['total'] / 1e6:.0f} MB")
+        elif progress.get('stage') == 'optimizing':
+            upload_bar.progress(0, text="Optimizing audio...")
+        time.sleep(0.2)
+    upload_bar.empty()
+    if state['status'] == 'error':
+        raise state['error']
+    return state['result']
 
 def disabled_submit_button_step_2():
     # Toggle step 2 submit button state
     ss.disable_button_step_2 = not(ss.disable_button_step_2)
 
-def simulate_progress(audio_length_sec, progress_bar, progress_messages):
+def text_page(text, page, size):
+    # Slice a page of about `size` characters out of a text, cut between paragraphs
+    def boundary(index):
+        if index <= 0:
+            return 0
+        found = text.find("\n\n", index)
+        return len(text) if found == -1 else found + 2
+    return text[boundary(page * size):boundary((page + 1) * size)]
+
+def render_analysis(result_key, raw):
+    # Display the summary, topics and entities, each computed only when asked for if not known yet
+    for section, title in ANALYSIS_TITLES.items():
+        analysis = stored_analysis(raw, section)
+        if analysis is None:
+            if not st.button(f":mag: {title}", key=f"analysis_{section}"):
+                continue
+            try:
+                with st.spinner(f"{title} in progress..."):
+                    analysis = analyze_transcript(result_key, section)
+            except Exception as e:
+                print(f"Error during the {section} analysis:", e)
+                st.error(f":warning: {title} failed: {e}")
+                continue
+        with st.expander(title, expanded=section == 'summary'):
+            st.markdown(analysis or "Not Available")
+
+def render_transcript(output, raw, result_key=None):
     """
-    Display progress simulation based on audio length
-    Updates progress bar with custom messages at specific intervals
+    Display the transcription one page at a time, only the current page is sent to the browser.
+    The utterances of the raw transcript are used when available, the formatted text otherwise.
     """
-    now = datetime.now()
-    current_time = now.strftime("%H:%M:%S")
-    print("simulate start " + current_time)
-    time_increment = float(audio_length_sec) * 0.08 / 100
-    time_total = float(audio_length_sec) * 0.08
-    initial_text = progress_messages[0]
-    if ss.completed:
-        progress_bar.progress(100, text=f":sparkles: Waiting time : 0 s\n\nVoilà! Your transcription is ready!")
+    start = output.find("###\nSummary:")
+    if raw and raw.get('utterances') and start != -1:
+        utterances = raw['utterances']
+        pages = max(1, -(-len(utterances) // TRANSCRIPT_PAGE_UTTERANCES))
+        st.markdown(output[:start])
+        render_analysis(result_key, raw)
+        st.markdown("Transcription:")
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key="transcript_page") - 1
+        st.markdown("\n\n".join(
+            f"`{format_timestamp(u['start'])[:8]}` **Speaker {u['speaker']}** : {u['text']}"
+            for u in utterances[page * TRANSCRIPT_PAGE_UTTERANCES:(page + 1) * TRANSCRIPT_PAGE_UTTERANCES]
+        ))
     else:
-        for percent_complete in range(100):
-            time.sleep(time_increment)
-            if percent_complete + 1 in progress_messages:
-                progress_text = progress_messages[percent_complete + 1]
-            else:
-                progress_text = initial_text
-            initial_text = progress_text
-            time_total = time_total - time_increment
-            progress_text = f":sparkles: Waiting time : {convert_time_format(time_total)}\n\n{progress_text}"
-            st.spinner(progress_text)
-            progress_bar.progress(percent_complete + 1, text=progress_text)
-        time.sleep(1)
-        st.balloons()
-
-def process_transcription(audio_url, audio_title, audio_link):
-    # Process audio transcription and generate analysis
+        pages = max(1, -(-len(output) // TRANSCRIPT_PAGE_CHARS))
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key="transcript_page") - 1
+        st.markdown(text_page(output, page, TRANSCRIPT_PAGE_CHARS))
+
+def start_transcription_job():
+    # Submit the confirmed source to the background workers, the job ID is all the session keeps
     now = datetime.now()
     current_time = now.strftime("%H:%M:%S")
     print("process start " + current_time)
 
-    output = ""
-    transcript_id = transc_send(ss.audio_url)
-    transcript = transc_get(transcript_id)
-
-    # Generate various transcript analyses
-    text = speaker_transcript(transcript)
-    topics = topic_transcript(transcript)
-    entities = entity_transcript(transcript)
-    summary = transcript.summary
-
-    # Format output
-    output += f"""
-###
-Title:\n
-{audio_title.strip()}
-###
-URL:\n
-{audio_link}
-###
-Summary:\n
-{summary if summary is not None else 'Not Available'}
-###
-Transcription:\n
-{text}
-###
-Topics:\n
-{topics if topics is not None else 'Not Available'}
-###
-Entities:\n
-{entities if entities is not None else 'Not Available'}
-###
+    profile = ss.get('profile', DEFAULT_PROFILE)
+    if youtube_url_is_playlist(ss.input_key):
+        ss.job_id = submit_job(transcribe_playlist, ss.playlist_entries, profile, job_key=f"playlist:{ss.input_key}#{profile}")
+    elif ss.get('chunked'):
+        ss.job_id = submit_job(transcribe_chunked, ss.audio_url, ss.audio_title, ss.audio_link, ss.audio_length_sec, ss.cache_key, profile, job_key=f"chunked:{ss.cache_key}#{profile}")
+    else:
+        ss.job_id = submit_job(transcribe_audio, ss.audio_url, ss.audio_title, ss.audio_link, ss.audio_length_sec, ss.cache_key, ss.get('audio_bytes'), profile, job_key=f"{ss.cache_key}#{profile}")
+
+def render_job(job):
+    # Display the progress published by a running job
+    with st.spinner(f"Transcription {job['stage'] or job['status']}..."):
+        if job.get('stage_started'):
+            # Estimated from the timings of the previous jobs and the stage the job is really in
+            now = time.time()
+            remaining, total = estimate_remaining(job.get('features'), ss.audio_length_sec, job['stage'], now - job['stage_started'], job.get('service'))
+            elapsed = now - job['created']
+            percent = min(99, int(100 * elapsed / (elapsed + remaining)))
+            message = progress_messages[max(step for step in progress_messages if step <= percent)]
+            st.progress(percent, text=f":sparkles: Waiting time : about {convert_time_format(remaining) or '1 s'}\n\n{message}")
+        if job.get('items'):
+            done = sum(1 for item in job['items'] if item != 'waiting')
+            st.progress(done / len(job['items']), text=f"{done} / {len(job['items'])} videos transcribed")
+            icons = {'waiting': ':hourglass: Waiting', 'done': ':white_check_mark: Done'}
+            st.markdown("\n".join(
+                f"{index + 1}. {entry['title']} : {icons.get(item, f':warning: {item.capitalize()}')}"
+                for index, (entry, item) in enumerate(zip(ss.playlist_entries, job['items']))
+            ))
+        elif job.get('parts'):
+            done = sum(1 for part in job['parts'] if part is not None)
+            st.progress(done / len(job['parts']), text=f"{done} / {len(job['parts'])} parts transcribed")
+            for index, part in enumerate(job['parts']):
+                if part is not None:
+                    start, end = job['bounds'][index]
+                    with st.expander(f"Part {index + 1} : {convert_time_format(start) or '0 s'} → {convert_time_format(end)}"):
+                        st.markdown(part)
+        time.sleep(JOB_REFRESH_SEC)
+
+def process_transcription():
     """
-    ss.transcription_result = output
-    ss.completed = True
-
-# API configuration
-listennotes_api = st.secrets.listennotes
-assemblyai_api = st.secrets.assemblyai
-spotify_api_id = st.secrets.spotify.id
-spotify_api_secret = st.secrets.spotify.secret
-
-# ListenNotes client configuration
-client = podcast_api.Client(api_key=listennotes_api)
-
-# AssemblyAI client configuration
-aai.settings.api_key = assemblyai_api
-config = aai.TranscriptionConfig(
-    speaker_labels=True,
-    language_detection=True,
-    summarization=True,
-    summary_model=aai.SummarizationModel.conversational,
-    summary_type=aai.SummarizationType.bullets,
-    entity_detection=True,
-    iab_categories=True
-)
-transcriber = aai.Transcriber(config=config)
-
-# Spotify client configuration
-sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(client_id=spotify_api_id,client_secret=spotify_api_secret))
+    Drive Step 3 from the state of the background job.
+    Each rerun only reads the job, so the script thread is never blocked by the transcription.
+    """
+    playlist = youtube_url_is_playlist(ss.input_key)
+    cached = cached_transcript(ss.cache_key, ss.get('profile', DEFAULT_PROFILE)) if not playlist else None
+    if cached is not None:
+        print("cache hit " + cached[0])
+        ss.result_key = cached[0]
+        ss.transcript_id = store_put(cached[1])
+        ss.completed = True
+        return
+    if ss.get('job_id') is None:
+        start_transcription_job()
+    job = get_job(ss.job_id)
+    if job is None or job['status'] == 'error':
+        error = job['error'] if job else "the job was lost, please try again"
+        st.error(f":warning: Transcription failed: {error}")
+        ss.job_id = None
+        ss.step_2_ok = False
+    elif job['status'] == 'completed':
+        found = cached_transcript(ss.cache_key, ss.get('profile', DEFAULT_PROFILE)) if not playlist else None
+        ss.result_key = found[0] if found else None
+        # Stored by the job, the session only keeps the ID
+        ss.transcript_id = job['result']
+        ss.completed = True
+        ss.job_id = None
+    else:
+        render_job(job)
+        st.rerun()
 
 # Service mappings and configurations
 progress_messages = {
@@ -434,10 +388,10 @@ if "completed" not in ss:
     ss.completed = False
 if 'disable_button_step_2'not in ss:
     ss.disable_button_step_2 = True
-if 'transcription_result' not in ss:
-    ss.transcription_result = ""
-if "copied" not in ss:
-    ss.copied = []
+if 'transcript_id' not in ss:
+    ss.transcript_id = None
+if 'file_key' not in ss:
+    ss.file_key = None
 
 # App Header
 st.image('./assets/logo.png', width=200)
@@ -450,17 +404,20 @@ st.markdown(multi)
 
 # Step 1: Input Field
 st.markdown('### Step 1 : Upload or Enter Information')
-with st.form(key="input_form"):
+with st.container(border=True):
+    # Not in a form: a dropped file or typed input starts its work in the background right away
     file = st.file_uploader("Drop your file here or click to select.", type=['mp3', 'mp4', 'wav'])
     input = st.text_input("Paste the URL, ID, or search term for your podcast (Listen Notes, Spotify) or video (YouTube) here.")
-    step_1_warning = st.empty
+    optimize_audio = st.checkbox("Optimize uploaded files before sending them (mono 16 kHz speech audio, no video track)", value=True)
+    trim_silence = st.checkbox("Trim the silence at the start and end of uploaded files", value=False)
     # Handling file or URL input
     if file:
         ss.file_uploaded = True
     else:
         ss.file_uploaded = False
+    start_prefetch(file, input, optimize_audio, trim_silence)
     # Button submission
-    submit_button = st.form_submit_button(label=':memo: Start Transcription', type='primary')
+    submit_button = st.button(label=':memo: Start Transcription', type='primary')
     if submit_button:
         errors = []
         if file is None and input == "":
@@ -469,29 +426,74 @@ with st.form(key="input_form"):
             for error in errors:
                 st.error(error)
         else:
-            if file is not None:
-                file_details = {
-                    "filename":file.name,
-                    "filetype":file.type,
-                    "filesize":file.size
-                }
-                input = upload_file_url(file)
-                #print(input)
-            time.sleep(1)
-            ss.completed = False
-            ss.step_1_ok = True
-            ss.input_key = input
+            cached = cached_transcript(ss.file_key, ss.get('profile', DEFAULT_PROFILE)) if file is not None else None
+            # Expired since the file was dropped: wait_for_upload() starts the upload
+            ss.file_cached = cached is not None
+            if cached is not None:
+                # Transcribed before: no upload nor confirmation, straight to the result
+                print("cache hit " + cached[0])
+                ss.result_key = cached[0]
+                ss.transcript_id = store_put(cached[1])
+                ss.completed = True
+                ss.step_1_ok = False
+                ss.step_2_ok = False
+            else:
+                if file is not None:
+                    try:
+                        upload = wait_for_upload(file, optimize_audio, trim_silence)
+                    except Exception as e:
+                        print("Error during upload:", e)
+                        st.error(f":warning: Upload failed: {e}")
+                        st.stop()
+                    prep_metrics = upload['prep_metrics']
+                    if prep_metrics:
+                        st.caption(f"Audio optimized in {prep_metrics['seconds']:.1f} s: {prep_metrics['bytes_in'] / 1e6:.1f} MB → {prep_metrics['bytes_out'] / 1e6:.1f} MB")
+                    input = upload['url']
+                    ss.audio_bytes = upload['audio_bytes']
+                    #print(input)
+                if file is None:
+                    ss.file_key = None
+                    ss.audio_bytes = None
+                ss.completed = False
+                ss.step_1_ok = True
+                ss.input_key = input
 
 # Step 2: Source Confirmation
 if ss.step_1_ok:
     st.divider()
     st.markdown('### Step 2 : Source Confirmation')
     if youtube_url_is_playlist(ss.input_key):
-        print('Playlist Step 2')
+        if ss.get('playlist_url') != ss.input_key:
+            # Listed in the background while the URL was typed, if it is done
+            entries = prefetched(source_prefetch_key(ss.input_key))
+            ss.playlist_entries = entries if entries is not None else youtube_playlist_entries(ss.input_key)
+            ss.playlist_url = ss.input_key
+        entries = ss.playlist_entries
+        ss.audio_length_sec = sum(int(entry['audio_length_sec']) for entry in entries)
+
+        # Layout
+        st.markdown(f'You have selected a YouTube playlist of {len(entries)} videos as source. Is this correct? <img  style="float: inline-end;" src="{service_logo["yt"]}" width="auto" height="25"/>', unsafe_allow_html=True)
+        with st.expander("Videos of the playlist"):
+            st.markdown("\n".join(f"{index + 1}. [{entry['title']}]({entry['link']})" for index, entry in enumerate(entries)))
+        with st.container(border=True):
+            on = st.toggle('Yes',key="input_confirm", on_change=disabled_submit_button_step_2)
+            st.radio("Analysis", list(PROFILES), format_func=PROFILE_LABELS.get, index=list(PROFILES).index(DEFAULT_PROFILE), key="profile")
+            st.warning('Make sure this is the correct data or file before confirming.')
+            button_step_2 = st.button(label='I confirm, start transcription!', type='primary', disabled=ss.disable_button_step_2 or not entries)
+            if button_step_2:
+                ss.step_2_ok = True
+                ss.processing = True
     else:
-        analysis = determine_service_to_data(ss.input_key)
+        try:
+            analysis = resolve_source(ss.input_key)
+        except SourceNotFoundError as e:
+            st.error(f":eyes: {e}. Please check your input or try another one.")
+            st.stop()
         data = analysis[1]
         service_code = analysis[0]
+        if not isinstance(data, dict):
+            st.error(":warning: No audio could be found for this input. Please check it or try another one.")
+            st.stop()
         audio_title = data['title']
         audio_link = data['link']
         audio_length_sec = data['audio_length_sec']
@@ -502,6 +504,7 @@ if ss.step_1_ok:
         ss.audio_url = audio_url
         ss.audio_title = audio_title
         ss.audio_link = audio_link
+        ss.cache_key = ss.file_key or source_key(service_code, data['id'])
 
         # Layout
         if service_logo[service_code]:
@@ -510,6 +513,9 @@ if ss.step_1_ok:
             st.markdown(f'You have selected: {service_title.get(service_code, "Service not recognized")} as source. Is this correct?', unsafe_allow_html=True)
         with st.container(border=True):
             on = st.toggle('Yes',key="input_confirm", on_change=disabled_submit_button_step_2)
+            st.radio("Analysis", list(PROFILES), format_func=PROFILE_LABELS.get, index=list(PROFILES).index(DEFAULT_PROFILE), key="profile")
+            if float(audio_length_sec or 0) >= CHUNK_MIN_DURATION_SEC and ffmpeg_available():
+                st.checkbox("Long audio: transcribe in parallel parts and show them as they are ready", key="chunked")
             st.warning('Make sure this is the correct data or file before confirming.')
             button_step_2 = st.button(label='I confirm, start transcription!', type='primary', disabled=ss.disable_button_step_2)
             if button_step_2:
@@ -520,14 +526,15 @@ if ss.step_1_ok:
 if ss.step_2_ok:
     st.divider()
     st.markdown('### Step 3 : Start Analysis')
-    #progress_bar = st.empty()
-    #simulate_progress(ss.audio_length_sec, progress_bar, progress_messages)
-    #simulate_progress_time(ss.audio_length_sec)
     if ss.completed == False:
-        with st.spinner(f':sparkles: Waiting time : {convert_time_format(ss.audio_length_sec)}'):
-            response = process_transcription(ss.audio_url, ss.audio_title, ss.audio_link)
+        process_transcription()
 
 # Step 4: Displaying Results
+output = store_get(ss.transcript_id) if ss.completed else None
+if ss.completed and output is None:
+    st.error(":warning: This transcription is no longer available, please start again.")
+    ss.completed = False
+    ss.step_2_ok = False
 if ss.completed:
     st.markdown("Voilà! Your transcription is ready!")
     st.divider()
@@ -535,14 +542,35 @@ if ss.completed:
     st.markdown("You can now copy or share your transcription.")
     col1, col2 = st.columns(2)
     with col1:
-        btn_copy = st.button(":clipboard: Copy Transcription", key="btn_copy", on_click=notify_and_copy, args=[str(ss.transcription_result),'Transcription'])
+        btn_copy = st.button(":clipboard: Copy Transcription", key="btn_copy", on_click=request_copy, args=[ss.transcript_id,'Transcription'])
         #if btn_copy:
         #    st.write("Functionality to copy the text.")
     with col2:
-        btn_share = st.button(":popcorn: Share", key="btn_share", on_click=notify_and_copy, args=[str(ss.transcription_result),'Transcription'])
+        btn_share = st.button(":popcorn: Share", key="btn_share", on_click=request_copy, args=[ss.transcript_id,'Transcription'])
         #if btn_share:
         #    st.write("Options to share the transcription.")
-    st.success(f"{ss.transcription_result}\n\n")
+    # The transcript is only embedded in the page on the run following a click, then dropped
+    copy_request = ss.pop('copy_request', None)
+    if copy_request is not None:
+        notify_and_copy(*copy_request)
+    with span('render') as s:
+        s['bytes'] = len(output)
+        raw = cache_raw(ss.result_key) if ss.get('result_key') else None
+        export_formats = ['md'] + (list(EXPORT_FORMATS) if raw else [])
+        col1, col2 = st.columns(2)
+        with col1:
+            export_format = st.selectbox("Format", export_formats, format_func=str.upper, label_visibility="collapsed")
+        with col2:
+            path = download_path(export_format, raw) if ss.get('export_ready') == (ss.get('result_key'), export_format) else None
+            if path is not None:
+                # Built once per transcript and format, read into the page only until it is downloaded
+                mime, extension = ('text/markdown', 'md') if export_format == 'md' else EXPORT_FORMATS[export_format][1:]
+                with open(path, 'rb') as export:
+                    st.download_button(":inbox_tray: Download", data=export, file_name=f"transcription.{extension}", mime=mime, on_click=forget_export)
+            else:
+                st.button(":gear: Prepare export", on_click=prepare_export, args=[ss.get('result_key'), export_format])
+        with st.container(border=True):
+            render_transcript(output, raw, ss.get('result_key'))
 
 # Reset the app state
 if ss.completed: